@@ -0,0 +1,69 @@
+import math
+
+from django.core.cache import cache
+from django.db.models import Avg, Count, F, Max, Window
+from django.db.models.functions import CumeDist, DenseRank, Rank
+
+from .models import Grade
+
+CACHE_TIMEOUT = 60 * 60
+
+
+def exam_rankings(exam_id):
+    """
+    Returns one row per grade in the exam with its rank, dense rank,
+    percentile and z-score among the grades for the same subject in the
+    student's class.
+
+    Rankings are computed by the database with window functions partitioned
+    by (subject, class). They are cached per exam under a key that includes
+    the exam's grade count and latest update, so any grade written, deleted
+    or bulk imported for the exam invalidates them in every process.
+    """
+    stamp = Grade.objects.filter(exam_id=exam_id).aggregate(count=Count('pk'), updated=Max('updated_at'))
+    if not stamp['count']:
+        return []
+    key = f'exam-rankings:{exam_id}:{stamp["count"]}:{stamp["updated"].timestamp()}'
+    rows = cache.get(key)
+    if rows is None:
+        rows = _compute(exam_id)
+        cache.set(key, rows, CACHE_TIMEOUT)
+    return rows
+
+
+def _compute(exam_id):
+    partition = [F('subject_id'), F('student__class_instance_id')]
+    window = lambda expression, **kwargs: Window(expression, partition_by=partition, **kwargs)
+    grades = (
+        Grade.objects.filter(exam_id=exam_id)
+        .annotate(
+            class_instance=F('student__class_instance_id'),
+            rank=window(Rank(), order_by=F('marks').desc()),
+            dense_rank=window(DenseRank(), order_by=F('marks').desc()),
+            cume_dist=window(CumeDist(), order_by=F('marks').asc()),
+            mean=window(Avg('marks')),
+            mean_square=window(Avg(F('marks') * F('marks'))),
+            cohort_size=window(Count('pk')),
+        )
+        .values_list(
+            'pk', 'student_id', 'subject_id', 'class_instance', 'marks',
+            'rank', 'dense_rank', 'cume_dist', 'mean', 'mean_square', 'cohort_size',
+        )
+        .order_by()
+    )
+    rows = []
+    for grade, student, subject, class_instance, marks, rank, dense_rank, cume_dist, mean, mean_square, size in grades:
+        deviation = math.sqrt(max(mean_square - mean * mean, 0.0))
+        rows.append({
+            'grade': grade,
+            'student': student,
+            'subject': subject,
+            'class_instance': class_instance,
+            'marks': marks,
+            'rank': rank,
+            'dense_rank': dense_rank,
+            'percentile': round(100 * cume_dist, 2),
+            'z_score': round((marks - mean) / deviation, 3) if deviation > 1e-9 else 0.0,
+            'cohort_size': size,
+        })
+    return rows
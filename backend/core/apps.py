@@ -1,5 +1,27 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_save
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from .search import install_after_migrate
+        post_migrate.connect(install_after_migrate, sender=self)
+
+        from . import authentication, inbox, ledger, rollups, versions
+        from .models import Attendance, Fee, Message, User
+        pre_save.connect(rollups.capture_previous, sender=Attendance)
+        post_save.connect(rollups.attendance_saved, sender=Attendance)
+        post_delete.connect(rollups.attendance_deleted, sender=Attendance)
+        pre_save.connect(ledger.capture_previous, sender=Fee)
+        post_save.connect(ledger.fee_saved, sender=Fee)
+        post_delete.connect(ledger.fee_deleted, sender=Fee)
+        pre_save.connect(inbox.capture_previous, sender=Message)
+        post_save.connect(inbox.message_saved, sender=Message)
+        post_delete.connect(inbox.message_deleted, sender=Message)
+        post_save.connect(authentication.user_changed, sender=User)
+        post_delete.connect(authentication.user_changed, sender=User)
+        for model in self.get_models():
+            if any(field.name == 'updated_at' for field in model._meta.fields):
+                versions.track_model(model)
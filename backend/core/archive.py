@@ -0,0 +1,208 @@
+import datetime
+import gzip
+import json
+import os
+import re
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import AuditLog
+
+# Archived audit rows are gzipped NDJSON segments grouped in one directory per
+# calendar month (`YYYY-MM/`), so a time-range query only opens the months it
+# overlaps.
+PARTITION_PATTERN = re.compile(r'^(\d{4})-(\d{2})$')
+
+FIELDS = ('id', 'user_id', 'action', 'model_name', 'object_id', 'details', 'created_at')
+
+
+def archive_dir():
+    return Path(getattr(settings, 'AUDIT_ARCHIVE_DIR', settings.BASE_DIR / 'archive' / 'audit'))
+
+
+def partition_dir(year, month):
+    return archive_dir() / f'{year:04d}-{month:02d}'
+
+
+def months_ago(months, now=None):
+    """
+    Returns the start of the day `months` calendar months before `now`.
+    """
+    now = timezone.localtime(now or timezone.now())
+    month = now.month - months
+    year = now.year + (month - 1) // 12
+    month = (month - 1) % 12 + 1
+    day = min(now.day, _days_in_month(year, month))
+    return now.replace(year=year, month=month, day=day, hour=0, minute=0, second=0, microsecond=0)
+
+
+def archive_before(cutoff, batch_size=5000):
+    """
+    Moves audit rows created before `cutoff` into their month's partition
+    and deletes them from the table, oldest first, `batch_size` rows at a
+    time. Returns {partition name: rows moved}.
+
+    Each batch is written as a new segment file under a temporary name and
+    renamed into place before its rows are deleted. Readers skip ids they
+    have already seen, so a crash between the two steps only leaves
+    duplicates that are never returned.
+    """
+    moved = {}
+    queryset = AuditLog.objects.filter(created_at__lt=cutoff).order_by('created_at', 'id').values_list(*FIELDS)
+    while True:
+        rows = list(queryset[:batch_size])
+        if not rows:
+            return moved
+        by_month = {}
+        for row in rows:
+            created = timezone.localtime(row[-1])
+            by_month.setdefault((created.year, created.month), []).append(row)
+        for month, month_rows in by_month.items():
+            name = _write_segment(month, month_rows)
+            moved[name] = moved.get(name, 0) + len(month_rows)
+            ids = [row[0] for row in month_rows]
+            with transaction.atomic():
+                for start in range(0, len(ids), 500):
+                    AuditLog.objects.filter(pk__in=ids[start:start + 500]).delete()
+
+
+def count_before(cutoff):
+    """
+    Returns {partition name: rows} that archive_before(cutoff) would move.
+    """
+    rows = (
+        AuditLog.objects.filter(created_at__lt=cutoff).annotate(month=TruncMonth('created_at'))
+        .values('month').annotate(rows=Count('pk')).order_by('month')
+    )
+    return {partition_dir(row['month'].year, row['month'].month).name: row['rows'] for row in rows}
+
+
+def _write_segment(month, rows):
+    directory = partition_dir(*month)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f'auditlog-{rows[0][0]}-{rows[-1][0]}.ndjson.gz'
+    fd, temp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            with gzip.GzipFile(fileobj=out, mode='wb') as segment:
+                for row in rows:
+                    segment.write(json.dumps(dict(zip(FIELDS, row)), cls=DjangoJSONEncoder).encode('utf-8') + b'\n')
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(temp, path)
+    except BaseException:
+        os.unlink(temp)
+        raise
+    return directory.name
+
+
+def partitions(start=None, end=None):
+    """
+    Returns (year, month, directory) for the partitions overlapping
+    [start, end], newest first.
+    """
+    directory = archive_dir()
+    if not directory.is_dir():
+        return []
+    found = []
+    for path in directory.iterdir():
+        match = PARTITION_PATTERN.match(path.name)
+        if not match or not path.is_dir():
+            continue
+        year, month = int(match.group(1)), int(match.group(2))
+        first, last = _month_start(year, month), _month_end(year, month)
+        if (start is None or last > start) and (end is None or first <= end):
+            found.append((year, month, path))
+    return sorted(found, reverse=True)
+
+
+def read_partition(directory):
+    seen = set()
+    for path in sorted(directory.glob('auditlog-*.ndjson.gz')):
+        with gzip.open(path, 'rt', encoding='utf-8') as segment:
+            for line in segment:
+                row = json.loads(line)
+                if row['id'] in seen:
+                    continue
+                seen.add(row['id'])
+                row['created_at'] = parse_datetime(row['created_at'])
+                yield row
+
+
+def search(filters, limit, before=None):
+    """
+    Returns up to `limit` archived rows matching ORM-style `filters` (as
+    produced by FieldFilterBackend for AuditLog), newest first, plus the
+    names of the partitions that were read. `before` is an optional
+    (created_at, id) keyset position; only rows after it are returned.
+
+    Only partitions overlapping the created_at bounds are opened, newest
+    first, and reading stops once older partitions cannot contribute to the
+    newest `limit` rows.
+    """
+    start, end = _bounds(filters)
+    if before is not None and (end is None or before[0] < end):
+        end = before[0]
+    results, scanned = [], []
+    for year, month, path in partitions(start, end):
+        if len(results) >= limit and results[limit - 1]['created_at'] >= _month_end(year, month):
+            break
+        scanned.append(path.name)
+        results.extend(
+            row for row in read_partition(path)
+            if _matches(row, filters) and (before is None or (row['created_at'], row['id']) < before)
+        )
+        results.sort(key=lambda row: (row['created_at'], row['id']), reverse=True)
+        del results[limit:]
+    return results, scanned
+
+
+def _bounds(filters):
+    start = filters.get('created_at__gte') or filters.get('created_at__gt')
+    end = filters.get('created_at__lte') or filters.get('created_at__lt')
+    return start, end
+
+
+def _matches(row, filters):
+    for key, expected in filters.items():
+        field, _, lookup = key.rpartition('__')
+        value = row.get('user_id' if field == 'user' else field)
+        if lookup == 'exact' and value != _like(value, expected):
+            return False
+        if lookup == 'in' and value not in [_like(value, item) for item in expected]:
+            return False
+        if lookup == 'gte' and not value >= expected:
+            return False
+        if lookup == 'gt' and not value > expected:
+            return False
+        if lookup == 'lte' and not value <= expected:
+            return False
+        if lookup == 'lt' and not value < expected:
+            return False
+    return True
+
+
+def _like(value, expected):
+    # Archived foreign keys are plain ids; filters may carry model instances.
+    return getattr(expected, 'pk', expected)
+
+
+def _month_start(year, month):
+    return timezone.make_aware(datetime.datetime(year, month, 1))
+
+
+def _month_end(year, month):
+    return _month_start(year, month) + datetime.timedelta(days=_days_in_month(year, month))
+
+
+def _days_in_month(year, month):
+    following = datetime.date(year + month // 12, month % 12 + 1, 1)
+    return (following - datetime.timedelta(days=1)).day
@@ -0,0 +1,246 @@
+import atexit
+import json
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, router, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Fields whose values are never copied into the audit trail.
+MASKED_FIELDS = {'password'}
+IGNORED_FIELDS = {'created_at', 'updated_at', 'last_login'}
+
+
+class AuditBuffer:
+    """
+    Bounded in-process queue of unsaved AuditLog rows, each with the alias
+    and name of the database it belongs to. A daemon thread writes them with
+    bulk_create once `batch_size` are waiting or `flush_interval` seconds
+    have passed. When the queue is full the caller flushes it inline, so
+    memory stays bounded without dropping entries.
+    """
+    def __init__(self, batch_size=200, flush_interval=2.0, max_size=10000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_size)
+        self.wakeup = threading.Event()
+        self.lock = threading.Lock()
+        self.start_lock = threading.Lock()
+        self.thread = None
+        self.closed = False
+
+    def put(self, entry, using=DEFAULT_DB_ALIAS):
+        item = (using, connections[using].settings_dict['NAME'], entry)
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.flush()
+            self.queue.put_nowait(item)
+        if self.queue.qsize() >= self.batch_size:
+            self.wakeup.set()
+        self._ensure_thread()
+
+    def flush(self):
+        """
+        Writes every queued entry and returns how many were written.
+        """
+        written = 0
+        with self.lock:
+            while True:
+                batch = self._take(self.batch_size)
+                if not batch:
+                    return written
+                databases = {}
+                for using, name, entry in batch:
+                    databases.setdefault((using, name), []).append(entry)
+                for (using, name), entries in databases.items():
+                    written += self._write_to(using, name, entries)
+
+    def _write_to(self, using, name, entries):
+        # The alias may point elsewhere by now, e.g. once a test database is dropped.
+        if connections[using].settings_dict['NAME'] != name:
+            logger.warning('Dropped %d audit log entries for %s, which %r no longer uses', len(entries), name, using)
+            return 0
+        try:
+            return _write(entries, using)
+        except Exception:
+            logger.exception('Could not write %d audit log entries', len(entries))
+            return 0
+
+    def close(self):
+        self.closed = True
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def _take(self, limit):
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _ensure_thread(self):
+        if self.thread is None and not self.closed:
+            with self.start_lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+                    self.thread.start()
+
+    def _run(self):
+        try:
+            while not self.closed:
+                self.wakeup.wait(self.flush_interval)
+                self.wakeup.clear()
+                self.flush()
+        finally:
+            connections.close_all()
+
+
+def _write(entries, using=DEFAULT_DB_ALIAS):
+    """
+    Inserts `entries` with one bulk_create and returns how many were written.
+    When the batch violates a constraint, such as an entry whose user was
+    deleted while it was queued, each entry is retried on its own so only
+    the bad ones are lost.
+    """
+    from .models import AuditLog
+    try:
+        # Foreign keys are checked when this commits, not per statement.
+        with transaction.atomic(using=using):
+            AuditLog.objects.using(using).bulk_create(entries)
+        return len(entries)
+    except IntegrityError:
+        pass
+    written = 0
+    for entry in entries:
+        entry.pk = None
+        entry._state.adding = True
+        try:
+            with transaction.atomic(using=using):
+                AuditLog.objects.using(using).bulk_create([entry])
+            written += 1
+        except IntegrityError:
+            logger.exception(
+                'Could not write audit log entry %s %s %s for user %s',
+                entry.action, entry.model_name, entry.object_id, entry.user_id,
+            )
+    return written
+
+
+_buffer = None
+
+
+def get_buffer():
+    global _buffer
+    if _buffer is None:
+        _buffer = AuditBuffer(
+            batch_size=getattr(settings, 'AUDIT_BATCH_SIZE', 200),
+            flush_interval=getattr(settings, 'AUDIT_FLUSH_INTERVAL', 2.0),
+            max_size=getattr(settings, 'AUDIT_QUEUE_SIZE', 10000),
+        )
+        atexit.register(_buffer.close)
+    return _buffer
+
+
+def drain():
+    """
+    Writes all pending audit entries now; call before a process exits
+    outside the normal interpreter shutdown.
+    """
+    return _buffer.flush() if _buffer is not None else 0
+
+
+def shutdown():
+    """
+    Writes pending entries and stops the writer thread, closing its
+    database connection; the next record() starts a new one. For callers
+    that swap the database underneath the process, such as the test runner
+    and benchmarks.
+    """
+    global _buffer
+    if _buffer is not None:
+        _buffer.close()
+        atexit.unregister(_buffer.close)
+        _buffer = None
+
+
+def record(user, action, model_name, object_id='', details=''):
+    """
+    Queues an audit entry to be written once the current transaction
+    commits. Costs an object allocation and a queue put; the insert happens
+    later on the writer thread (or inline when AUDIT_ASYNC is off).
+    """
+    from .models import AuditLog
+    if user is None or not user.is_authenticated:
+        return
+    if not isinstance(details, str):
+        details = json.dumps(details, cls=DjangoJSONEncoder)
+    using = router.db_for_write(AuditLog)
+    entry = AuditLog(
+        user_id=user.pk, action=action, model_name=model_name, object_id=str(object_id),
+        details=details, created_at=timezone.now(),
+    )
+    if getattr(settings, 'AUDIT_ASYNC', True):
+        transaction.on_commit(lambda: get_buffer().put(entry, using), using=using)
+    else:
+        transaction.on_commit(lambda: _write([entry], using), using=using)
+
+
+def snapshot(instance):
+    values = {}
+    for field in instance._meta.concrete_fields:
+        if field.name in IGNORED_FIELDS:
+            continue
+        values[field.attname] = field.value_from_object(instance)
+    return values
+
+
+def diff(before, after):
+    """
+    Returns {field: [old, new]} for the fields that differ between two
+    snapshots; a missing snapshot counts as all-None.
+    """
+    before, after = before or {}, after or {}
+    changes = {}
+    for name in after or before:
+        old, new = before.get(name), after.get(name)
+        if old != new:
+            changes[name] = ['***', '***'] if name in MASKED_FIELDS else [old, new]
+    return changes
+
+
+class AuditMixin:
+    """
+    Audits creates, updates and deletes made through the viewset, with the
+    changed fields as `details`. Entries are queued, not inserted, during
+    the request.
+    """
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        self.audit('CREATE', serializer.instance, None, snapshot(serializer.instance))
+
+    def perform_update(self, serializer):
+        before = snapshot(serializer.instance)
+        super().perform_update(serializer)
+        self.audit('UPDATE', serializer.instance, before, snapshot(serializer.instance))
+
+    def perform_destroy(self, instance):
+        before, pk = snapshot(instance), instance.pk
+        super().perform_destroy(instance)
+        instance.pk = pk
+        self.audit('DELETE', instance, before, None)
+
+    def audit(self, action, instance, before, after):
+        changes = diff(before, after)
+        if action == 'UPDATE' and not changes:
+            return
+        record(self.request.user, action, instance.__class__.__name__, instance.pk, {'changes': changes})
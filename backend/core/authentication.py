@@ -0,0 +1,151 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, transaction
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from . import versions
+
+# User fields copied into access tokens, so a request can be authorised
+# from the token alone when AUTH_TRUST_TOKEN_CLAIMS is on.
+CLAIM_FIELDS = ('username', 'email', 'role', 'is_superuser', 'is_staff', 'is_active')
+
+# Version stamp bumped whenever a user is saved or deleted in any worker.
+VERSION = 'auth-users'
+
+
+class UserCache:
+    """
+    Thread-safe LRU of user rows keyed by id, each entry expiring `ttl`
+    seconds after it was loaded. Stores field values, not instances, so
+    every request gets its own User without shared relation caches.
+
+    Each entry keeps the users version stamp read before its row was. A
+    user change in any worker replaces the stamp, so rows read before it,
+    including by a reader racing the change, are never used again.
+    """
+    def __init__(self, max_size=10000, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        model = get_user_model()
+        self.model = model
+        self.names = [field.attname for field in model._meta.concrete_fields]
+
+    def get(self, user_id, stamp):
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None:
+                return None
+            expires, entry_stamp, values = entry
+            if entry_stamp != stamp or expires <= time.monotonic():
+                del self.entries[user_id]
+                return None
+            self.entries.move_to_end(user_id)
+        return self.model.from_db(DEFAULT_DB_ALIAS, self.names, values)
+
+    def put(self, user, stamp):
+        values = tuple(getattr(user, name) for name in self.names)
+        with self.lock:
+            self.entries[user.pk] = (time.monotonic() + self.ttl, stamp, values)
+            self.entries.move_to_end(user.pk)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_user_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = UserCache(
+                    max_size=getattr(settings, 'AUTH_USER_CACHE_SIZE', 10000),
+                    ttl=getattr(settings, 'AUTH_USER_CACHE_TTL', 300),
+                )
+    return _cache
+
+
+_bump = versions.bump_on_change(VERSION)
+
+
+def user_changed(sender, update_fields=None, **kwargs):
+    """
+    post_save/post_delete: bumps the users version, dropping cached users
+    in every worker. Covers deactivation and password changes, which are
+    saves; queryset.update() bypasses signals, so callers using it on users
+    must call versions.bump(VERSION).
+    """
+    # Logins only write last_login, which grants nothing.
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    _bump(sender, **kwargs)
+
+
+def add_claims(token, user):
+    for name in CLAIM_FIELDS:
+        token[name] = getattr(user, name)
+    return token
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves users through the process-wide
+    UserCache, so steady-state requests run no authentication query.
+
+    With AUTH_TRUST_TOKEN_CLAIMS on, a cache miss is answered from the
+    user fields embedded in the token instead of the database, as long as
+    no user has changed in any worker since the token was issued.
+    """
+    def get_user(self, validated_token):
+        try:
+            user_id = self.user_model._meta.pk.to_python(validated_token[api_settings.USER_ID_CLAIM])
+        except KeyError:
+            raise InvalidToken('Token contained no recognizable user identification')
+
+        cache = get_user_cache()
+        stamp = versions.current(VERSION)
+        user = cache.get(user_id, stamp)
+        if user is None and self.trust_claims(validated_token, stamp):
+            user = self.user_from_claims(validated_token, user_id)
+        elif user is None:
+            user = super().get_user(validated_token)
+            transaction.on_commit(lambda: cache.put(user, stamp))
+            return user
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN and (
+            validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password)
+        ):
+            raise AuthenticationFailed("The user's password has been changed.", code='password_changed')
+        return user
+
+    def trust_claims(self, validated_token, stamp):
+        return (
+            getattr(settings, 'AUTH_TRUST_TOKEN_CLAIMS', False)
+            # Revocation compares the stored password hash, which claims lack.
+            and not api_settings.CHECK_REVOKE_TOKEN
+            and all(name in validated_token for name in (*CLAIM_FIELDS, 'iat'))
+            and validated_token['iat'] > versions.bumped_at(stamp)
+        )
+
+    def user_from_claims(self, validated_token, user_id):
+        user = self.user_model(pk=user_id, **{name: validated_token[name] for name in CLAIM_FIELDS})
+        user._state.adding = False
+        user._state.db = DEFAULT_DB_ALIAS
+        return user
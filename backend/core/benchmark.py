@@ -0,0 +1,138 @@
+import datetime
+import itertools
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import seeding
+from .models import Fee, User
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Fixed so every run seeds the same rows.
+END_DATE = datetime.date(2025, 12, 31)
+
+
+def build_dataset(students, seed=0):
+    """
+    Seeds one school year for `students` students and returns the users and
+    ids the scenarios need: the admin, and a parent with fees left to pay.
+    """
+    seeding.seed_school(students, years=1, seed=seed, end_date=END_DATE, attendance_days=5, prefix='bench')
+    admin = User.objects.get(username='bench-admin')
+    fee = Fee.objects.filter(balance__gt=100).select_related('student').order_by('pk').first()
+    parent = fee.student.parents.order_by('pk').first()
+    payable = list(Fee.objects.filter(student__parents=parent, balance__gt=100).values_list('pk', flat=True))
+    return {'admin': admin, 'parent': parent, 'payable_fees': payable}
+
+
+# name: (role, method, build(dataset, counter) -> (path, data))
+SCENARIOS = {
+    'grades-list': ('admin', 'get', lambda dataset, n: ('/api/grades/', None)),
+    'students-list': ('admin', 'get', lambda dataset, n: ('/api/students/', None)),
+    'fee-pay': ('parent', 'post', lambda dataset, n: (
+        f"/api/fees/{dataset['payable_fees'][n % len(dataset['payable_fees'])]}/pay/",
+        {'amount': '1.00', 'payment_method': 'card', 'idempotency_key': uuid.uuid4().hex},
+    )),
+}
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def run_scenario(name, dataset, requests, concurrency):
+    """
+    Sends `requests` requests for scenario `name` from `concurrency` threads,
+    each with its own client and database connection, and returns the
+    latency percentiles, throughput and per-request query counts.
+    """
+    role, method, build = SCENARIOS[name]
+    token = str(AccessToken.for_user(dataset[role]))
+    counter = itertools.count()
+    lock = threading.Lock()
+    latencies, queries, errors = [], [], []
+
+    def worker():
+        # Server errors are counted, not raised, like a real client sees them.
+        client = APIClient(raise_request_exception=False)
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        try:
+            while True:
+                with lock:
+                    n = next(counter)
+                if n >= requests:
+                    return
+                path, data = build(dataset, n)
+                queries_counter = QueryCounter()
+                start = time.perf_counter()
+                with connection.execute_wrapper(queries_counter):
+                    response = getattr(client, method)(path, data, format='json')
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+                    queries.append(queries_counter.count)
+                    if response.status_code >= 400:
+                        errors.append(response.status_code)
+        finally:
+            connection.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    wall = time.perf_counter() - started
+
+    return {
+        'endpoint': name,
+        'method': method.upper(),
+        'requests': len(latencies),
+        'errors': len(errors),
+        'error_statuses': sorted(set(errors)),
+        'p50_ms': _ms(percentile(latencies, 50)),
+        'p95_ms': _ms(percentile(latencies, 95)),
+        'p99_ms': _ms(percentile(latencies, 99)),
+        'mean_ms': _ms(statistics.fmean(latencies)) if latencies else None,
+        'rps': round(len(latencies) / wall, 1) if wall else None,
+        'queries': {
+            'median': statistics.median(queries) if queries else None,
+            'max': max(queries, default=None),
+        },
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of `values`, or None when empty.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux; the peak covers the whole process.
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
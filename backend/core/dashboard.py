@@ -0,0 +1,98 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+from django.http import QueryDict
+from django.urls import reverse
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.request import Request
+
+from . import requestlog
+
+# Router prefixes rendered on each role's first screen.
+SECTIONS = {
+    'admin': [
+        'users', 'classes', 'subjects', 'exams', 'grades', 'attendance', 'fees',
+        'announcements', 'messages', 'timetables', 'homework', 'library-items',
+        'library-borrowings', 'leave-applications', 'report-cards', 'parent-feedback',
+        'audit-logs', 'school-settings',
+    ],
+    'teacher': ['grades', 'attendance', 'homework', 'timetables', 'announcements', 'messages'],
+    'student': ['timetables', 'homework', 'grades', 'report-cards', 'announcements', 'messages'],
+    'parent': ['fees', 'grades', 'report-cards', 'announcements', 'messages'],
+    'staff': ['students', 'fees', 'library-borrowings', 'leave-applications', 'messages'],
+}
+
+
+def build_dashboard(request, role):
+    """
+    Renders the first page and count of every section on `role`'s dashboard,
+    scoped as each section's own endpoint would be when the dashboard passes
+    `<role>_id=<user id>`. Sections the user may not read are left out.
+
+    Independent sections are built on a pool of `DASHBOARD_WORKERS` threads,
+    except inside a transaction, whose uncommitted rows other connections
+    could not see.
+    """
+    from .urls import router
+
+    viewsets = {prefix: (viewset, basename) for prefix, viewset, basename in router.registry}
+    params = {f'{role}_id': str(request.user.pk)}
+    sections = [(name,) + viewsets[name] for name in SECTIONS[role]]
+    build = lambda section: (section[0], _build_section(request, section[1], section[2], params))
+
+    workers = getattr(settings, 'DASHBOARD_WORKERS', 4)
+    if workers <= 1 or connection.in_atomic_block:
+        built = [build(section) for section in sections]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            built = list(executor.map(_in_own_connection(requestlog.propagate(build)), sections))
+    return {name: data for name, data in built if data is not None}
+
+
+def _build_section(request, view_class, basename, params):
+    request = _section_request(request, reverse(f'{basename}-list'), params)
+    view = view_class(request=request, args=(), kwargs={}, format_kwarg=None, action='list')
+    view.headers = {}
+    try:
+        view.check_permissions(request)
+    except PermissionDenied:
+        return None
+    if view.paginator is None:
+        return view.list(request).data
+
+    queryset = view.filter_queryset(view.get_queryset())
+    page = view.paginate_queryset(queryset)
+    return {
+        'count': queryset.count(),
+        'next': view.paginator.get_next_link(),
+        'results': view.get_serializer(page, many=True).data,
+    }
+
+
+def _section_request(request, path, params):
+    """
+    Returns a copy of `request` for the section's list `path` carrying
+    `params` as its query string and the already authenticated user, so
+    sections neither authenticate again nor link back to the dashboard.
+    """
+    http_request = request._request
+    section = http_request.__class__.__new__(http_request.__class__)
+    section.__dict__.update(http_request.__dict__)
+    query = QueryDict(mutable=True)
+    query.update(params)
+    section.GET = query
+    section.path = section.path_info = path
+    section.META = dict(http_request.META, QUERY_STRING=query.urlencode(), PATH_INFO=path)
+    clone = Request(section, parsers=request.parsers, authenticators=request.authenticators, negotiator=request.negotiator)
+    clone.user, clone.auth = request.user, request.auth
+    return clone
+
+
+def _in_own_connection(func):
+    def wrapper(*args):
+        try:
+            return func(*args)
+        finally:
+            connection.close()
+    return wrapper
@@ -0,0 +1,88 @@
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+
+class FieldFilterBackend(BaseFilterBackend):
+    """
+    Applies the view's declared `filterset_fields` from the query string.
+
+    `filterset_fields` maps a query parameter to the lookups it accepts, e.g.
+    `{'role': ['exact', 'in'], 'date': ['gte', 'lte']}` enables `?role=`,
+    `?role__in=a,b`, `?date__gte=` and `?date__lte=`. A parameter may target
+    another ORM path with a `(path, lookups)` tuple, e.g.
+    `{'class_instance': ('student__class_instance', ['exact'])}`.
+    """
+    def filter_queryset(self, request, queryset, view):
+        filters = self.get_filters(request, queryset.model, getattr(view, 'filterset_fields', {}))
+        if filters:
+            queryset = queryset.filter(**filters)
+        return queryset
+
+    def get_filters(self, request, model, declared):
+        filters, errors = {}, {}
+        for param, spec in declared.items():
+            path, lookups = spec if isinstance(spec, tuple) else (param, spec)
+            for lookup in lookups:
+                name = param if lookup == 'exact' else f'{param}__{lookup}'
+                if name not in request.query_params:
+                    continue
+                raw = request.query_params[name]
+                try:
+                    filters[f'{path}__{lookup}'] = _coerce(model, path, lookup, raw)
+                except (DjangoValidationError, ValueError):
+                    errors[name] = [f'Invalid value "{raw}".']
+        if errors:
+            raise ValidationError(errors)
+        return filters
+
+    def get_schema_operation_parameters(self, view):
+        parameters = []
+        for param, spec in getattr(view, 'filterset_fields', {}).items():
+            lookups = spec[1] if isinstance(spec, tuple) else spec
+            for lookup in lookups:
+                parameters.append({
+                    'name': param if lookup == 'exact' else f'{param}__{lookup}',
+                    'required': False,
+                    'in': 'query',
+                    'schema': {'type': 'string'},
+                })
+        return parameters
+
+
+def _coerce(model, path, lookup, raw):
+    if lookup == 'isnull':
+        return _boolean(raw)
+    field = _resolve(model, path)
+    if lookup == 'in':
+        return [_to_python(field, value) for value in raw.split(',') if value != '']
+    return _to_python(field, raw)
+
+
+def _resolve(model, path):
+    field = None
+    for part in path.split('__'):
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            raise ValueError(path)
+        if field.is_relation:
+            model = field.related_model
+    if field.is_relation:
+        field = field.related_model._meta.pk
+    return field
+
+
+def _to_python(field, raw):
+    if field.get_internal_type() == 'BooleanField':
+        return _boolean(raw)
+    return field.to_python(raw)
+
+
+def _boolean(raw):
+    value = raw.lower()
+    if value in ('true', '1', 'yes'):
+        return True
+    if value in ('false', '0', 'no'):
+        return False
+    raise ValueError(raw)
@@ -0,0 +1,340 @@
+import copy
+import csv
+import io
+import math
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from . import ledger
+from .models import Exam, Fee, Grade, LibraryItem, Student, Subject
+
+
+class ImportFileError(Exception):
+    pass
+
+
+def iter_rows(upload):
+    """
+    Yields each data row of an uploaded CSV or XLSX file as a dict keyed by
+    the lower-cased header, reading the file incrementally.
+    """
+    name = (upload.name or '').lower()
+    if name.endswith('.xlsx'):
+        return _iter_xlsx(upload)
+    if name.endswith('.csv') or not name:
+        return _iter_csv(upload)
+    raise ImportFileError('Upload a .csv or .xlsx file.')
+
+
+def _iter_csv(upload):
+    text = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+    try:
+        reader = csv.reader(text)
+        header = [column.strip().lower() for column in next(reader, [])]
+        for values in reader:
+            if any(value.strip() for value in values):
+                yield dict(zip(header, (value.strip() for value in values)))
+    except (UnicodeDecodeError, csv.Error) as exc:
+        raise ImportFileError(f'Could not read CSV file: {exc}')
+    finally:
+        text.detach()
+
+
+def _iter_xlsx(upload):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportFileError('XLSX import requires the openpyxl package; upload a CSV file instead.')
+    workbook = load_workbook(upload.file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(column or '').strip().lower() for column in next(rows, ())]
+        for values in rows:
+            values = ['' if value is None else str(value).strip() for value in values]
+            if any(values):
+                yield dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+class RowError(Exception):
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+class Importer:
+    """
+    Imports rows a chunk at a time: foreign keys for the whole chunk are
+    resolved with one query each, rows are validated in memory, and valid
+    rows are written with bulk_create/bulk_update in one transaction per
+    chunk. Invalid rows are reported by line number and skipped.
+    """
+    model = None
+    required_columns = ()
+    chunk_size = 1000
+    max_errors = 1000
+    update_fields = ()
+
+    def __init__(self, user, dry_run=False):
+        self.user = user
+        self.dry_run = dry_run
+        self.created = 0
+        self.updated = 0
+        self.rows = 0
+        self.error_count = 0
+        self.errors = []
+
+    def run(self, rows):
+        rows = iter(rows)
+        line = 1
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            if self.rows == 0:
+                self.check_columns(chunk[0])
+            numbered = list(enumerate(chunk, start=line + 1))
+            line += len(chunk)
+            self.rows += len(chunk)
+            self.import_chunk(numbered)
+        return self.report()
+
+    def check_columns(self, row):
+        missing = [column for column in self.required_columns if column not in row]
+        if missing:
+            raise ImportFileError(f'Missing required columns: {", ".join(missing)}')
+
+    def import_chunk(self, numbered):
+        lookups = self.resolve([row for _, row in numbered])
+        queued = {}
+        for line, row in numbered:
+            try:
+                self.check_row(row)
+                instance, created = self.build(row, lookups)
+                instance.full_clean(exclude=self.unvalidated_fields(), validate_unique=False, validate_constraints=False)
+            except RowError as exc:
+                self.add_error(line, exc.errors)
+                continue
+            except ValidationError as exc:
+                self.add_error(line, exc.message_dict)
+                continue
+            # A later valid row for the same key replaces the queued object.
+            queued[self.key(instance)] = (instance, created)
+
+        new = [instance for instance, created in queued.values() if created]
+        changed = [instance for instance, created in queued.values() if not created]
+        if not self.dry_run:
+            with transaction.atomic():
+                self.write(new, changed)
+        self.created += len(new)
+        self.updated += len(changed)
+
+    def check_row(self, row):
+        # Rows shorter than the header are missing their last columns.
+        missing = [column for column in self.required_columns if column not in row]
+        if missing:
+            raise RowError({column: ['This column is missing from the row.'] for column in missing})
+
+    def write(self, new, changed):
+        if new:
+            self.model.objects.bulk_create(new)
+        if changed:
+            now = timezone.now()
+            for instance in changed:
+                instance.updated_at = now
+            self.model.objects.bulk_update(changed, list(self.update_fields) + ['updated_at'])
+
+    def unvalidated_fields(self):
+        # Relations are resolved in bulk by resolve(); skip Django's per-row
+        # existence queries for them.
+        return [field.name for field in self.model._meta.fields if field.is_relation]
+
+    def add_error(self, line, errors):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'row': line, 'errors': errors})
+
+    def report(self):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'updated': self.updated,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'dry_run': self.dry_run,
+        }
+
+    def resolve(self, rows):
+        return {}
+
+    def build(self, row, lookups):
+        """
+        Returns (instance, created) for a row. Existing objects from
+        `lookups` are copied rather than changed, so a row that fails
+        validation leaves nothing behind.
+        """
+        raise NotImplementedError
+
+    def key(self, instance):
+        """
+        Identifies the object a row writes; rows sharing a key in one chunk
+        write it once, with the last valid row's values.
+        """
+        return id(instance)
+
+
+def _number(row, column, errors, cast=float):
+    try:
+        value = cast(row.get(column))
+        # nan and inf pass the range validators but cannot be stored.
+        if not math.isfinite(value):
+            raise ValueError(value)
+        return value
+    except (TypeError, ValueError, InvalidOperation):
+        errors[column] = ['A valid number is required.']
+
+
+def _students_by_admission_number(rows):
+    numbers = {row.get('admission_number') for row in rows}
+    return {student.admission_number: student for student in Student.objects.filter(admission_number__in=numbers)}
+
+
+class GradeImporter(Importer):
+    """
+    Columns: admission_number, subject_code, exam_name, exam_term, exam_year,
+    marks and optional remarks. An existing grade for the same student,
+    subject and exam is updated.
+    """
+    model = Grade
+    required_columns = ('admission_number', 'subject_code', 'exam_name', 'exam_term', 'exam_year', 'marks')
+    update_fields = ('marks', 'remarks')
+
+    def resolve(self, rows):
+        students = _students_by_admission_number(rows)
+        subjects = {subject.code: subject for subject in Subject.objects.filter(code__in={row.get('subject_code') for row in rows})}
+        keys = {(row.get('exam_name'), row.get('exam_term'), row.get('exam_year')) for row in rows}
+        exam_filter = Q(pk__in=[])
+        for name, term, year in keys:
+            if year and year.isdigit():
+                exam_filter |= Q(name=name, term=term, year=int(year))
+        exams = {(exam.name, exam.term, str(exam.year)): exam for exam in Exam.objects.filter(exam_filter)}
+        existing = {
+            (grade.student_id, grade.subject_id, grade.exam_id): grade
+            for grade in Grade.objects.filter(
+                student__in=students.values(), subject__in=subjects.values(), exam__in=exams.values(),
+            )
+        }
+        return {'students': students, 'subjects': subjects, 'exams': exams, 'existing': existing}
+
+    def build(self, row, lookups):
+        errors = {}
+        student = lookups['students'].get(row.get('admission_number'))
+        if student is None:
+            errors['admission_number'] = [f'No student with admission number "{row.get("admission_number", "")}".']
+        subject = lookups['subjects'].get(row.get('subject_code'))
+        if subject is None:
+            errors['subject_code'] = [f'No subject with code "{row.get("subject_code", "")}".']
+        exam = lookups['exams'].get((row.get('exam_name'), row.get('exam_term'), row.get('exam_year')))
+        if exam is None:
+            errors['exam_name'] = ['No exam with this name, term and year.']
+        marks = _number(row, 'marks', errors)
+        if exam is not None and marks is not None and marks > exam.max_marks:
+            errors['marks'] = [f'Marks exceed the exam maximum of {exam.max_marks}.']
+        if errors:
+            raise RowError(errors)
+
+        grade = lookups['existing'].get((student.pk, subject.pk, exam.pk))
+        created = grade is None
+        if created:
+            grade = Grade(student=student, subject=subject, exam=exam, created_by=self.user)
+        else:
+            grade = copy.copy(grade)
+        grade.marks = marks
+        grade.remarks = row.get('remarks', '')
+        return grade, created
+
+    def key(self, grade):
+        return (grade.student_id, grade.subject_id, grade.exam_id)
+
+
+class FeeImporter(Importer):
+    """
+    Columns: admission_number, amount, date (YYYY-MM-DD) and optional balance
+    (defaults to amount, and no more than it) and payment_method. Every row
+    creates a fee.
+    """
+    model = Fee
+    required_columns = ('admission_number', 'amount', 'date')
+
+    def resolve(self, rows):
+        return {'students': _students_by_admission_number(rows)}
+
+    def write(self, new, changed):
+        super().write(new, changed)
+        # bulk_create sends no signals, so the fee accounts are updated here.
+        ledger.fees_created(new)
+
+    def build(self, row, lookups):
+        errors = {}
+        student = lookups['students'].get(row.get('admission_number'))
+        if student is None:
+            errors['admission_number'] = [f'No student with admission number "{row.get("admission_number", "")}".']
+        amount = _number(row, 'amount', errors, cast=Decimal)
+        balance = _number(row, 'balance', errors, cast=Decimal) if row.get('balance') else amount
+        if amount is not None and amount < 0:
+            errors['amount'] = ['The amount cannot be negative.']
+        elif balance is not None and amount is not None and not 0 <= balance <= amount:
+            errors['balance'] = ['The balance must be between zero and the amount.']
+        try:
+            date = parse_date(row.get('date', ''))
+        except ValueError:
+            date = None
+        if date is None:
+            errors['date'] = ['A date in YYYY-MM-DD format is required.']
+        if errors:
+            raise RowError(errors)
+        fee = Fee(
+            student=student, amount=amount, balance=balance, date=date,
+            payment_method=row.get('payment_method', ''), created_by=self.user,
+        )
+        return fee, True
+
+
+class LibraryItemImporter(Importer):
+    """
+    Columns: title, item_type, isbn and optional status. Rows whose ISBN
+    already exists update that item.
+    """
+    model = LibraryItem
+    required_columns = ('title', 'item_type', 'isbn')
+    update_fields = ('title', 'item_type', 'status')
+
+    def resolve(self, rows):
+        isbns = {row.get('isbn') for row in rows}
+        return {'existing': {item.isbn: item for item in LibraryItem.objects.filter(isbn__in=isbns)}}
+
+    def build(self, row, lookups):
+        isbn = row.get('isbn')
+        if not isbn:
+            # ISBNs are unique, so rows without one cannot be told apart.
+            raise RowError({'isbn': ['An ISBN is required to import library items.']})
+        item = lookups['existing'].get(isbn)
+        created = item is None
+        if created:
+            item = LibraryItem(isbn=isbn, created_by=self.user)
+        else:
+            item = copy.copy(item)
+        item.title = row.get('title', '')
+        item.item_type = row.get('item_type', '')
+        item.status = row.get('status') or item.status or 'available'
+        return item, created
+
+    def key(self, item):
+        return item.isbn
@@ -0,0 +1,101 @@
+from django.db import connection, connections, transaction
+from django.db.models import Case, Count, F, Max, OuterRef, Q, Subquery, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Message, UnreadMessageCount
+from .rollups import increment
+
+
+def unread_count(user):
+    """
+    The user's unread message count: one lookup on a unique key.
+    """
+    return UnreadMessageCount.objects.filter(user=user).values_list('unread', flat=True).first() or 0
+
+
+def between(user, other):
+    """
+    Messages exchanged by `user` and `other`, either way round.
+    """
+    return Message.objects.filter(Q(sender=user, receiver=other) | Q(sender=other, receiver=user))
+
+
+def conversations(user):
+    """
+    The latest message of each of `user`'s conversations, annotated with the
+    `counterpart` and how many of their messages `user` has not read. Rows
+    are plain messages, so they page like any message list.
+    """
+    counterpart = Case(When(sender=user, then=F('receiver')), default=F('sender'))
+    latest = (
+        Message.objects.filter(Q(sender=user) | Q(receiver=user))
+        .annotate(counterpart=counterpart).order_by()
+        .values('counterpart').annotate(latest=Max('pk')).values('latest')
+    )
+    unread = (
+        Message.objects.filter(receiver=user, read=False, sender=OuterRef('counterpart'))
+        .order_by().values('receiver').annotate(count=Count('pk')).values('count')
+    )
+    return (
+        Message.objects.filter(pk__in=latest)
+        .annotate(counterpart=counterpart)
+        .annotate(unread=Coalesce(Subquery(unread), 0))
+    )
+
+
+def mark_read(user, sender):
+    """
+    Marks every unread message `sender` sent to `user` as read with one
+    UPDATE and takes exactly that many off the user's unread count.
+    Returns the number of messages marked.
+    """
+    with transaction.atomic():
+        marked = Message.objects.filter(receiver=user, sender=sender, read=False).update(read=True, updated_at=timezone.now())
+        if marked:
+            UnreadMessageCount.objects.filter(user=user).update(unread=F('unread') - marked)
+    return marked
+
+
+def adjust_counts(changes, using=connection):
+    """
+    Applies (user_id, delta) changes to the unread counters, opening a
+    counter for users that have none.
+    """
+    totals = {}
+    for user_id, delta in changes:
+        totals[user_id] = totals.get(user_id, 0) + delta
+    increment(UnreadMessageCount, ('user_id',), ('unread',), list(totals.items()), using)
+
+
+def capture_previous(sender, instance, raw=False, **kwargs):
+    """
+    pre_save: remembers the stored receiver and read flag of a message being
+    updated so post_save can move the unread counts.
+    """
+    instance._unread_previous = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    instance._unread_previous = (
+        Message.objects.using(instance._state.db).filter(pk=instance.pk).values_list('receiver_id', 'read').first()
+    )
+
+
+def message_saved(sender, instance, raw=False, using=None, **kwargs):
+    if raw:
+        return
+    changes = [(instance.receiver_id, 0 if instance.read else 1)]
+    previous = getattr(instance, '_unread_previous', None)
+    if previous:
+        receiver_id, read = previous
+        changes.append((receiver_id, 0 if read else -1))
+    adjust_counts(changes, _connection(using))
+
+
+def message_deleted(sender, instance, using=None, **kwargs):
+    if not instance.read:
+        UnreadMessageCount.objects.using(using).filter(user_id=instance.receiver_id).update(unread=F('unread') - 1)
+
+
+def _connection(alias):
+    return connections[alias] if alias else connection
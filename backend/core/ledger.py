@@ -0,0 +1,130 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from . import audit
+from .models import Fee, FeePayment, StudentFeeAccount
+from .rollups import increment
+
+
+class PaymentError(Exception):
+    pass
+
+
+def pay(fee_id, user, amount=None, payment_method='', idempotency_key=None):
+    """
+    Records a payment of `amount` (the whole balance when omitted) against a
+    fee and returns (payment, created).
+
+    The fee row is locked for the duration of the transaction and its
+    balance is only decremented while it still covers the amount, so
+    concurrent payments cannot overdraw it. A payment repeating an earlier
+    `idempotency_key` returns the original payment instead of paying twice.
+    """
+    try:
+        with transaction.atomic():
+            return _pay(fee_id, user, amount, payment_method, idempotency_key)
+    except IntegrityError:
+        # A concurrent request with the same key committed first.
+        previous = FeePayment.objects.filter(idempotency_key=idempotency_key).first() if idempotency_key else None
+        if previous is None:
+            raise
+        return previous, False
+
+
+def _pay(fee_id, user, amount, payment_method, idempotency_key):
+    fee = Fee.objects.select_for_update(of=('self',)).select_related('student__user').get(pk=fee_id)
+    if idempotency_key:
+        previous = FeePayment.objects.filter(idempotency_key=idempotency_key).first()
+        if previous is not None:
+            if previous.fee_id != fee.pk:
+                raise PaymentError('This idempotency key was already used for another fee.')
+            return previous, False
+    if fee.balance <= 0:
+        raise PaymentError('Fee already paid')
+    amount = fee.balance if amount is None else Decimal(amount)
+    if amount <= 0:
+        raise PaymentError('Payment amount must be positive')
+    if amount > fee.balance:
+        raise PaymentError(f'Payment exceeds the outstanding balance of {fee.balance}')
+
+    updated = Fee.objects.filter(pk=fee.pk, balance__gte=amount).update(
+        balance=F('balance') - amount, payment_method=payment_method, updated_at=timezone.now(),
+    )
+    if not updated:
+        raise PaymentError('The fee balance changed; please retry.')
+    fee.refresh_from_db(fields=['balance'])
+    payment = FeePayment.objects.create(
+        fee=fee, amount=amount, balance_after=fee.balance, payment_method=payment_method,
+        idempotency_key=idempotency_key or None, paid_by=user,
+    )
+    adjust_accounts([(fee.student_id, 0, -amount)])
+    audit.record(
+        user, 'PAY_FEE', 'Fee', fee.id,
+        f"Paid {amount} for student {fee.student}, balance {fee.balance}",
+    )
+    return payment, True
+
+
+def adjust_accounts(changes, using=connection):
+    """
+    Applies (student_id, billed delta, outstanding delta) changes to the
+    students' fee accounts, creating missing accounts.
+    """
+    totals = defaultdict(lambda: [Decimal(0), Decimal(0)])
+    for student_id, billed, outstanding in changes:
+        totals[student_id][0] += Decimal(billed)
+        totals[student_id][1] += Decimal(outstanding)
+    rows = [(student_id, billed, outstanding) for student_id, (billed, outstanding) in totals.items()]
+    increment(StudentFeeAccount, ('student_id',), ('billed', 'outstanding'), rows, using)
+
+
+def fees_created(fees, using=connection):
+    adjust_accounts([(fee.student_id, fee.amount, fee.balance) for fee in fees], using)
+
+
+def outstanding_by_class(accounts):
+    return (
+        accounts.values(class_instance=F('student__class_instance'))
+        .annotate(billed=Sum('billed'), outstanding=Sum('outstanding'))
+        .order_by('class_instance')
+    )
+
+
+def capture_previous(sender, instance, raw=False, **kwargs):
+    """
+    pre_save: remembers the stored student, amount and balance of a fee
+    being updated so post_save can move the account totals.
+    """
+    instance._account_previous = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    instance._account_previous = (
+        Fee.objects.using(instance._state.db).filter(pk=instance.pk).values_list('student_id', 'amount', 'balance').first()
+    )
+
+
+def fee_saved(sender, instance, raw=False, using=None, **kwargs):
+    if raw:
+        return
+    changes = [(instance.student_id, instance.amount, instance.balance)]
+    previous = getattr(instance, '_account_previous', None)
+    if previous:
+        student_id, amount, balance = previous
+        changes.append((student_id, -amount, -balance))
+    adjust_accounts(changes, _connection(using))
+
+
+def fee_deleted(sender, instance, using=None, **kwargs):
+    # Only existing accounts are updated: a deleted student's account is
+    # deleted along with its fees.
+    StudentFeeAccount.objects.using(using).filter(student_id=instance.student_id).update(
+        billed=F('billed') - instance.amount, outstanding=F('outstanding') - instance.balance,
+    )
+
+
+def _connection(alias):
+    return connections[alias] if alias else connection
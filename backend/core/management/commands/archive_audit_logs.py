@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import archive
+
+
+class Command(BaseCommand):
+    help = 'Moves audit log entries older than the retention period into compressed monthly archive files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months', type=int, default=getattr(settings, 'AUDIT_RETENTION_MONTHS', 12),
+            help='Keep this many months of entries in the database (default: AUDIT_RETENTION_MONTHS).',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report how many entries each partition would receive.',
+        )
+
+    def handle(self, *args, **options):
+        if options['months'] < 1:
+            raise CommandError('--months must be at least 1.')
+        cutoff = archive.months_ago(options['months'])
+        if options['dry_run']:
+            counts = archive.count_before(cutoff)
+        else:
+            counts = archive.archive_before(cutoff, batch_size=options['batch_size'])
+        for name, rows in sorted(counts.items()):
+            self.stdout.write(f'{name}: {rows} entries')
+        verb = 'Would archive' if options['dry_run'] else 'Archived'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {sum(counts.values())} entries created before {cutoff:%Y-%m-%d} to {archive.archive_dir()}.'
+        ))
@@ -0,0 +1,110 @@
+import json
+import platform
+import subprocess
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from core import audit, benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks API endpoints against seeded datasets of several sizes in a throwaway SQLite '
+        'database and prints latency percentiles, throughput, peak RSS and query counts as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scales', default='1000,10000',
+            help='Comma-separated numbers of students to seed, one fresh database each (default: 1000,10000).',
+        )
+        parser.add_argument(
+            '--endpoints', default=','.join(benchmark.SCENARIOS),
+            help=f'Comma-separated scenarios to run (default: all of {", ".join(benchmark.SCENARIOS)}).',
+        )
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint and scale.')
+        parser.add_argument('--concurrency', type=int, default=4, help='Client threads sending requests.')
+        parser.add_argument('--warmup', type=int, default=10, help='Unmeasured requests per endpoint first.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('The benchmark builds its datasets in a throwaway SQLite database.')
+        try:
+            scales = [int(scale) for scale in options['scales'].split(',') if scale]
+        except ValueError:
+            raise CommandError('--scales must be a comma-separated list of integers.')
+        endpoints = [name for name in options['endpoints'].split(',') if name]
+        unknown = set(endpoints) - set(benchmark.SCENARIOS)
+        if unknown:
+            raise CommandError(f'Unknown endpoints: {", ".join(sorted(unknown))}')
+
+        report = {'meta': self.meta(options), 'results': []}
+        setup_test_environment(debug=False)
+        try:
+            # Sampled request logging would write a line per request and
+            # dominate the timings.
+            with override_settings(REQUEST_LOG_SAMPLE_RATE=0.0), tempfile.TemporaryDirectory() as directory:
+                for scale in scales:
+                    report['results'].extend(self.run_scale(scale, endpoints, Path(directory), options))
+        finally:
+            teardown_test_environment()
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            Path(options['output']).write_text(output + '\n')
+            self.stderr.write(f'Wrote {options["output"]}')
+        else:
+            self.stdout.write(output)
+
+    def run_scale(self, scale, endpoints, directory, options):
+        connection.settings_dict['TEST']['NAME'] = str(directory / f'benchmark-{scale}.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            started = time.perf_counter()
+            dataset = benchmark.build_dataset(scale, seed=options['seed'])
+            self.stderr.write(f'Seeded {scale} students in {time.perf_counter() - started:.1f}s')
+            results = []
+            for name in endpoints:
+                benchmark.run_scenario(name, dataset, options['warmup'], options['concurrency'])
+                result = benchmark.run_scenario(name, dataset, options['requests'], options['concurrency'])
+                result['scale'] = scale
+                results.append(result)
+                self.stderr.write(
+                    f'{scale:>8} {name:<16} p50 {result["p50_ms"]}ms p95 {result["p95_ms"]}ms '
+                    f'p99 {result["p99_ms"]}ms {result["rps"]} req/s'
+                )
+            return results
+        finally:
+            audit.shutdown()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def meta(self, options):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True, cwd=settings.BASE_DIR,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            'commit': commit,
+            'started_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'requests': options['requests'],
+            'concurrency': options['concurrency'],
+            'warmup': options['warmup'],
+            'seed': options['seed'],
+        }
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import ClassInstance
+from core.reportcards import generate_report_cards
+
+
+class Command(BaseCommand):
+    help = 'Generates report cards for every graded student in a term, optionally for one class.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--term', required=True)
+        parser.add_argument('--year', type=int, required=True)
+        parser.add_argument('--class', dest='class_instance', type=int, help='Only generate report cards for this class id.')
+
+    def handle(self, *args, **options):
+        class_instance = None
+        if options['class_instance'] is not None:
+            try:
+                class_instance = ClassInstance.objects.get(pk=options['class_instance'])
+            except ClassInstance.DoesNotExist:
+                raise CommandError(f'Class {options["class_instance"]} does not exist.')
+        summary = generate_report_cards(options['term'], options['year'], class_instance=class_instance)
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {summary["report_cards"]} report cards from {summary["grades"]} grades '
+            f'for {summary["term"]} {summary["year"]}.'
+        ))
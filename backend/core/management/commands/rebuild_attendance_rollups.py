@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the attendance rollup tables from Attendance, or checks them for drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only report rollup rows that differ from Attendance; exit with an error if any do.',
+        )
+
+    def handle(self, *args, **options):
+        expected_daily, expected_terms = rollups.expected_rollups()
+        stored_daily, stored_terms = rollups.stored_rollups()
+        drifted = {
+            'class daily': rollups.drift(expected_daily, stored_daily),
+            'student term': rollups.drift(expected_terms, stored_terms),
+        }
+        for name, keys in drifted.items():
+            self.stdout.write(f'{name}: {len(keys)} drifted rows')
+            for key in keys[:20]:
+                self.stdout.write(f'  {key}')
+
+        if options['check']:
+            if any(drifted.values()):
+                raise CommandError('Attendance rollups have drifted; run rebuild_attendance_rollups to fix them.')
+            self.stdout.write(self.style.SUCCESS('Attendance rollups are consistent.'))
+            return
+        daily, terms = rollups.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {daily} class daily and {terms} student term rollups.'))
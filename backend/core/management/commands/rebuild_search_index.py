@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the SQLite FTS5 full-text indexes from their source tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model', action='append', dest='models', choices=sorted(search.INDEXES),
+            help='Only rebuild the index for this model. May be repeated.',
+        )
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError('Full-text indexes require the SQLite database backend.')
+        search.install()
+        names = options['models'] or list(search.INDEXES)
+        for model in search.indexed_models():
+            if model.__name__ not in names:
+                continue
+            count = search.rebuild(model)
+            self.stdout.write(f'{search.fts_table(model)}: indexed {count} rows')
+        self.stdout.write(self.style.SUCCESS('Full-text indexes rebuilt.'))
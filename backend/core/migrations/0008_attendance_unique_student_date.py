@@ -0,0 +1,46 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:56
+
+import logging
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+logger = logging.getLogger(__name__)
+
+
+def remove_duplicate_attendance(apps, schema_editor):
+    # Keep the most recent row for each (student, date) before the constraint
+    # is added. Every removal is logged, so the data loss shows at migrate time.
+    Attendance = apps.get_model('core', 'Attendance')
+    duplicates = (
+        Attendance.objects.values('student_id', 'date')
+        .annotate(rows=Count('id'), keep=Max('id'))
+        .filter(rows__gt=1)
+    )
+    removed = 0
+    for row in duplicates:
+        stale = Attendance.objects.filter(student_id=row['student_id'], date=row['date']).exclude(id=row['keep'])
+        ids = sorted(stale.values_list('id', flat=True))
+        stale.delete()
+        removed += len(ids)
+        logger.warning(
+            'Removed duplicate attendance for student %s on %s: kept id %s, deleted ids %s',
+            row['student_id'], row['date'], row['keep'], ids,
+        )
+    if removed:
+        logger.warning('Removed %d duplicate attendance rows before adding unique_attendance_student_date', removed)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_contactmessage_alter_attendance_present_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_attendance, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='attendance',
+            constraint=models.UniqueConstraint(fields=('student', 'date'), name='unique_attendance_student_date'),
+        ),
+    ]
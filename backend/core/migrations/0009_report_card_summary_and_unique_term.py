@@ -0,0 +1,69 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:59
+
+import logging
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+logger = logging.getLogger(__name__)
+
+
+def remove_duplicate_report_cards(apps, schema_editor):
+    # Keep the most recent report card for each (student, term, year) before
+    # the constraint is added. Every removal is logged, so the data loss shows
+    # at migrate time.
+    ReportCard = apps.get_model('core', 'ReportCard')
+    duplicates = (
+        ReportCard.objects.values('student_id', 'term', 'year')
+        .annotate(rows=Count('id'), keep=Max('id'))
+        .filter(rows__gt=1)
+    )
+    removed = 0
+    for row in duplicates:
+        stale = ReportCard.objects.filter(
+            student_id=row['student_id'], term=row['term'], year=row['year'],
+        ).exclude(id=row['keep'])
+        ids = sorted(stale.values_list('id', flat=True))
+        stale.delete()
+        removed += len(ids)
+        logger.warning(
+            'Removed duplicate report cards for student %s, %s %s: kept id %s, deleted ids %s',
+            row['student_id'], row['term'], row['year'], row['keep'], ids,
+        )
+    if removed:
+        logger.warning('Removed %d duplicate report cards before adding unique_report_card_student_term_year', removed)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_attendance_unique_student_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportcard',
+            name='average',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reportcard',
+            name='class_size',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reportcard',
+            name='position',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reportcard',
+            name='subject_averages',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.RunPython(remove_duplicate_report_cards, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='reportcard',
+            constraint=models.UniqueConstraint(fields=('student', 'term', 'year'), name='unique_report_card_student_term_year'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:03
+
+from collections import Counter
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_rollups(apps, schema_editor):
+    Attendance = apps.get_model('core', 'Attendance')
+    ClassAttendanceDaily = apps.get_model('core', 'ClassAttendanceDaily')
+    StudentAttendanceTerm = apps.get_model('core', 'StudentAttendanceTerm')
+    terms = {month: name for name, first, last in settings.SCHOOL_TERMS for month in range(first, last + 1)}
+    daily, term_counts = Counter(), Counter()
+    rows = Attendance.objects.values_list('student_id', 'class_instance_id', 'date', 'present')
+    for student_id, class_instance_id, date, present in rows.iterator():
+        daily[(class_instance_id, date, present)] += 1
+        term_counts[(student_id, terms.get(date.month, ''), date.year, present)] += 1
+    ClassAttendanceDaily.objects.bulk_create([
+        ClassAttendanceDaily(class_instance_id=class_instance_id, date=date, present=daily[(class_instance_id, date, True)], absent=daily[(class_instance_id, date, False)])
+        for class_instance_id, date in {key[:2] for key in daily}
+    ], batch_size=1000)
+    StudentAttendanceTerm.objects.bulk_create([
+        StudentAttendanceTerm(student_id=student_id, term=term, year=year, present=term_counts[(student_id, term, year, True)], absent=term_counts[(student_id, term, year, False)])
+        for student_id, term, year in {key[:3] for key in term_counts}
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_report_card_summary_and_unique_term'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassAttendanceDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('present', models.IntegerField(default=0)),
+                ('absent', models.IntegerField(default=0)),
+                ('class_instance', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_daily', to='core.classinstance')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('class_instance', 'date'), name='unique_class_attendance_daily')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StudentAttendanceTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=20)),
+                ('year', models.IntegerField()),
+                ('present', models.IntegerField(default=0)),
+                ('absent', models.IntegerField(default=0)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_terms', to='core.student')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('student', 'term', 'year'), name='unique_student_attendance_term')],
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def open_fee_accounts(apps, schema_editor):
+    Fee = apps.get_model('core', 'Fee')
+    StudentFeeAccount = apps.get_model('core', 'StudentFeeAccount')
+    totals = Fee.objects.values('student_id').annotate(billed=Sum('amount'), outstanding=Sum('balance')).order_by()
+    StudentFeeAccount.objects.bulk_create([
+        StudentFeeAccount(student_id=row['student_id'], billed=row['billed'], outstanding=row['outstanding'])
+        for row in totals
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_attendance_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeePayment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('balance_after', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('payment_method', models.CharField(blank=True, max_length=50)),
+                ('idempotency_key', models.CharField(blank=True, max_length=64, null=True, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('fee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='core.fee')),
+                ('paid_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='fee_payments', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StudentFeeAccount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('billed', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('outstanding', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='fee_account', to='core.student')),
+            ],
+        ),
+        migrations.RunPython(open_fee_accounts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+ROLES = ('admin', 'teacher', 'parent', 'student', 'staff')
+
+
+def split_target_roles(apps, schema_editor):
+    Announcement = apps.get_model('core', 'Announcement')
+    AnnouncementTarget = apps.get_model('core', 'AnnouncementTarget')
+    targets = []
+    rows = Announcement.objects.values_list('pk', 'target_roles')
+    for announcement_id, target_roles in rows.iterator(chunk_size=2000):
+        # Whole names only: the old `contains` filter also matched substrings.
+        roles = {role.strip().lower() for role in target_roles.split(',')}
+        targets.extend(AnnouncementTarget(announcement_id=announcement_id, role=role) for role in ROLES if role in roles)
+        if len(targets) >= 5000:
+            AnnouncementTarget.objects.bulk_create(targets)
+            targets = []
+    AnnouncementTarget.objects.bulk_create(targets)
+
+
+def join_target_roles(apps, schema_editor):
+    Announcement = apps.get_model('core', 'Announcement')
+    AnnouncementTarget = apps.get_model('core', 'AnnouncementTarget')
+    roles = {}
+    for announcement_id, role in AnnouncementTarget.objects.values_list('announcement_id', 'role').distinct().iterator():
+        roles.setdefault(announcement_id, set()).add(role)
+    announcements = [
+        Announcement(pk=announcement_id, target_roles=','.join(role for role in ROLES if role in targeted))
+        for announcement_id, targeted in roles.items()
+    ]
+    Announcement.objects.bulk_update(announcements, ['target_roles'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_auditlog_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnnouncementTarget',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('admin', 'Admin'), ('teacher', 'Teacher'), ('parent', 'Parent'), ('student', 'Student'), ('staff', 'Staff')], max_length=10)),
+                ('announcement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='targets', to='core.announcement')),
+                ('class_instance', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='announcement_targets', to='core.classinstance')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['role', 'class_instance', 'announcement'], name='announcement_target_idx')],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='announcement',
+            index=models.Index(fields=['created_at', 'id'], name='announcement_created_idx'),
+        ),
+        migrations.RunPython(split_target_roles, join_target_roles),
+        # A default lets reversing the removal re-add the column to existing rows.
+        migrations.AlterField(
+            model_name='announcement',
+            name='target_roles',
+            field=models.CharField(default='', max_length=50),
+        ),
+        migrations.RemoveField(
+            model_name='announcement',
+            name='target_roles',
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_unread(apps, schema_editor):
+    Message = apps.get_model('core', 'Message')
+    UnreadMessageCount = apps.get_model('core', 'UnreadMessageCount')
+    rows = Message.objects.filter(read=False).values('receiver_id').annotate(unread=Count('pk')).order_by()
+    UnreadMessageCount.objects.bulk_create([
+        UnreadMessageCount(user_id=row['receiver_id'], unread=row['unread']) for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_announcement_targets'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnreadMessageCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unread', models.IntegerField(default=0)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='unread_message_count', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['receiver', 'created_at'], name='message_inbox_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(condition=models.Q(('read', False)), fields=['receiver', 'created_at'], name='message_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['sender', 'created_at'], name='message_sent_idx'),
+        ),
+        migrations.RunPython(count_unread, migrations.RunPython.noop),
+    ]
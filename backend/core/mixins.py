@@ -0,0 +1,319 @@
+import hashlib
+
+from django.db import transaction
+from django.db.models import Count
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date, parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import FormParser, MultiPartParser
+from rest_framework.response import Response
+
+from . import audit, responsecache, search, streaming, versions
+from .importers import ImportFileError, iter_rows
+from .planner import plan_queryset
+
+
+class QueryPlanMixin:
+    """
+    Plans related-object loading from the viewset's serializer so every
+    get_queryset branch renders in a constant number of queries.
+    """
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        return plan_queryset(queryset, self.get_serializer())
+
+
+def expands_relations(request):
+    """
+    Whether the request asks for nested related rows, whose changes do not
+    show in the parent's `updated_at` or change stamp.
+    """
+    params = request.query_params
+    return bool(params.get('expand')) or '.' in params.get('fields', '')
+
+
+def model_versions(model, dependencies=()):
+    return [versions.current(versions.model_name(related)) for related in (model, *dependencies)]
+
+
+class ResponseCacheMixin:
+    """
+    Serves list and detail responses from a per-process LRU keyed by the
+    URL and query, the caller's scope and the change stamps of the model and
+    its `version_dependencies`. A write through the ORM replaces a stamp,
+    which every worker reads, so no worker serves the old response again.
+
+    Entries keep the ETag and Last-Modified of the response they came from,
+    so a hit can answer If-None-Match without a query. Meant for reference
+    data that is read far more often than written; writes that send no
+    signals (bulk_create, update) are not seen.
+    """
+    version_dependencies = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, super().retrieve, *args, **kwargs)
+
+    def cached_response(self, request, view, *args, **kwargs):
+        if expands_relations(request):
+            return view(request, *args, **kwargs)
+        cache = responsecache.get_cache(self.basename)
+        renderer = getattr(request, 'accepted_renderer', None)
+        key = (
+            request.build_absolute_uri(request.path),
+            tuple(sorted((name, tuple(values)) for name, values in request.query_params.lists())),
+            self.get_cache_scope(request), renderer and renderer.format,
+            tuple(model_versions(self.queryset.model, self.version_dependencies)),
+        )
+        entry = cache.get(key)
+        if entry is None:
+            response = view(request, *args, **kwargs)
+            # Streamed lists are plain Django responses and are not kept.
+            if isinstance(response, Response) and response.status_code == status.HTTP_200_OK:
+                headers = {name: response[name] for name in ('ETag', 'Last-Modified', 'Cache-Control') if response.has_header(name)}
+                # Rows read inside a transaction that may still roll back are not kept.
+                transaction.on_commit(lambda: cache.put(key, (response.data, headers)))
+            response['X-Cache'] = 'miss'
+            return response
+
+        data, headers = entry
+        if 'ETag' in headers and headers['ETag'] in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(data)
+        for name, value in headers.items():
+            response[name] = value
+        response['X-Cache'] = 'hit'
+        return response
+
+    def get_cache_scope(self, request):
+        """
+        What besides the URL decides which rows the caller sees: nothing for
+        admins, the user for everyone else.
+        """
+        user = request.user
+        if user.is_superuser or user.role == 'admin':
+            return 'admin'
+        return (user.role, user.pk)
+
+
+def row_validators(rows, paginator=None):
+    """
+    The keys and change dates of `rows`, and whether pages follow or precede
+    them when they are a page: what a response's tag depends on besides the
+    change stamps.
+    """
+    keys = [(row.pk, row.updated_at) for row in rows]
+    return keys, paginator and (paginator.has_next, paginator.has_previous)
+
+
+class ConditionalGetMixin:
+    """
+    Sends ETag and Last-Modified with list and detail responses and answers
+    a matching If-None-Match with 304 before any row is serialized.
+
+    The tag covers the primary key and `updated_at` of each row on the page
+    (or of the object), whether more pages follow, and the change stamps of
+    the model and of the `version_dependencies` whose rows the serializer or
+    scope also reads. A plain GET tags the rows it has already loaded, so it
+    costs no query. Only a request that sends If-None-Match first reads the
+    keys and dates of its page on their own, in one query. Only If-None-Match
+    is honoured: a date alone cannot show that a row went away. Responses
+    with expanded relations or facets are not tagged, since those depend on
+    rows outside the page.
+    """
+    version_dependencies = ()
+    etag_validators = None
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, self.list_validators, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, self.object_validators, super().retrieve, *args, **kwargs)
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        # An unpaginated list serializes this same queryset, which reuses the rows read here.
+        self.etag_validators = row_validators(queryset if page is None else page, page is not None and self.paginator)
+        return page
+
+    def get_object(self):
+        instance = super().get_object()
+        self.etag_validators = row_validators([instance])
+        return instance
+
+    def list_validators(self, **kwargs):
+        keys = self.filter_queryset(self.get_queryset()).select_related(None).prefetch_related(None).only('updated_at')
+        paginator = self.pagination_class() if self.pagination_class is not None else None
+        page = paginator.paginate_queryset(keys, self.request, view=self) if paginator is not None else None
+        return row_validators(keys if page is None else page, page is not None and paginator)
+
+    def object_validators(self, **kwargs):
+        lookup = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        scope = self.filter_queryset(self.get_queryset()).filter(**{self.lookup_field: lookup})
+        return row_validators(scope.select_related(None).prefetch_related(None).only('updated_at')[:1])
+
+    def conditional_response(self, request, read_validators, view, *args, **kwargs):
+        if not self.is_conditional(request):
+            return view(request, *args, **kwargs)
+        matches = parse_etags(request.headers.get('If-None-Match', ''))
+        if matches:
+            keys, pages = read_validators(**kwargs)
+            etag = self.get_etag(request, keys, pages)
+            if etag in matches or ('*' in matches and keys):
+                return self.tag_response(Response(status=status.HTTP_304_NOT_MODIFIED), etag, keys)
+
+        response = view(request, *args, **kwargs)
+        # Streamed lists never reach paginate_queryset and are not tagged.
+        if response.status_code != status.HTTP_200_OK or self.etag_validators is None:
+            return response
+        keys, pages = self.etag_validators
+        return self.tag_response(response, self.get_etag(request, keys, pages), keys)
+
+    def tag_response(self, response, etag, keys):
+        response['ETag'] = etag
+        modified = max((updated_at for pk, updated_at in keys if updated_at is not None), default=None)
+        if modified is not None:
+            response['Last-Modified'] = http_date(modified.timestamp())
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def is_conditional(self, request):
+        if expands_relations(request) or request.query_params.get(getattr(self, 'facet_query_param', 'facets')):
+            return False
+        return any(field.name == 'updated_at' for field in self.queryset.model._meta.fields)
+
+    def get_etag(self, request, keys, pages):
+        renderer = getattr(request, 'accepted_renderer', None)
+        key = (
+            keys, pages, model_versions(self.queryset.model, self.version_dependencies),
+            request.build_absolute_uri(), request.user.pk, renderer and renderer.format,
+        )
+        return quote_etag(hashlib.sha1(repr(key).encode()).hexdigest())
+
+
+class StreamingListMixin:
+    """
+    Streams the whole filtered list instead of a page for `?stream=ndjson`,
+    `?stream=json` or `Accept: application/x-ndjson`, serializing
+    `stream_chunk_size` rows at a time so memory stays flat.
+    """
+    stream_query_param = 'stream'
+    stream_chunk_size = 500
+
+    def list(self, request, *args, **kwargs):
+        mode = self.get_stream_mode(request)
+        if mode is None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        serialize = lambda chunk: self.get_serializer(chunk, many=True).to_representation(chunk)
+        return streaming.stream_queryset(queryset, serialize, mode, self.stream_chunk_size)
+
+    def get_stream_mode(self, request):
+        mode = request.query_params.get(self.stream_query_param)
+        if mode in ('ndjson', 'json'):
+            return mode
+        if mode is not None:
+            raise ValidationError({self.stream_query_param: ['Choose ndjson or json.']})
+        if getattr(request, 'accepted_renderer', None) and request.accepted_renderer.format == 'ndjson':
+            return 'ndjson'
+        return None
+
+
+class FacetMixin:
+    """
+    Adds counts for `?facets=a,b` to paginated list responses. Only fields in
+    the view's `facet_fields` are counted; all requested facets come from a
+    single GROUP BY over the filtered queryset.
+    """
+    facet_fields = ()
+    facet_query_param = 'facets'
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        requested = [
+            name for name in request.query_params.get(self.facet_query_param, '').split(',')
+            if name in self.facet_fields
+        ]
+        if requested and isinstance(response.data, dict):
+            queryset = self.filter_queryset(self.get_queryset())
+            response.data['facets'] = self.get_facets(queryset, requested)
+        return response
+
+    def get_facets(self, queryset, names):
+        rows = (
+            queryset.prefetch_related(None).order_by()
+            .values_list(*names).annotate(count=Count('pk', distinct=True))
+        )
+        facets = {name: {} for name in names}
+        for *values, count in rows:
+            for name, value in zip(names, values):
+                facets[name][value] = facets[name].get(value, 0) + count
+        return facets
+
+
+class FullTextSearchMixin:
+    """
+    Adds a `fulltext/?q=` list route that ranks rows in the caller's
+    queryset through the FTS5 index and returns each with a snippet.
+    """
+    fulltext_limit = 20
+    fulltext_max_limit = 100
+
+    @action(detail=False, methods=['get'])
+    def fulltext(self, request):
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            raise ValidationError({'q': ['This parameter is required.']})
+        try:
+            limit = min(int(request.query_params.get('limit', self.fulltext_limit)), self.fulltext_max_limit)
+        except ValueError:
+            raise ValidationError({'limit': ['A valid integer is required.']})
+
+        queryset = self.get_queryset()
+        hits = search.search(queryset, text, limit=max(limit, 1))
+        objects = plan_queryset(queryset, self.get_serializer()).in_bulk([hit.pk for hit in hits])
+        results = []
+        for hit in hits:
+            if hit.pk in objects:
+                results.append({
+                    'rank': hit.rank,
+                    'snippet': hit.snippet,
+                    'object': self.get_serializer(objects[hit.pk]).data,
+                })
+        return Response({'query': text, 'results': results})
+
+
+class BulkImportMixin:
+    """
+    Adds a `POST import/` route that streams an uploaded CSV or XLSX `file`
+    through the view's `importer_class` and returns its per-row report.
+    `?dry_run=true` validates without writing.
+    """
+    importer_class = None
+    import_permission_classes = None
+
+    def get_permissions(self):
+        if self.action == 'bulk_import' and self.import_permission_classes is not None:
+            return [permission() for permission in self.import_permission_classes]
+        return super().get_permissions()
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser, FormParser])
+    def bulk_import(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({'file': ['This field is required.']})
+        dry_run = request.query_params.get('dry_run', '').lower() in ('true', '1', 'yes')
+        importer = self.importer_class(request.user, dry_run=dry_run)
+        try:
+            report = importer.run(iter_rows(upload))
+        except ImportFileError as exc:
+            raise ValidationError({'file': [str(exc)]})
+        if not dry_run:
+            summary = {key: report[key] for key in ('rows', 'created', 'updated', 'error_count')}
+            audit.record(request.user, 'IMPORT', importer.model.__name__, details=summary)
+        return Response(report)
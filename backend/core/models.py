@@ -135,9 +135,43 @@ class Attendance(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'date'], name='unique_attendance_student_date'),
+        ]
+
     def __str__(self):
         return f"{self.student} - {self.date} - {'Present' if self.present else 'Absent'}"
 
+class ClassAttendanceDaily(models.Model):
+    class_instance = models.ForeignKey(ClassInstance, on_delete=models.CASCADE, related_name='attendance_daily')
+    date = models.DateField()
+    present = models.IntegerField(default=0)
+    absent = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['class_instance', 'date'], name='unique_class_attendance_daily'),
+        ]
+
+    def __str__(self):
+        return f"{self.class_instance} - {self.date}: {self.present}/{self.present + self.absent}"
+
+class StudentAttendanceTerm(models.Model):
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='attendance_terms')
+    term = models.CharField(max_length=20)
+    year = models.IntegerField()
+    present = models.IntegerField(default=0)
+    absent = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'term', 'year'], name='unique_student_attendance_term'),
+        ]
+
+    def __str__(self):
+        return f"{self.student} - {self.term} {self.year}: {self.present}/{self.present + self.absent}"
+
 class Fee(models.Model):
     student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='fees')
     amount = models.DecimalField(max_digits=10, decimal_places=2)
@@ -151,17 +185,84 @@ class Fee(models.Model):
     def __str__(self):
         return f"{self.student} - {self.amount}"
 
+class FeePayment(models.Model):
+    fee = models.ForeignKey(Fee, on_delete=models.CASCADE, related_name='payments')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    balance_after = models.DecimalField(max_digits=10, decimal_places=2)
+    payment_method = models.CharField(max_length=50, blank=True)
+    idempotency_key = models.CharField(max_length=64, unique=True, null=True, blank=True)
+    paid_by = models.ForeignKey(User, on_delete=models.SET_NULL, related_name='fee_payments', null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.fee} - paid {self.amount}"
+
+class StudentFeeAccount(models.Model):
+    student = models.OneToOneField(Student, on_delete=models.CASCADE, related_name='fee_account')
+    billed = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    outstanding = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.student} - outstanding {self.outstanding}"
+
 class Announcement(models.Model):
     title = models.CharField(max_length=200)
     content = models.TextField()
-    target_roles = models.CharField(max_length=50)  # e.g., 'parent,student'
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, limit_choices_to={'role__in': ('admin', 'teacher')}, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='announcement_created_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
+    @property
+    def target_roles(self):
+        """
+        The targeted roles as a comma-separated string, e.g. 'parent,student'.
+        """
+        roles = {target.role for target in self.targets.all()}
+        return ','.join(role for role, label in User.ROLE_CHOICES if role in roles)
+
+    @property
+    def target_classes(self):
+        return sorted({target.class_instance_id for target in self.targets.all() if target.class_instance_id is not None})
+
+    def set_targets(self, roles, classes=()):
+        """
+        Replaces the audience with every role in `roles`, limited to the
+        class ids in `classes` when any are given.
+        """
+        self.targets.all().delete()
+        AnnouncementTarget.objects.bulk_create([
+            AnnouncementTarget(announcement=self, role=role, class_instance_id=class_id)
+            for role in roles
+            for class_id in (classes or [None])
+        ])
+        getattr(self, '_prefetched_objects_cache', {}).pop('targets', None)
+
+class AnnouncementTarget(models.Model):
+    """
+    One audience of an announcement: everyone with `role`, or only those in
+    `class_instance` when it is set.
+    """
+    announcement = models.ForeignKey(Announcement, on_delete=models.CASCADE, related_name='targets')
+    role = models.CharField(max_length=10, choices=User.ROLE_CHOICES)
+    class_instance = models.ForeignKey(ClassInstance, on_delete=models.CASCADE, null=True, blank=True, related_name='announcement_targets')
+
+    class Meta:
+        indexes = [
+            # Covers "which announcements reach this role (and class)".
+            models.Index(fields=['role', 'class_instance', 'announcement'], name='announcement_target_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.announcement} - {self.role} {self.class_instance or ''}".strip()
+
 class Message(models.Model):
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_messages')
     receiver = models.ForeignKey(User, on_delete=models.CASCADE, related_name='received_messages')
@@ -170,9 +271,28 @@ class Message(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['receiver', 'created_at'], name='message_inbox_idx'),
+            # Django filters read=False as `NOT read`, which only a partial index can match.
+            models.Index(fields=['receiver', 'created_at'], condition=models.Q(read=False), name='message_unread_idx'),
+            models.Index(fields=['sender', 'created_at'], name='message_sent_idx'),
+        ]
+
     def __str__(self):
         return f"{self.sender} to {self.receiver}: {self.content[:50]}"
 
+class UnreadMessageCount(models.Model):
+    """
+    Number of unread messages received by a user, kept current by
+    core/inbox.py so the unread badge is a single-row lookup.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='unread_message_count')
+    unread = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user} - {self.unread} unread"
+
 class Timetable(models.Model):
     class_instance = models.ForeignKey(ClassInstance, on_delete=models.CASCADE, related_name='timetables')
     subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
@@ -244,11 +364,20 @@ class ReportCard(models.Model):
     year = models.IntegerField()
     grades = models.ManyToManyField(Grade, related_name='report_cards')
     overall_grade = models.CharField(max_length=10, blank=True)
+    average = models.FloatField(null=True, blank=True)
+    subject_averages = models.JSONField(default=dict, blank=True)
+    position = models.PositiveIntegerField(null=True, blank=True)
+    class_size = models.PositiveIntegerField(null=True, blank=True)
     remarks = models.TextField(blank=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, limit_choices_to={'role': 'admin'}, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'term', 'year'], name='unique_report_card_student_term_year'),
+        ]
+
     def __str__(self):
         return f"{self.student} - {self.term} {self.year}"
 
@@ -267,7 +396,15 @@ class AuditLog(models.Model):
     model_name = models.CharField(max_length=100)
     object_id = models.CharField(max_length=50, blank=True)
     details = models.TextField(blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Set when the change happens, not when the buffered entry is written.
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='auditlog_created_idx'),
+            models.Index(fields=['user', 'created_at'], name='auditlog_user_created_idx'),
+            models.Index(fields=['model_name', 'object_id'], name='auditlog_object_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user} - {self.action} - {self.created_at}"
@@ -0,0 +1,235 @@
+import base64
+import datetime
+import decimal
+import json
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on the full ordering tuple, `(created_at, id)` by
+    default, so a deep page is the same index range scan as the first one.
+
+    Views may override `ordering`, `page_size` and `max_page_size`, and set
+    `allow_unpaginated = True` to honour `?paginate=false`. A requested
+    `?ordering=` from the view's OrderingFilter is keyed the same way.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    unpaginated_query_param = 'paginate'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        if self.is_unpaginated(request, view):
+            return None
+
+        self.page_size = self.get_page_size(request, view)
+        self.ordering = self.get_ordering(request, queryset, view)
+        cursor = self.decode_cursor(request)
+        self.reverse = bool(cursor and cursor['r'])
+
+        order = [_invert(field) for field in self.ordering] if self.reverse else list(self.ordering)
+        queryset = queryset.order_by(*order)
+        if cursor is not None:
+            values = self.clean_values(queryset.model, cursor['v'], order)
+            nullable = [_field(queryset.model, field.lstrip('-'))[1] for field in order]
+            queryset = queryset.filter(_after(order, values, nullable))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def is_unpaginated(self, request, view):
+        if not getattr(view, 'allow_unpaginated', False):
+            return False
+        return request.query_params.get(self.unpaginated_query_param, '').lower() in ('false', '0', 'no')
+
+    def get_page_size(self, request, view):
+        page_size = getattr(view, 'page_size', self.page_size)
+        max_page_size = getattr(view, 'max_page_size', self.max_page_size)
+        try:
+            requested = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return page_size
+        if requested <= 0:
+            return page_size
+        return min(requested, max_page_size)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = None
+        for backend in getattr(view, 'filter_backends', ()):
+            if issubclass(backend, OrderingFilter):
+                ordering = backend().get_ordering(request, queryset, view)
+                break
+        else:
+            ordering = getattr(view, 'ordering', None)
+        if not ordering:
+            ordering = self.ordering if _has_field(queryset.model, 'created_at') else ('-id',)
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        ordering = list(ordering)
+        if ordering[-1].lstrip('-') not in ('id', 'pk'):
+            ordering.append('-id' if ordering[-1].startswith('-') else 'id')
+        return ordering
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            values, reverse = cursor['v'], bool(cursor['r'])
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return {'v': values, 'r': reverse}
+
+    def clean_values(self, model, values, ordering):
+        """
+        Converts decoded cursor values to the types of the `ordering` fields
+        of `model`, so a tampered cursor is a 404 rather than a failing query.
+        """
+        cleaned = []
+        for value, lookup in zip(values, ordering):
+            if value is None:
+                cleaned.append(value)
+                continue
+            if not isinstance(value, (str, int, float)) or isinstance(value, bool):
+                raise NotFound(self.invalid_cursor_message)
+            field = _field(model, lookup.lstrip('-'))[0]
+            if field is not None:
+                try:
+                    value = field.to_python(value)
+                except (TypeError, ValueError, ValidationError):
+                    raise NotFound(self.invalid_cursor_message)
+            if isinstance(value, datetime.datetime) and settings.USE_TZ and timezone.is_naive(value):
+                value = timezone.make_aware(value)
+            cleaned.append(value)
+        return cleaned
+
+    def encode_cursor(self, instance, reverse):
+        values = [_cursor_value(instance, field.lstrip('-')) for field in self.ordering]
+        return self.encode_values(values, reverse)
+
+    def encode_values(self, values, reverse=False):
+        payload = json.dumps({'v': values, 'r': int(reverse)}, separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+
+def _has_field(model, name):
+    return any(field.name == name for field in model._meta.get_fields())
+
+
+def _field(model, lookup):
+    """
+    Returns the model field an ordering lookup ends at, or None for an
+    annotation, and whether the lookup can be NULL: any nullable field on
+    the way, foreign keys included, makes it so.
+    """
+    field, nullable = None, False
+    for part in lookup.split('__'):
+        if model is None:
+            return None, True
+        try:
+            field = model._meta.pk if part == 'pk' else model._meta.get_field(part)
+        except FieldDoesNotExist:
+            return None, True
+        nullable = nullable or field.null
+        model = field.related_model
+    return field, nullable
+
+
+def _invert(field):
+    return field[1:] if field.startswith('-') else '-' + field
+
+
+def _cursor_value(instance, lookup):
+    value = instance
+    for part in lookup.split('__'):
+        if value is None:
+            break
+        value = getattr(value, part)
+    if isinstance(value, models.Model):
+        value = value.pk
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    return value
+
+
+def _after(order, values, nullable):
+    """
+    Builds the lexicographic "strictly after" condition for a keyset row.
+    `nullable` says which ordering fields can hold NULL.
+    """
+    condition = Q(pk__in=[])
+    prefix = {}
+    for field, value, null in zip(order, values, nullable):
+        name, descending = field.lstrip('-'), field.startswith('-')
+        if value is None:
+            # SQLite sorts NULLs first ascending and last descending.
+            if not descending:
+                condition |= Q(**prefix, **{f'{name}__isnull': False})
+            prefix[f'{name}__isnull'] = True
+            continue
+        condition |= Q(**prefix, **{f'{name}__{"lt" if descending else "gt"}': value})
+        if descending and null:
+            condition |= Q(**prefix, **{f'{name}__isnull': True})
+        prefix[name] = value
+    return condition
@@ -99,3 +99,12 @@ class IsAdminOrParent(permissions.BasePermission):
     """
     def has_permission(self, request, view):
         return request.user.is_authenticated and request.user.role in ['admin', 'parent']
+
+class IsAdminOrCreateOnly(permissions.BasePermission):
+    """
+    Allows anyone to create, but any other access only to admin users.
+    """
+    def has_permission(self, request, view):
+        if view.action == 'create':
+            return True
+        return request.user.is_authenticated and request.user.role == 'admin'
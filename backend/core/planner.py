@@ -0,0 +1,86 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+def plan_queryset(queryset, serializer):
+    """
+    Applies the select_related/prefetch_related plan needed to render
+    `serializer` over `queryset` in a constant number of queries.
+
+    Forward foreign keys and one-to-one relations rendered by a nested
+    serializer are joined with select_related; to-many relations become a
+    Prefetch whose queryset is planned recursively for the child serializer,
+    and to-many primary key fields prefetch only the keys. Relations only
+    reached from SerializerMethodFields can be declared on the serializer's
+    Meta as `prefetch_related = {'field_name': [lookups]}`; while such a
+    field is not expanded only the first hop of each lookup is loaded.
+    """
+    select, prefetch = _walk(serializer, queryset.model, '')
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
+
+
+def _walk(serializer, model, prefix):
+    select, prefetch = [], []
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*':
+            continue
+        resolved = _resolve(model, field.source)
+        if resolved is None:
+            continue
+        relation, lookup, many = resolved
+        path = prefix + lookup
+        if isinstance(field, serializers.ListSerializer):
+            child_queryset = relation.related_model._default_manager.all()
+            prefetch.append(Prefetch(path, queryset=plan_queryset(child_queryset, field.child)))
+        elif isinstance(field, serializers.ManyRelatedField):
+            prefetch.append(Prefetch(path, queryset=relation.related_model._default_manager.only('pk')))
+        elif isinstance(field, serializers.BaseSerializer) and not many:
+            select.append(path)
+            nested_select, nested_prefetch = _walk(field, relation.related_model, path + '__')
+            select.extend(nested_select)
+            prefetch.extend(nested_prefetch)
+
+    hints = getattr(getattr(serializer, 'Meta', None), 'prefetch_related', {})
+    is_expanded = getattr(serializer, 'is_expanded', lambda name: True)
+    for name, lookups in hints.items():
+        if name not in serializer.fields:
+            continue
+        if not is_expanded(name):
+            lookups = [lookup.split('__')[0] for lookup in lookups]
+        prefetch.extend(prefix + lookup for lookup in lookups)
+    return select, _dedupe(prefetch)
+
+
+def _resolve(model, source):
+    """
+    Resolves a (possibly dotted) serializer source to its last relation, the
+    ORM lookup path and whether any hop is to-many. Returns None when the
+    source is not a chain of model relations.
+    """
+    relation, many = None, False
+    for part in source.split('.'):
+        try:
+            relation = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            return None
+        if not relation.is_relation:
+            return None
+        many = many or relation.many_to_many or relation.one_to_many
+        model = relation.related_model
+    return relation, source.replace('.', '__'), many
+
+
+def _dedupe(lookups):
+    seen = set()
+    result = []
+    for lookup in lookups:
+        key = lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup
+        if key not in seen:
+            seen.add(key)
+            result.append(lookup)
+    return result
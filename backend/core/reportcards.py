@@ -0,0 +1,101 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Grade, ReportCard
+
+# Lower bound (percent) of each letter grade, best first.
+GRADE_SCALE = (
+    (80, 'A'), (75, 'A-'), (70, 'B+'), (65, 'B'), (60, 'B-'), (55, 'C+'),
+    (50, 'C'), (45, 'C-'), (40, 'D+'), (35, 'D'), (30, 'D-'), (0, 'E'),
+)
+
+
+def letter_grade(percent):
+    for lower, letter in GRADE_SCALE:
+        if percent >= lower:
+            return letter
+    return GRADE_SCALE[-1][1]
+
+
+def generate_report_cards(term, year, class_instance=None, user=None, batch_size=1000):
+    """
+    Generates the report cards for every student graded in `term`/`year`,
+    optionally only those in `class_instance`.
+
+    All grades of the cohort are read in one query. Marks are normalized to
+    a percentage of their exam's max_marks, averaged per subject, and the
+    subject averages are averaged into the overall mark, letter grade and
+    position within the student's class (tied students share a position).
+    Report cards are upserted in bulk, keeping the remarks and author of
+    existing ones, and their grade links are replaced in bulk.
+    """
+    grades = Grade.objects.filter(exam__term=term, exam__year=year)
+    if class_instance is not None:
+        grades = grades.filter(student__class_instance=class_instance)
+    rows = grades.values_list(
+        'pk', 'student_id', 'student__class_instance_id', 'subject__code', 'marks', 'exam__max_marks',
+    ).order_by()
+
+    subject_scores = defaultdict(lambda: defaultdict(list))
+    grade_ids = defaultdict(list)
+    classes = {}
+    for grade_id, student_id, class_id, subject, marks, max_marks in rows.iterator(chunk_size=5000):
+        subject_scores[student_id][subject].append(100.0 * marks / max_marks if max_marks else 0.0)
+        grade_ids[student_id].append(grade_id)
+        classes[student_id] = class_id
+
+    now = timezone.now()
+    cards = {}
+    for student_id, subjects in subject_scores.items():
+        averages = {subject: round(sum(scores) / len(scores), 2) for subject, scores in subjects.items()}
+        average = round(sum(averages.values()) / len(averages), 2)
+        cards[student_id] = ReportCard(
+            student_id=student_id, term=term, year=year, average=average,
+            overall_grade=letter_grade(average), subject_averages=averages,
+            created_by=user, created_at=now, updated_at=now,
+        )
+    _rank(cards, classes)
+
+    through = ReportCard.grades.through
+    with transaction.atomic():
+        ReportCard.objects.bulk_create(
+            cards.values(),
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['student', 'term', 'year'],
+            update_fields=['average', 'overall_grade', 'subject_averages', 'position', 'class_size', 'updated_at'],
+        )
+        card_ids = [card.pk for card in cards.values()]
+        for start in range(0, len(card_ids), batch_size):
+            through.objects.filter(reportcard_id__in=card_ids[start:start + batch_size]).delete()
+        links = [
+            through(reportcard_id=card.pk, grade_id=grade_id)
+            for student_id, card in cards.items()
+            for grade_id in grade_ids[student_id]
+        ]
+        through.objects.bulk_create(links, batch_size=batch_size)
+
+    return {
+        'term': term,
+        'year': year,
+        'class_instance': getattr(class_instance, 'pk', class_instance),
+        'report_cards': len(cards),
+        'grades': len(links),
+    }
+
+
+def _rank(cards, classes):
+    by_class = defaultdict(list)
+    for student_id, card in cards.items():
+        by_class[classes[student_id]].append(card)
+    for members in by_class.values():
+        members.sort(key=lambda card: card.average, reverse=True)
+        previous = None
+        for index, card in enumerate(members, start=1):
+            if previous is None or card.average != previous.average:
+                position = index
+            card.position = position
+            card.class_size = len(members)
+            previous = card
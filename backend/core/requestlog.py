@@ -0,0 +1,196 @@
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger('core.requests')
+
+_current = contextvars.ContextVar('request_query_timer', default=None)
+
+
+class QueryTimer:
+    """
+    Database execute wrapper counting the queries a request runs and the
+    time spent in them. Thread-safe so work fanned out to other threads can
+    report into the same request with `propagate`.
+    """
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.count += 1
+                self.duration += elapsed
+
+
+def propagate(func):
+    """
+    Wraps `func` so that, when run on another thread, its queries are
+    counted against the request that created the wrapper.
+    """
+    timer = _current.get()
+    if timer is None:
+        return func
+
+    def wrapper(*args, **kwargs):
+        with connection.execute_wrapper(timer):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+class RequestLogMiddleware:
+    """
+    Logs one structured record per request to the `core.requests` logger
+    with the route, the user's role, the status, the wall time and the
+    database time and query count, and adds a `Server-Timing` header.
+
+    Only REQUEST_LOG_SAMPLE_RATE of ordinary requests are logged; server
+    errors and requests slower than REQUEST_LOG_SLOW_MS always are. A
+    streaming response is logged once its body has been sent, with the
+    queries run while streaming.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'REQUEST_LOG_SAMPLE_RATE', 0.05)
+        self.slow_ms = getattr(settings, 'REQUEST_LOG_SLOW_MS', 1000)
+        self.server_timing = getattr(settings, 'REQUEST_LOG_SERVER_TIMING', True)
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        token = _current.set(timer)
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(timer):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        if self.server_timing:
+            # For a streaming response this covers the work before the body.
+            wall_ms = (time.perf_counter() - start) * 1000
+            response['Server-Timing'] = (
+                f'app;dur={wall_ms:.1f}, db;dur={timer.duration * 1000:.1f};desc="{timer.count} queries"'
+            )
+        if response.streaming and not getattr(response, 'is_async', False):
+            response.streaming_content = self.stream(request, response, response.streaming_content, timer, start)
+        else:
+            self.finish(request, response, timer, start)
+        return response
+
+    def stream(self, request, response, content, timer, start):
+        try:
+            with connection.execute_wrapper(timer):
+                yield from content
+        finally:
+            self.finish(request, response, timer, start)
+
+    def finish(self, request, response, timer, start):
+        wall_ms = (time.perf_counter() - start) * 1000
+        if response.status_code >= 500 or wall_ms >= self.slow_ms or random.random() < self.sample_rate:
+            self.log(request, response, wall_ms, timer.duration * 1000, timer.count)
+
+    def log(self, request, response, wall_ms, db_ms, queries):
+        match = getattr(request, 'resolver_match', None)
+        user = getattr(request, 'user', None)
+        authenticated = user is not None and user.is_authenticated
+        record = {
+            'method': request.method,
+            'route': '/' + match.route.removeprefix('^').removesuffix('$') if match else None,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'role': getattr(user, 'role', None) if authenticated else 'anonymous',
+            'user_id': user.pk if authenticated else None,
+            'wall_ms': round(wall_ms, 1),
+            'db_ms': round(db_ms, 1),
+            'queries': queries,
+        }
+        if response.status_code >= 500:
+            level = logging.ERROR
+        elif wall_ms >= self.slow_ms:
+            level = logging.WARNING
+        else:
+            level = logging.INFO
+        logger.log(
+            level, '%s %s %s %.1fms (%d queries, %.1fms db)',
+            request.method, request.path, response.status_code, wall_ms, queries, db_ms,
+            extra={'request_log': record},
+        )
+
+
+class QueuedStreamHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to a background thread that formats and writes them to
+    stderr, so logging costs the calling thread a queue put rather than
+    formatting and a write. The thread is started on first use in each
+    process, so forked workers get their own. Records arriving while
+    `max_size` are waiting are dropped and counted in `dropped`.
+    """
+    def __init__(self, max_size=10000):
+        super().__init__(queue.Queue(max_size))
+        self.max_size = max_size
+        self.dropped = 0
+        self.target = logging.StreamHandler()
+        self.listener = None
+        self.pid = None
+
+    def setFormatter(self, fmt):
+        # Formatting happens on the listener thread.
+        self.target.setFormatter(fmt)
+
+    def emit(self, record):
+        # handle() holds the handler lock, so only one thread starts a listener.
+        if self.pid != os.getpid():
+            self.queue = queue.Queue(self.max_size)
+            self.listener = logging.handlers.QueueListener(self.queue, self.target)
+            self.listener.start()
+            atexit.register(self.listener.stop)
+            self.pid = os.getpid()
+        super().emit(record)
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg, record.args = record.getMessage(), None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formats records as one JSON object per line, merging in the structured
+    `request_log` dict that RequestLogMiddleware attaches.
+    """
+    def format(self, record):
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        fields = getattr(record, 'request_log', None)
+        if isinstance(fields, dict):
+            data.update(fields)
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
@@ -0,0 +1,76 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU of rendered-ready responses for one viewset, holding at
+    most `max_size` entries and counting hits and misses. Keys carry the
+    model versions they were built from, so stale entries are never hit;
+    they age out as newer ones are added.
+    """
+    def __init__(self, name, max_size=512):
+        self.name = name
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'name': self.name,
+                'size': len(self.entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+_caches = {}
+_lock = threading.Lock()
+
+
+def get_cache(name):
+    with _lock:
+        if name not in _caches:
+            _caches[name] = ResponseCache(name, max_size=getattr(settings, 'RESPONSE_CACHE_SIZE', 512))
+        return _caches[name]
+
+
+def stats():
+    """
+    Statistics for every response cache in this process, by name.
+    """
+    with _lock:
+        caches = sorted(_caches.values(), key=lambda cache: cache.name)
+    return [cache.stats() for cache in caches]
@@ -0,0 +1,202 @@
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+from .models import Attendance, ClassAttendanceDaily, StudentAttendanceTerm
+
+# Attendance rows are rolled up as (student_id, class_instance_id, date, present).
+FIELDS = ('student_id', 'class_instance_id', 'date', 'present')
+
+
+def term_for_month(month):
+    for name, first, last in settings.SCHOOL_TERMS:
+        if first <= month <= last:
+            return name
+    return ''
+
+
+def rate(present, absent):
+    total = present + absent
+    return round(100 * present / total, 2) if total else None
+
+
+def state(attendance):
+    date = Attendance._meta.get_field('date').to_python(attendance.date)
+    return attendance.student_id, attendance.class_instance_id, date, bool(attendance.present)
+
+
+def apply(added=(), removed=(), using=connection):
+    """
+    Adds the `added` attendance states to the rollups and subtracts the
+    `removed` ones, netting out states that appear in both. Each rollup
+    table is updated with one upsert per batch that increments the stored
+    counts, so the totals stay correct under concurrent writers.
+    """
+    daily, terms = Counter(), Counter()
+    for sign, rows in ((1, added), (-1, removed)):
+        for student_id, class_instance_id, date, present in rows:
+            column = 'present' if present else 'absent'
+            daily[(class_instance_id, date, column)] += sign
+            terms[(student_id, term_for_month(date.month), date.year, column)] += sign
+    _upsert(ClassAttendanceDaily, ('class_instance_id', 'date'), daily, using)
+    _upsert(StudentAttendanceTerm, ('student_id', 'term', 'year'), terms, using)
+
+
+def subtract_deleted(removed, using=connection):
+    """
+    Subtracts deleted attendance from the rollups. Only existing rollup rows
+    are updated: when a student or class is deleted its rollup rows cascade
+    away with its attendance and must not be recreated.
+    """
+    daily, terms = defaultdict(Counter), defaultdict(Counter)
+    for student_id, class_instance_id, date, present in removed:
+        column = 'present' if present else 'absent'
+        daily[(class_instance_id, date)][column] += 1
+        terms[(student_id, term_for_month(date.month), date.year)][column] += 1
+    for (class_instance_id, date), counts in daily.items():
+        _decrement(ClassAttendanceDaily.objects.filter(class_instance_id=class_instance_id, date=date), counts, using)
+    for (student_id, term, year), counts in terms.items():
+        _decrement(StudentAttendanceTerm.objects.filter(student_id=student_id, term=term, year=year), counts, using)
+
+
+def _decrement(queryset, counts, using):
+    queryset.using(using.alias).update(**{column: F(column) - count for column, count in counts.items()})
+
+
+def _upsert(model, keys, deltas, using):
+    rows = defaultdict(lambda: [0, 0])
+    for (*key, column), delta in deltas.items():
+        rows[tuple(key)][column == 'absent'] += delta
+    increment(model, keys, ('present', 'absent'), [key + tuple(counts) for key, counts in rows.items()], using)
+
+
+def increment(model, keys, columns, rows, using=connection, batch_size=500):
+    """
+    Adds each row's trailing `columns` values to the counters stored under
+    its leading `keys` values, creating missing rows, with one
+    INSERT ... ON CONFLICT DO UPDATE statement per batch.
+    """
+    rows = [row for row in rows if any(row[len(keys):])]
+    if not rows:
+        return
+    table = model._meta.db_table
+    placeholder = '(' + ', '.join(['%s'] * (len(keys) + len(columns))) + ')'
+    updates = ', '.join(f'{column} = {table}.{column} + excluded.{column}' for column in columns)
+    ops = using.ops
+    with using.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            params = [_adapt(ops, value) for row in batch for value in row]
+            cursor.execute(
+                f"INSERT INTO {table} ({', '.join(keys + columns)}) VALUES {', '.join([placeholder] * len(batch))} "
+                f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {updates}",
+                params,
+            )
+
+
+def _adapt(ops, value):
+    if isinstance(value, Decimal):
+        return ops.adapt_decimalfield_value(value)
+    if hasattr(value, 'isoformat'):
+        return ops.adapt_datefield_value(value)
+    return value
+
+
+def expected_rollups():
+    """
+    Computes both rollups from scratch with two grouped queries over
+    Attendance. Returns ({(class_instance_id, date): (present, absent)},
+    {(student_id, term, year): (present, absent)}).
+    """
+    counts = {'present_count': Count('pk', filter=Q(present=True)), 'absent_count': Count('pk', filter=Q(present=False))}
+    daily = {
+        (row['class_instance_id'], row['date']): (row['present_count'], row['absent_count'])
+        for row in Attendance.objects.values('class_instance_id', 'date').annotate(**counts).order_by()
+    }
+    monthly = (
+        Attendance.objects.annotate(year=ExtractYear('date'), month=ExtractMonth('date'))
+        .values('student_id', 'year', 'month').annotate(**counts).order_by()
+    )
+    terms = defaultdict(lambda: [0, 0])
+    for row in monthly:
+        totals = terms[(row['student_id'], term_for_month(row['month']), row['year'])]
+        totals[0] += row['present_count']
+        totals[1] += row['absent_count']
+    return daily, {key: tuple(value) for key, value in terms.items()}
+
+
+def stored_rollups():
+    daily = {
+        (class_instance_id, date): (present, absent)
+        for class_instance_id, date, present, absent in ClassAttendanceDaily.objects.values_list(
+            'class_instance_id', 'date', 'present', 'absent',
+        )
+    }
+    terms = {
+        (student_id, term, year): (present, absent)
+        for student_id, term, year, present, absent in StudentAttendanceTerm.objects.values_list(
+            'student_id', 'term', 'year', 'present', 'absent',
+        )
+    }
+    return daily, terms
+
+
+def drift(expected, stored):
+    """
+    Returns the keys whose stored counts differ from the expected ones,
+    treating a missing row as zero counts.
+    """
+    empty = (0, 0)
+    return sorted(
+        (key for key in expected.keys() | stored.keys() if expected.get(key, empty) != stored.get(key, empty)),
+        key=str,
+    )
+
+
+@transaction.atomic
+def rebuild():
+    daily, terms = expected_rollups()
+    ClassAttendanceDaily.objects.all().delete()
+    StudentAttendanceTerm.objects.all().delete()
+    ClassAttendanceDaily.objects.bulk_create(
+        [ClassAttendanceDaily(class_instance_id=key[0], date=key[1], present=p, absent=a) for key, (p, a) in daily.items()],
+        batch_size=1000,
+    )
+    StudentAttendanceTerm.objects.bulk_create(
+        [StudentAttendanceTerm(student_id=key[0], term=key[1], year=key[2], present=p, absent=a) for key, (p, a) in terms.items()],
+        batch_size=1000,
+    )
+    return len(daily), len(terms)
+
+
+def capture_previous(sender, instance, raw=False, **kwargs):
+    """
+    pre_save: remembers the stored state of an attendance row being updated
+    so post_save can move its counts.
+    """
+    instance._rollup_previous = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    instance._rollup_previous = (
+        Attendance.objects.using(instance._state.db).filter(pk=instance.pk).values_list(*FIELDS).first()
+    )
+
+
+def attendance_saved(sender, instance, raw=False, using=None, **kwargs):
+    # Fixture loads are not counted; run rebuild_attendance_rollups after them.
+    if raw:
+        return
+    previous = getattr(instance, '_rollup_previous', None)
+    apply(added=[state(instance)], removed=[previous] if previous else [], using=_connection(using))
+
+
+def attendance_deleted(sender, instance, using=None, **kwargs):
+    subtract_deleted([state(instance)], using=_connection(using))
+
+
+def _connection(alias):
+    return connections[alias] if alias else connection
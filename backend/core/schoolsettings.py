@@ -0,0 +1,65 @@
+import logging
+import threading
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from . import versions
+from .models import SchoolSettings
+
+logger = logging.getLogger(__name__)
+
+VERSION = versions.model_name(SchoolSettings)
+
+_cached = None
+_lock = threading.Lock()
+_names = [field.attname for field in SchoolSettings._meta.concrete_fields]
+
+
+def version():
+    """
+    The current settings version, usable as an ETag.
+    """
+    return versions.current(VERSION)
+
+
+def load():
+    """
+    Reads the settings row from the database, creating the defaults the
+    first time.
+    """
+    settings = SchoolSettings.objects.order_by('pk').first()
+    if settings is None:
+        settings = SchoolSettings.objects.create(
+            school_name='Elite Academy',
+            academic_year=timezone.now().year,
+            motto='',
+            current_term='Term 1',
+            logo='',
+        )
+        logger.debug('SchoolSettings: created default settings')
+    return settings
+
+
+def get():
+    """
+    Returns the school settings, loading them from the database only when
+    another request or worker has changed them since they were last read.
+    Each call returns its own instance.
+    """
+    stamp = version()
+    with _lock:
+        cached = _cached
+    if cached is not None and cached[0] == stamp:
+        return SchoolSettings.from_db(DEFAULT_DB_ALIAS, _names, cached[1])
+
+    settings = load()
+    values = tuple(getattr(settings, name) for name in _names)
+
+    def store():
+        global _cached
+        with _lock:
+            _cached = (stamp, values)
+    # Rows read inside a transaction that may still roll back are not kept.
+    transaction.on_commit(store)
+    return settings
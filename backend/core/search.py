@@ -0,0 +1,140 @@
+from collections import namedtuple
+from functools import reduce
+from operator import or_
+
+from django.apps import apps
+from django.db import connection, connections
+from django.db.models import Q
+
+# Free-text columns indexed per model. Each model gets an external-content
+# FTS5 table named `<db_table>_fts`, kept in sync by SQLite triggers so bulk
+# writes and raw SQL are indexed too.
+INDEXES = {
+    'Announcement': ('title', 'content'),
+    'Message': ('content',),
+    'ParentFeedback': ('content',),
+    'ContactMessage': ('message',),
+    'Grade': ('remarks',),
+}
+
+TOKENIZER = 'porter unicode61 remove_diacritics 2'
+
+Hit = namedtuple('Hit', ['pk', 'rank', 'snippet'])
+
+
+def indexed_models():
+    return [apps.get_model('core', name) for name in INDEXES]
+
+
+def fts_table(model):
+    return f'{model._meta.db_table}_fts'
+
+
+def is_available(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def install(using=connection):
+    """
+    Creates any missing FTS5 tables and sync triggers, and fills newly created
+    tables from their content table. Safe to run repeatedly; it runs after
+    every migrate because rebuilding a table on SQLite drops its triggers.
+    """
+    if not is_available(using):
+        return []
+    created = []
+    with using.cursor() as cursor:
+        for model in indexed_models():
+            table, source = fts_table(model), model._meta.db_table
+            columns = INDEXES[model.__name__]
+            cols = ', '.join(columns)
+            new_cols = ', '.join(f'new.{column}' for column in columns)
+            old_cols = ', '.join(f'old.{column}' for column in columns)
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [table])
+            exists = cursor.fetchone() is not None
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5("
+                f"{cols}, content='{source}', content_rowid='id', tokenize='{TOKENIZER}')"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON {source} BEGIN "
+                f"INSERT INTO {table}(rowid, {cols}) VALUES (new.id, {new_cols}); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON {source} BEGIN "
+                f"INSERT INTO {table}({table}, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE OF {cols} ON {source} BEGIN "
+                f"INSERT INTO {table}({table}, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); "
+                f"INSERT INTO {table}(rowid, {cols}) VALUES (new.id, {new_cols}); END"
+            )
+            if not exists:
+                cursor.execute(f"INSERT INTO {table}({table}) VALUES ('rebuild')")
+                created.append(table)
+    return created
+
+
+def install_after_migrate(sender, using, **kwargs):
+    install(connections[using])
+
+
+def rebuild(model, using=connection):
+    """
+    Rebuilds the index for `model` from its content table.
+    """
+    table = fts_table(model)
+    with using.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {table}({table}) VALUES ('rebuild')")
+        cursor.execute(f"SELECT COUNT(*) FROM {table}_docsize")
+        return cursor.fetchone()[0]
+
+
+def match_expression(text):
+    """
+    Turns user input into a safe FTS5 query: every term must match, each as
+    a quoted prefix so punctuation cannot be parsed as query syntax.
+    """
+    terms = [term.replace('"', '""') for term in text.split()]
+    return ' '.join(f'"{term}"*' for term in terms if term)
+
+
+def search(queryset, text, limit=20, batch_size=200):
+    """
+    Returns up to `limit` Hits for rows of `queryset` matching `text`, best
+    ranked first. Matches are read from the index in rank order and checked
+    against `queryset` a batch at a time, so scoped querysets (e.g. a user's
+    own messages) only see rows they are allowed to.
+    """
+    model = queryset.model
+    expression = match_expression(text)
+    if not expression:
+        return []
+    if not is_available():
+        return _fallback_search(queryset, text, limit)
+
+    table = fts_table(model)
+    scoped = bool(queryset.query.where)
+    sql = (
+        f"SELECT rowid, rank, snippet({table}, -1, '[', ']', '...', 12) "
+        f"FROM {table} WHERE {table} MATCH %s ORDER BY rank"
+    )
+    hits = []
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [expression])
+        while len(hits) < limit:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            if scoped:
+                allowed = set(queryset.filter(pk__in=[row[0] for row in rows]).values_list('pk', flat=True))
+                rows = [row for row in rows if row[0] in allowed]
+            hits.extend(Hit(*row) for row in rows)
+    return hits[:limit]
+
+
+def _fallback_search(queryset, text, limit):
+    columns = INDEXES[queryset.model.__name__]
+    condition = reduce(or_, (Q(**{f'{column}__icontains': text}) for column in columns))
+    pks = queryset.filter(condition).order_by('-pk').values_list('pk', flat=True)[:limit]
+    return [Hit(pk, 0.0, None) for pk in pks]
@@ -0,0 +1,381 @@
+import datetime
+import math
+import random
+from decimal import Decimal
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import ledger, rollups
+from .models import (
+    Attendance, ClassInstance, Exam, Fee, FeePayment, Grade, LibraryBorrowing, LibraryItem, Parent, Student, Subject,
+    Timetable, User,
+)
+
+SUBJECTS = [
+    ('MAT', 'Mathematics'), ('ENG', 'English'), ('KIS', 'Kiswahili'), ('BIO', 'Biology'), ('CHE', 'Chemistry'),
+    ('PHY', 'Physics'), ('HIS', 'History'), ('GEO', 'Geography'), ('CRE', 'Religious Education'),
+    ('BUS', 'Business Studies'), ('AGR', 'Agriculture'), ('CMP', 'Computer Studies'),
+]
+# Every class takes these; the rest of its subjects are drawn at random.
+CORE_SUBJECTS = ('MAT', 'ENG', 'KIS')
+FIRST_NAMES = [
+    'amani', 'baraka', 'chausiku', 'daudi', 'eshe', 'faraji', 'gathoni', 'hamisi', 'imani', 'jabari', 'kamau',
+    'lulu', 'makena', 'njeri', 'otieno', 'pendo', 'rehema', 'sefu', 'tumaini', 'wanjiru', 'zawadi', 'akinyi',
+]
+LAST_NAMES = [
+    'mwangi', 'otieno', 'kamau', 'wanjiku', 'ochieng', 'kiprono', 'mutua', 'njoroge', 'achieng', 'kibet', 'wafula',
+    'chebet', 'omondi', 'njeri', 'kariuki', 'moraa', 'barasa', 'jeptoo',
+]
+REMARKS = [(80, 'Excellent work'), (65, 'Good progress'), (50, 'Fair, keep working'), (0, 'Needs improvement')]
+PAYMENT_METHODS = ['mpesa', 'bank', 'cash', 'card']
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
+TERM_FEE = Decimal('15000.00')
+
+
+class SeedError(Exception):
+    pass
+
+
+def seed_school(students, years=1, seed=0, end_date=None, class_size=40, subjects_per_class=7,
+                attendance_days=20, prefix='seed', password='password', chunk_size=1000, log=None):
+    """
+    Generates a school of `students` students with `years` school years of
+    history ending at `end_date` (today by default): classes with subjects,
+    teachers and timetables, parents, exams and grades, attendance on
+    `attendance_days` school days a year, termly fees with payments, and
+    library borrowings. The same `seed` and `end_date` give the same data.
+
+    Users share one password hash. Rows needed later by id are written with
+    bulk_create; the high-volume history tables are written with one
+    prepared INSERT per batch, which SQLite runs several times faster than
+    bulk_create's parameter-limited multi-row inserts. Students are
+    processed `chunk_size` at a time, one transaction per chunk, and the fee
+    accounts and attendance rollups are updated as each chunk is written.
+    """
+    log = log or (lambda message: None)
+    if User.objects.filter(username__startswith=f'{prefix}-').exists():
+        raise SeedError(f'Users prefixed "{prefix}-" already exist; choose another prefix.')
+    rng = random.Random(seed)
+    end_date = end_date or timezone.localdate()
+    school_years = list(range(end_date.year - years + 1, end_date.year + 1))
+    password = make_password(password)
+    adapt = Adapter()
+
+    admin = User.objects.create(
+        username=f'{prefix}-admin', email=f'admin@{prefix}.school.test', role='admin', password=password, is_staff=True,
+    )
+    staff = _users(prefix, 'staff', max(1, students // 1000), password)
+    class_count = max(1, math.ceil(students / class_size))
+    teachers = _users(prefix, 'teacher', max(2, class_count * 3 // 2), password)
+    subjects = _subjects(admin)
+    classes = ClassInstance.objects.bulk_create(
+        ClassInstance(name=f'Form {index % 4 + 1} {_stream(index // 4)}', created_by=admin) for index in range(class_count)
+    )
+    class_subjects = _assign_classes(rng, classes, subjects, teachers, subjects_per_class)
+    _timetables(classes, class_subjects, admin, adapt)
+    exams = _exams(school_years, end_date, admin)
+    items = LibraryItem.objects.bulk_create(
+        LibraryItem(title=f'{name.title()} Reader {index}', item_type='Book', isbn=f'{prefix[:10]}-{index:08d}', created_by=admin)
+        for index, name in zip(range(max(20, students // 10)), _cycle(LAST_NAMES))
+    )
+    school_days = {year: _school_days(rng, year, end_date, attendance_days) for year in school_years}
+    subject_difficulty = {subject.pk: rng.uniform(-8, 8) for subject in subjects}
+    log(f'Created {class_count} classes, {len(teachers)} teachers and {len(exams)} exams.')
+
+    context = {
+        'rng': rng, 'adapt': adapt, 'password': password, 'prefix': prefix, 'class_size': class_size,
+        'classes': classes, 'class_subjects': class_subjects, 'teachers': teachers, 'staff': staff, 'exams': exams,
+        'items': items, 'school_days': school_days, 'difficulty': subject_difficulty, 'end_date': end_date,
+    }
+    totals = {}
+    for start in range(0, students, chunk_size):
+        with transaction.atomic():
+            counts = _seed_students(context, range(start, min(start + chunk_size, students)))
+        for name, count in counts.items():
+            totals[name] = totals.get(name, 0) + count
+        log(f'Seeded students {start + 1}-{min(start + chunk_size, students)} of {students}.')
+
+    LibraryItem.objects.filter(borrowings__returned=False).update(status='borrowed')
+    totals.update(classes=class_count, teachers=len(teachers), exams=len(exams), library_items=len(items))
+    return totals
+
+
+class Adapter:
+    """
+    Converts dates, datetimes and decimals to database parameters once per
+    distinct value; history rows repeat the same few values millions of
+    times.
+    """
+    def __init__(self, using=connection):
+        ops = using.ops
+        self.date = lru_cache(maxsize=None)(ops.adapt_datefield_value)
+        self.time = lru_cache(maxsize=None)(ops.adapt_timefield_value)
+        self.decimal = lru_cache(maxsize=None)(ops.adapt_decimalfield_value)
+        self.datetime = lru_cache(maxsize=None)(
+            lambda date, hour=8: ops.adapt_datetimefield_value(
+                timezone.make_aware(datetime.datetime(date.year, date.month, date.day, hour))
+            )
+        )
+
+
+def insert_rows(model, fields, rows, batch_size=10000, using=connection):
+    """
+    Inserts already-adapted `rows` of `fields` values with one prepared
+    statement per batch. Skips model save(), signals and returned ids.
+    """
+    quote = using.ops.quote_name
+    columns = ', '.join(quote(model._meta.get_field(name).column) for name in fields)
+    placeholders = ', '.join(['%s'] * len(fields))
+    sql = f'INSERT INTO {quote(model._meta.db_table)} ({columns}) VALUES ({placeholders})'
+    with using.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(sql, rows[start:start + batch_size])
+    return len(rows)
+
+
+def _seed_students(context, numbers):
+    rng, prefix = context['rng'], context['prefix']
+    names = [(rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)) for _ in numbers]
+    users = User.objects.bulk_create(
+        User(username=f'{prefix}-{first}.{last}{n}', email=f'{first}.{last}{n}@{prefix}.school.test', role='student',
+             password=context['password'])
+        for n, (first, last) in zip(numbers, names)
+    )
+    students = Student.objects.bulk_create(
+        Student(user=user, admission_number=f'{prefix[:8].upper()}{n:07d}',
+                class_instance=context['classes'][n // context['class_size']])
+        for n, user in zip(numbers, users)
+    )
+    guardians = _families(context, students, names)
+
+    counts = {'students': len(students), 'parents': len({user.pk for users in guardians.values() for user in users})}
+    counts['attendance'] = _attendance(context, students)
+    counts['grades'] = _grades(context, students)
+    counts['fees'], counts['fee_payments'] = _fees(context, students, guardians)
+    counts['library_borrowings'] = _borrowings(context, students)
+    return counts
+
+
+def _families(context, students, names):
+    """
+    Groups consecutive students into families of one to three children with
+    one or two parents, sharing the first child's surname.
+    """
+    rng, prefix = context['rng'], context['prefix']
+    families, index = [], 0
+    while index < len(students):
+        size = rng.choice((1, 1, 2, 2, 3))
+        families.append((students[index:index + size], 2 if rng.random() < 0.3 else 1))
+        index += size
+    parent_users = User.objects.bulk_create(
+        User(username=f'{prefix}-parent{children[0].admission_number}-{p}',
+             email=f'parent{p}.{children[0].admission_number.lower()}@{prefix}.school.test', role='parent',
+             password=context['password'])
+        for children, parents in families for p in range(parents)
+    )
+    Parent.objects.bulk_create(Parent(user=user) for user in parent_users)
+    guardians, links, users = {}, [], iter(parent_users)
+    for children, parents in families:
+        family = [next(users) for _ in range(parents)]
+        for child in children:
+            guardians[child.pk] = family
+            links.extend(Student.parents.through(student_id=child.pk, user_id=user.pk) for user in family)
+    Student.parents.through.objects.bulk_create(links)
+    return guardians
+
+
+def _attendance(context, students):
+    rng, adapt = context['rng'], context['adapt']
+    rows, states = [], []
+    for student in students:
+        rate = min(0.99, max(0.6, rng.gauss(0.92, 0.05)))
+        teacher = context['teachers'][student.class_instance_id % len(context['teachers'])].pk
+        for days in context['school_days'].values():
+            for day in days:
+                present = rng.random() < rate
+                stamp = adapt.datetime(day)
+                rows.append((student.pk, student.class_instance_id, adapt.date(day), present, '', teacher, stamp, stamp))
+                states.append((student.pk, student.class_instance_id, day, present))
+    insert_rows(Attendance, (
+        'student', 'class_instance', 'date', 'present', 'remarks', 'created_by', 'created_at', 'updated_at',
+    ), rows)
+    rollups.apply(states)
+    return len(rows)
+
+
+def _grades(context, students):
+    rng, adapt, difficulty = context['rng'], context['adapt'], context['difficulty']
+    rows = []
+    for student in students:
+        ability = rng.gauss(62, 12)
+        teacher = context['teachers'][student.class_instance_id % len(context['teachers'])].pk
+        for exam, held_on in context['exams']:
+            stamp = adapt.datetime(held_on)
+            for subject_id in context['class_subjects'][student.class_instance_id]:
+                marks = min(100, max(0, round(rng.gauss(ability - difficulty[subject_id], 9))))
+                remark = next(text for floor, text in REMARKS if marks >= floor)
+                rows.append((student.pk, subject_id, exam.pk, marks, remark, teacher, stamp, stamp))
+    return insert_rows(Grade, (
+        'student', 'subject', 'exam', 'marks', 'remarks', 'created_by', 'created_at', 'updated_at',
+    ), rows)
+
+
+def _fees(context, students, guardians):
+    """
+    Bills every student once a term and pays past terms mostly in full and
+    the current term partly, recording each payment in the ledger.
+    """
+    rng, adapt, end_date = context['rng'], context['adapt'], context['end_date']
+    staff = context['staff'][0].pk
+    rows, plans, accounts = [], {}, []
+    for student in students:
+        for exam, held_on in context['exams']:
+            billed_on = held_on.replace(day=1) - datetime.timedelta(days=60)
+            settled = held_on < end_date - datetime.timedelta(days=30)
+            draw = rng.random()
+            if draw < (0.85 if settled else 0.4):
+                paid = TERM_FEE
+            elif draw < (0.95 if settled else 0.8):
+                paid = TERM_FEE * rng.choice((Decimal('0.25'), Decimal('0.5'), Decimal('0.75')))
+            else:
+                paid = Decimal(0)
+            method = rng.choice(PAYMENT_METHODS) if paid else ''
+            balance = TERM_FEE - paid
+            stamp = adapt.datetime(billed_on)
+            rows.append((
+                student.pk, adapt.decimal(TERM_FEE), adapt.decimal(balance), adapt.date(billed_on), method, staff, stamp, stamp,
+            ))
+            plans[(student.pk, billed_on)] = (paid, balance, method, billed_on + datetime.timedelta(days=rng.randint(1, 45)))
+            accounts.append((student.pk, TERM_FEE, balance))
+    insert_rows(Fee, (
+        'student', 'amount', 'balance', 'date', 'payment_method', 'created_by', 'created_at', 'updated_at',
+    ), rows)
+    ledger.adjust_accounts(accounts)
+
+    payments = []
+    fees = Fee.objects.filter(student__in=students).values_list('pk', 'student_id', 'date')
+    for fee_id, student_id, billed_on in fees.iterator(chunk_size=10000):
+        paid, balance, method, paid_on = plans[(student_id, billed_on)]
+        if paid:
+            payer = guardians[student_id][0].pk
+            payments.append((
+                fee_id, adapt.decimal(paid), adapt.decimal(balance), method, payer, adapt.datetime(min(paid_on, context['end_date'])),
+            ))
+    insert_rows(FeePayment, ('fee', 'amount', 'balance_after', 'payment_method', 'paid_by', 'created_at'), payments)
+    return len(rows), len(payments)
+
+
+def _borrowings(context, students):
+    rng, adapt, end_date = context['rng'], context['adapt'], context['end_date']
+    staff = context['staff'][0].pk
+    rows = []
+    for student in students:
+        for days in context['school_days'].values():
+            for _ in range(rng.randint(0, 2) if days else 0):
+                borrowed = rng.choice(days)
+                returned_on = borrowed + datetime.timedelta(days=rng.randint(3, 21))
+                returned = returned_on < end_date
+                stamp = adapt.datetime(borrowed)
+                rows.append((
+                    rng.choice(context['items']).pk, student.pk, adapt.date(borrowed),
+                    adapt.date(returned_on) if returned else None, returned, staff, stamp, stamp,
+                ))
+    return insert_rows(LibraryBorrowing, (
+        'library_item', 'student', 'borrow_date', 'return_date', 'returned', 'created_by', 'created_at', 'updated_at',
+    ), rows)
+
+
+def _users(prefix, role, count, password):
+    return User.objects.bulk_create(
+        User(username=f'{prefix}-{role}{index}', email=f'{role}{index}@{prefix}.school.test', role=role, password=password)
+        for index in range(count)
+    )
+
+
+def _subjects(admin):
+    existing = {subject.code: subject for subject in Subject.objects.filter(code__in=[code for code, name in SUBJECTS])}
+    Subject.objects.bulk_create(
+        Subject(code=code, name=name, created_by=admin) for code, name in SUBJECTS if code not in existing
+    )
+    return list(Subject.objects.filter(code__in=[code for code, name in SUBJECTS]).order_by('code'))
+
+
+def _assign_classes(rng, classes, subjects, teachers, subjects_per_class):
+    core = [subject for subject in subjects if subject.code in CORE_SUBJECTS]
+    electives = [subject for subject in subjects if subject.code not in CORE_SUBJECTS]
+    chosen, subject_links, teacher_links = {}, [], []
+    for index, class_instance in enumerate(classes):
+        picked = core + rng.sample(electives, max(0, min(len(electives), subjects_per_class - len(core))))
+        chosen[class_instance.pk] = [subject.pk for subject in picked]
+        subject_links.extend(
+            ClassInstance.subjects.through(classinstance_id=class_instance.pk, subject_id=subject.pk) for subject in picked
+        )
+        teacher_links.extend(
+            ClassInstance.teachers.through(classinstance_id=class_instance.pk, user_id=teachers[(index + offset) % len(teachers)].pk)
+            for offset in range(min(2, len(teachers)))
+        )
+    ClassInstance.subjects.through.objects.bulk_create(subject_links)
+    ClassInstance.teachers.through.objects.bulk_create(teacher_links)
+    return chosen
+
+
+def _timetables(classes, class_subjects, admin, adapt):
+    rows = []
+    for class_instance in classes:
+        for slot, subject_id in enumerate(class_subjects[class_instance.pk] * 2):
+            day, period = DAYS[slot % len(DAYS)], slot // len(DAYS)
+            starts = datetime.time(8 + period)
+            stamp = adapt.datetime(datetime.date(2000, 1, 1))
+            rows.append((
+                class_instance.pk, subject_id, day, adapt.time(starts), adapt.time(datetime.time(9 + period)),
+                f'Room {class_instance.pk}', admin.pk, stamp, stamp,
+            ))
+    insert_rows(Timetable, (
+        'class_instance', 'subject', 'day', 'start_time', 'end_time', 'room', 'created_by', 'created_at', 'updated_at',
+    ), rows)
+
+
+def _exams(school_years, end_date, admin):
+    """
+    Returns (exam, date held) for one exam at the end of every term that
+    has finished by `end_date`.
+    """
+    planned = []
+    for year in school_years:
+        for term, first_month, last_month in settings.SCHOOL_TERMS:
+            held_on = datetime.date(year, last_month, 1) + datetime.timedelta(days=20)
+            if held_on <= end_date:
+                planned.append((Exam(name=f'{term} {year} Exams', term=term, year=year, created_by=admin), held_on))
+    exams = Exam.objects.bulk_create(exam for exam, held_on in planned)
+    return [(exam, held_on) for exam, (planned_exam, held_on) in zip(exams, planned)]
+
+
+def _school_days(rng, year, end_date, count):
+    last = min(end_date, datetime.date(year, 12, 31))
+    weekdays = []
+    day = datetime.date(year, 1, 1)
+    while day <= last:
+        if day.weekday() < 5:
+            weekdays.append(day)
+        day += datetime.timedelta(days=1)
+    return sorted(rng.sample(weekdays, min(count, len(weekdays))))
+
+
+def _stream(index):
+    # A, B, ... Z, AA, AB, ...
+    letters = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    name = ''
+    while True:
+        name = letters[index % 26] + name
+        index = index // 26 - 1
+        if index < 0:
+            return name
+
+
+def _cycle(values):
+    while True:
+        yield from values
@@ -1,7 +1,73 @@
+from decimal import Decimal
+
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from .authentication import add_claims
 from .models import *
 
-class UserSerializer(serializers.ModelSerializer):
+def _field_tree(value):
+    """
+    Parses 'a.b,a.c,d' into {'a': {'b': {}, 'c': {}}, 'd': {}}.
+    """
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for name in path.strip().split('.'):
+            if name:
+                node = node.setdefault(name, {})
+    return tree
+
+class ExpandableFieldsMixin:
+    """
+    Renders nested serializers as primary keys unless they are requested with
+    `?expand=student.user,subject`, and limits output to `?fields=id,marks`.
+    Dotted names in `?fields=` select inside a relation and expand it.
+    """
+    expand_query_param = 'expand'
+    fields_query_param = 'fields'
+
+    def get_fields(self):
+        fields = super().get_fields()
+        expand, only = self.get_field_trees()
+        for name in list(fields):
+            if only and name not in only:
+                del fields[name]
+                continue
+            field = fields[name]
+            nested = field.child if isinstance(field, serializers.ListSerializer) else field
+            if not isinstance(nested, serializers.BaseSerializer):
+                continue
+            nested_only = only.get(name) if only else None
+            if name in expand or nested_only:
+                nested._field_trees = (expand.get(name, {}), nested_only or None)
+            else:
+                fields[name] = serializers.PrimaryKeyRelatedField(
+                    read_only=True, many=isinstance(field, serializers.ListSerializer), source=field.source,
+                )
+        return fields
+
+    def get_field_trees(self):
+        """
+        Returns the (expand, only) trees for this serializer: handed down by
+        the parent for nested serializers, read from the request at the top.
+        """
+        if hasattr(self, '_field_trees'):
+            return self._field_trees
+        parent = self.parent.parent if isinstance(self.parent, serializers.ListSerializer) else self.parent
+        request = self.context.get('request')
+        if parent is not None or request is None:
+            return {}, None
+        params = request.query_params
+        return (
+            _field_tree(params.get(self.expand_query_param, '')),
+            _field_tree(params.get(self.fields_query_param, '')) or None,
+        )
+
+    def is_expanded(self, name):
+        expand, only = self.get_field_trees()
+        return name in expand or bool(only and only.get(name))
+
+class UserSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=False)
 
     class Meta:
@@ -26,7 +92,7 @@ class UserSerializer(serializers.ModelSerializer):
         instance.save()
         return instance
 
-class SchoolSettingsSerializer(serializers.ModelSerializer):
+class SchoolSettingsSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     created_by = UserSerializer(read_only=True)
 
     class Meta:
@@ -34,7 +100,7 @@ class SchoolSettingsSerializer(serializers.ModelSerializer):
         fields = ['id', 'school_name', 'motto', 'logo', 'academic_year', 'current_term', 'created_by', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_by', 'created_at', 'updated_at']
 
-class SubjectSerializer(serializers.ModelSerializer):
+class SubjectSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     created_by = UserSerializer(read_only=True)
 
     class Meta:
@@ -42,7 +108,7 @@ class SubjectSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'code', 'description', 'created_by', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_by', 'created_at', 'updated_at']
 
-class ClassInstanceSerializer(serializers.ModelSerializer):
+class ClassInstanceSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     subjects = SubjectSerializer(many=True, read_only=True)
     subjects_ids = serializers.PrimaryKeyRelatedField(many=True, queryset=Subject.objects.all(), source='subjects', required=False, write_only=True)
     teachers = UserSerializer(many=True, read_only=True)
@@ -52,14 +118,17 @@ class ClassInstanceSerializer(serializers.ModelSerializer):
 
     def get_students(self, obj):
         students = obj.students.all()
-        return UserSerializer(students, many=True).data
+        if not self.is_expanded('students'):
+            return [student.user_id for student in students]
+        return UserSerializer([student.user for student in students], many=True).data
 
     class Meta:
         model = ClassInstance
         fields = ['id', 'name', 'subjects', 'subjects_ids', 'teachers', 'teachers_ids', 'students', 'created_by', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_by', 'created_at', 'updated_at']
+        prefetch_related = {'students': ['students__user']}
 
-class StudentSerializer(serializers.ModelSerializer):
+class StudentSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     class_instance = ClassInstanceSerializer(read_only=True)
     parents = UserSerializer(many=True, read_only=True)
@@ -69,16 +138,16 @@ class StudentSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'admission_number', 'class_instance', 'parents', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
 
-class ParentSerializer(serializers.ModelSerializer):
+class ParentSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
-    children = UserSerializer(many=True, read_only=True)
+    children = StudentSerializer(many=True, read_only=True, source='user.children')
 
     class Meta:
         model = Parent
         fields = ['id', 'user', 'children', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
 
-class ExamSerializer(serializers.ModelSerializer):
+class ExamSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     created_by = UserSerializer(read_only=True)
 
     class Meta:
@@ -86,7 +155,7 @@ class ExamSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'term', 'year', 'max_marks', 'created_by', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_by', 'created_at', 'updated_at']
 
-class GradeSerializer(serializers.ModelSerializer):
+class GradeSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     student = StudentSerializer(read_only=True)
     subject = SubjectSerializer(read_only=True)
     exam = ExamSerializer(read_only=True)
@@ -97,7 +166,7 @@ class GradeSerializer(serializers.ModelSerializer):
         fields = ['id', 'student', 'subject', 'exam', 'marks', 'remarks', 'created_by', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_by', 'created_at', 'updated_at']
 
-class AttendanceSerializer(serializers.ModelSerializer):
+class AttendanceSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     student = StudentSerializer(read_only=True)
     class_instance = ClassInstanceSerializer(read_only=True)
     created_by = UserSerializer(read_only=True)
@@ -107,7 +176,27 @@ class AttendanceSerializer(serializers.ModelSerializer):
         fields = ['id', 'student', 'class_instance', 'date', 'present', 'remarks', 'created_by', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_by', 'created_at', 'updated_at']
 
-class FeeSerializer(serializers.ModelSerializer):
+class RollCallEntrySerializer(serializers.Serializer):
+    student = serializers.IntegerField()
+    present = serializers.BooleanField()
+    remarks = serializers.CharField(allow_blank=True, required=False, default='')
+
+class RollCallSerializer(serializers.Serializer):
+    records = RollCallEntrySerializer(many=True, allow_empty=False)
+
+    def validate_records(self, records):
+        ids = [record['student'] for record in records]
+        if len(set(ids)) != len(ids):
+            raise serializers.ValidationError('Each student may only appear once.')
+        enrolled = set(
+            Student.objects.filter(class_instance=self.context['class_instance'], pk__in=ids).values_list('pk', flat=True)
+        )
+        unknown = [student for student in ids if student not in enrolled]
+        if unknown:
+            raise serializers.ValidationError(f'Students not in this class: {unknown}')
+        return records
+
+class FeeSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     student = StudentSerializer(read_only=True)
     created_by = UserSerializer(read_only=True)
 
@@ -116,15 +205,63 @@ class FeeSerializer(serializers.ModelSerializer):
         fields = ['id', 'student', 'amount', 'balance', 'date', 'payment_method', 'created_by', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_by', 'created_at', 'updated_at']
 
-class AnnouncementSerializer(serializers.ModelSerializer):
+class FeePaymentSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
+    paid_by = UserSerializer(read_only=True)
+
+    class Meta:
+        model = FeePayment
+        fields = ['id', 'fee', 'amount', 'balance_after', 'payment_method', 'paid_by', 'created_at']
+        read_only_fields = fields
+
+class PaymentRequestSerializer(serializers.Serializer):
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0.01'), required=False)
+    payment_method = serializers.CharField(max_length=50, default='Cash')
+    idempotency_key = serializers.CharField(max_length=64, required=False, allow_blank=True)
+
+class AnnouncementSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     created_by = UserSerializer(read_only=True)
+    target_roles = serializers.CharField(max_length=50)
+    target_classes = serializers.ListField(child=serializers.IntegerField(), required=False)
 
     class Meta:
         model = Announcement
-        fields = ['id', 'title', 'content', 'target_roles', 'created_by', 'created_at', 'updated_at']
+        fields = ['id', 'title', 'content', 'target_roles', 'target_classes', 'created_by', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_by', 'created_at', 'updated_at']
+        prefetch_related = {'target_roles': ['targets'], 'target_classes': ['targets']}
+
+    def validate_target_roles(self, value):
+        roles = {role.strip().lower() for role in value.split(',') if role.strip()}
+        known = {role for role, label in User.ROLE_CHOICES}
+        if not roles or roles - known:
+            raise serializers.ValidationError(f'Give a comma-separated list of roles from: {", ".join(sorted(known))}.')
+        return sorted(roles)
+
+    def validate_target_classes(self, value):
+        classes = set(value)
+        found = set(ClassInstance.objects.filter(pk__in=classes).values_list('pk', flat=True))
+        if classes - found:
+            raise serializers.ValidationError(f'Unknown classes: {", ".join(map(str, sorted(classes - found)))}.')
+        return sorted(classes)
+
+    def create(self, validated_data):
+        roles = validated_data.pop('target_roles')
+        classes = validated_data.pop('target_classes', [])
+        announcement = super().create(validated_data)
+        announcement.set_targets(roles, classes)
+        return announcement
 
-class MessageSerializer(serializers.ModelSerializer):
+    def update(self, instance, validated_data):
+        roles = validated_data.pop('target_roles', None)
+        classes = validated_data.pop('target_classes', None)
+        announcement = super().update(instance, validated_data)
+        if roles is not None or classes is not None:
+            announcement.set_targets(
+                roles if roles is not None else [role for role in instance.target_roles.split(',') if role],
+                classes if classes is not None else instance.target_classes,
+            )
+        return announcement
+
+class MessageSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     sender = UserSerializer(read_only=True)
     receiver = UserSerializer(read_only=True)
 
@@ -133,7 +270,14 @@ class MessageSerializer(serializers.ModelSerializer):
         fields = ['id', 'sender', 'receiver', 'content', 'read', 'created_at', 'updated_at']
         read_only_fields = ['id', 'sender', 'created_at', 'updated_at']
 
-class TimetableSerializer(serializers.ModelSerializer):
+class ConversationSerializer(MessageSerializer):
+    counterpart = serializers.IntegerField(read_only=True)
+    unread = serializers.IntegerField(read_only=True)
+
+    class Meta(MessageSerializer.Meta):
+        fields = MessageSerializer.Meta.fields + ['counterpart', 'unread']
+
+class TimetableSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     class_instance = ClassInstanceSerializer(read_only=True)
     subject = SubjectSerializer(read_only=True)
     created_by = UserSerializer(read_only=True)
@@ -143,7 +287,7 @@ class TimetableSerializer(serializers.ModelSerializer):
         fields = ['id', 'class_instance', 'subject', 'day', 'start_time', 'end_time', 'room', 'created_by', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_by', 'created_at', 'updated_at']
 
-class HomeworkSerializer(serializers.ModelSerializer):
+class HomeworkSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     class_instance = ClassInstanceSerializer(read_only=True)
     subject = SubjectSerializer(read_only=True)
     created_by = UserSerializer(read_only=True)
@@ -153,7 +297,7 @@ class HomeworkSerializer(serializers.ModelSerializer):
         fields = ['id', 'class_instance', 'subject', 'description', 'due_date', 'completed', 'created_by', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_by', 'created_at', 'updated_at']
 
-class LibraryItemSerializer(serializers.ModelSerializer):
+class LibraryItemSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     created_by = UserSerializer(read_only=True)
 
     class Meta:
@@ -161,7 +305,7 @@ class LibraryItemSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'item_type', 'isbn', 'status', 'created_by', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_by', 'created_at', 'updated_at']
 
-class LibraryBorrowingSerializer(serializers.ModelSerializer):
+class LibraryBorrowingSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     library_item = LibraryItemSerializer(read_only=True)
     student = StudentSerializer(read_only=True)
     created_by = UserSerializer(read_only=True)
@@ -171,7 +315,7 @@ class LibraryBorrowingSerializer(serializers.ModelSerializer):
         fields = ['id', 'library_item', 'student', 'borrow_date', 'return_date', 'returned', 'created_by', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_by', 'created_at', 'updated_at']
 
-class LeaveApplicationSerializer(serializers.ModelSerializer):
+class LeaveApplicationSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     approved_by = UserSerializer(read_only=True)
 
@@ -180,17 +324,25 @@ class LeaveApplicationSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'start_date', 'end_date', 'reason', 'status', 'approved_by', 'created_at', 'updated_at']
         read_only_fields = ['id', 'approved_by', 'created_at', 'updated_at']
 
-class ReportCardSerializer(serializers.ModelSerializer):
+class ReportCardSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     student = StudentSerializer(read_only=True)
     grades = GradeSerializer(many=True, read_only=True)
     created_by = UserSerializer(read_only=True)
 
     class Meta:
         model = ReportCard
-        fields = ['id', 'student', 'term', 'year', 'grades', 'overall_grade', 'remarks', 'created_by', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_by', 'created_at', 'updated_at']
-
-class ParentFeedbackSerializer(serializers.ModelSerializer):
+        fields = [
+            'id', 'student', 'term', 'year', 'grades', 'overall_grade', 'average', 'subject_averages',
+            'position', 'class_size', 'remarks', 'created_by', 'created_at', 'updated_at',
+        ]
+        read_only_fields = ['id', 'average', 'subject_averages', 'position', 'class_size', 'created_by', 'created_at', 'updated_at']
+
+class ReportCardGenerationSerializer(serializers.Serializer):
+    term = serializers.CharField(max_length=20)
+    year = serializers.IntegerField()
+    class_instance = serializers.PrimaryKeyRelatedField(queryset=ClassInstance.objects.all(), required=False, allow_null=True)
+
+class ParentFeedbackSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     parent = ParentSerializer(read_only=True)
 
     class Meta:
@@ -198,7 +350,7 @@ class ParentFeedbackSerializer(serializers.ModelSerializer):
         fields = ['id', 'parent', 'content', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
 
-class AuditLogSerializer(serializers.ModelSerializer):
+class AuditLogSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
 
     class Meta:
@@ -206,8 +358,17 @@ class AuditLogSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'action', 'model_name', 'object_id', 'details', 'created_at']
         read_only_fields = ['id', 'created_at']
 
-class ContactMessageSerializer(serializers.ModelSerializer):
+class ContactMessageSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = ContactMessage
         fields = ['id', 'name', 'email', 'message', 'created_at']
         read_only_fields = ['id', 'created_at']
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Issues tokens carrying the user's name, email and role, which refreshed
+    access tokens inherit, so the API can trust them when configured to.
+    """
+    @classmethod
+    def get_token(cls, user):
+        return add_claims(super().get_token(user), user)
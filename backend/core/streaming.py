@@ -0,0 +1,71 @@
+import json
+from itertools import islice
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Renders a list as one JSON document per line and anything else as a
+    single line. Lets clients negotiate `Accept: application/x-ndjson`;
+    list endpoints then stream instead of rendering here.
+    """
+    media_type = NDJSON_MEDIA_TYPE
+    format = 'ndjson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        items = data if isinstance(data, list) else [data]
+        return b''.join(_encode(item) + b'\n' for item in items)
+
+
+def stream_queryset(queryset, serialize, mode, chunk_size=500):
+    """
+    Returns a StreamingHttpResponse writing every row of `queryset` as
+    NDJSON (`mode='ndjson'`) or as one JSON array (`mode='json'`).
+
+    Rows are read with `.iterator(chunk_size)` (prefetches run per chunk)
+    and `serialize` is called on one chunk of instances at a time, so only a
+    chunk of objects and its encoded output are held in memory.
+    """
+    if mode == 'ndjson':
+        content, content_type = _ndjson(queryset, serialize, chunk_size), NDJSON_MEDIA_TYPE
+    else:
+        content, content_type = _json_array(queryset, serialize, chunk_size), 'application/json'
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _chunks(queryset, serialize, chunk_size):
+    rows = queryset.iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield serialize(chunk)
+
+
+def _ndjson(queryset, serialize, chunk_size):
+    for data in _chunks(queryset, serialize, chunk_size):
+        yield b''.join(_encode(item) + b'\n' for item in data)
+
+
+def _json_array(queryset, serialize, chunk_size):
+    yield b'['
+    first = True
+    for data in _chunks(queryset, serialize, chunk_size):
+        encoded = b','.join(_encode(item) for item in data)
+        yield encoded if first else b',' + encoded
+        first = False
+    yield b']'
+
+
+def _encode(item):
+    return json.dumps(item, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+from . import audit
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Writes audit entries inline while the tests run, and drains anything
+    still queued before the test databases are dropped, so no entry
+    outlives the database it was recorded against.
+    """
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.audit_async = getattr(settings, 'AUDIT_ASYNC', True)
+        settings.AUDIT_ASYNC = False
+
+    def teardown_databases(self, old_config, **kwargs):
+        audit.shutdown()
+        super().teardown_databases(old_config, **kwargs)
+
+    def teardown_test_environment(self, **kwargs):
+        settings.AUDIT_ASYNC = self.audit_async
+        super().teardown_test_environment(**kwargs)
@@ -1,3 +1,1261 @@
-from django.test import TestCase
+import base64
+import datetime
+import io
+import json
+import logging
+import os
+import tempfile
+import time
+import traceback
+from collections import defaultdict
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .models import (
+    User, Subject, ClassInstance, Student, Parent, Exam, Grade, Attendance, Fee, Announcement, Message, ReportCard,
+    Timetable, Homework, LibraryItem, LibraryBorrowing, LeaveApplication, ParentFeedback, AuditLog, FeePayment,
+    SchoolSettings, ContactMessage, StudentFeeAccount, ClassAttendanceDaily,
+)
+from . import archive, audit, authentication, inbox, requestlog, responsecache, schoolsettings, versions
+from .ledger import pay
+from .serializers import ClaimsTokenObtainPairSerializer
+from .pagination import KeysetPagination
+from . import rollups
+from .reportcards import generate_report_cards
+from .urls import router
+from .views import SubjectViewSet
+
+ROLES = ('admin', 'teacher', 'parent', 'student', 'staff')
+
+# Maximum (queries, response bytes) for a GET of each route, whichever role
+# makes it. Query counts must not grow with the number of rows, so a budget
+# only needs raising when an endpoint deliberately does more work per page.
+BUDGETS = {
+    'announcement-detail': (3, 500),
+    'announcement-fulltext': (5, 1000),
+    'announcement-list': (3, 1000),
+    'api-root': (1, 1500),
+    'attendance-class-rates': (2, 1500),
+    'attendance-detail': (2, 500),
+    'attendance-list': (2, 24500),
+    'attendance-student-rates': (2, 2500),
+    'auditlog-detail': (2, 500),
+    'auditlog-list': (2, 1000),
+    'cache_stats': (1, 500),
+    'classinstance-detail': (5, 500),
+    'classinstance-list': (5, 1000),
+    'contactmessage-detail': (2, 500),
+    'contactmessage-fulltext': (3, 1500),
+    'contactmessage-list': (2, 1000),
+    'current_user': (1, 500),
+    'dashboard': (41, 97000),
+    'exam-detail': (2, 500),
+    'exam-list': (2, 500),
+    'fee-detail': (2, 500),
+    'fee-list': (2, 6500),
+    'fee-outstanding': (2, 500),
+    'feepayment-detail': (2, 500),
+    'feepayment-list': (2, 4500),
+    'grade-detail': (2, 500),
+    'grade-fulltext': (3, 6000),
+    'grade-list': (2, 22000),
+    'grade-rankings': (5, 17500),
+    'homework-detail': (2, 500),
+    'homework-list': (2, 3500),
+    'leaveapplication-detail': (2, 500),
+    'leaveapplication-list': (2, 7000),
+    'libraryborrowing-detail': (2, 500),
+    'libraryborrowing-list': (2, 6500),
+    'libraryitem-detail': (2, 500),
+    'libraryitem-list': (2, 500),
+    'message-conversations': (2, 3000),
+    'message-detail': (2, 500),
+    'message-fulltext': (4, 6500),
+    'message-inbox': (2, 2500),
+    'message-list': (2, 5500),
+    'message-thread': (2, 500),
+    'message-unread': (2, 500),
+    'parent-detail': (4, 500),
+    'parent-list': (4, 2000),
+    'parentfeedback-detail': (2, 500),
+    'parentfeedback-fulltext': (4, 3500),
+    'parentfeedback-list': (2, 2500),
+    'reportcard-detail': (3, 500),
+    'reportcard-list': (3, 10000),
+    'school-settings-detail': (2, 500),
+    'school-settings-list': (2, 500),
+    'student-detail': (3, 500),
+    'student-list': (3, 5500),
+    'subject-detail': (2, 500),
+    'subject-list': (2, 1000),
+    'timetable-detail': (2, 500),
+    'timetable-list': (2, 3500),
+    'user-detail': (2, 500),
+    'user-list': (2, 4500),
+}
+
+# Query parameters for routes that need them to do any real work.
+PARAMS = {
+    'grade-rankings': lambda school: {'exam': school['exam'].pk},
+    'grade-fulltext': lambda school: {'q': 'work'},
+    'announcement-fulltext': lambda school: {'q': 'sports'},
+    'message-fulltext': lambda school: {'q': 'homework'},
+    'parentfeedback-fulltext': lambda school: {'q': 'teacher'},
+    'contactmessage-fulltext': lambda school: {'q': 'admission'},
+    'fee-outstanding': lambda school: {'group': 'class'},
+    'message-thread': lambda school: {'with': school['teacher'].pk},
+}
+
+
+def seed_school(classes=3, students_per_class=8):
+    """
+    Creates a small school with every kind of record, enough rows per list
+    endpoint that per-row queries show up in the counts.
+    """
+    admin = User.objects.create_user('admin', 'admin@school.test', 'admin', 'pw')
+    staff = User.objects.create_user('staff', 'staff@school.test', 'staff', 'pw')
+    teachers = [User.objects.create_user(f'teacher{i}', f'teacher{i}@school.test', 'teacher', 'pw') for i in range(2)]
+    SchoolSettings.objects.create(school_name='Test Academy', academic_year=2025, current_term='Term 1', created_by=admin)
+    subjects = [Subject.objects.create(name=name, code=name[:3].upper(), created_by=admin)
+                for name in ('Mathematics', 'English', 'Science', 'History')]
+    exam = Exam.objects.create(name='Midterm', term='Term 1', year=2025, created_by=admin)
+    Exam.objects.create(name='Final', term='Term 1', year=2025, created_by=admin)
+    item = LibraryItem.objects.create(title='Atlas', item_type='Book', isbn='978-0', created_by=admin)
+
+    students, parents = [], []
+    for c in range(classes):
+        class_instance = ClassInstance.objects.create(name=f'Form {c + 1}', created_by=admin)
+        class_instance.subjects.set(subjects)
+        class_instance.teachers.set(teachers)
+        for index, subject in enumerate(subjects):
+            Timetable.objects.create(
+                class_instance=class_instance, subject=subject, day='Monday',
+                start_time=datetime.time(8 + index), end_time=datetime.time(9 + index), created_by=admin,
+            )
+            Homework.objects.create(
+                class_instance=class_instance, subject=subject, description=f'{subject.name} exercises',
+                due_date=datetime.date(2025, 2, 1), created_by=teachers[0],
+            )
+        for s in range(students_per_class):
+            number = c * students_per_class + s
+            user = User.objects.create_user(f'student{number}', f'student{number}@school.test', 'student', 'pw')
+            student = Student.objects.create(user=user, admission_number=f'ADM{number:04d}', class_instance=class_instance)
+            if number % 2 == 0:
+                parent_user = User.objects.create_user(f'parent{number}', f'parent{number}@school.test', 'parent', 'pw')
+                parents.append(Parent.objects.create(user=parent_user))
+            student.parents.add(parents[-1].user)
+            students.append(student)
+            for subject in subjects:
+                Grade.objects.create(
+                    student=student, subject=subject, exam=exam, marks=40 + (number * 7 + subject.pk) % 60,
+                    remarks='steady work', created_by=teachers[0],
+                )
+            for day in range(1, 6):
+                Attendance.objects.create(
+                    student=student, class_instance=class_instance, date=datetime.date(2025, 1, day),
+                    present=(number + day) % 4 != 0, created_by=teachers[0],
+                )
+            fee = Fee.objects.create(student=student, amount=500, balance=500, date=datetime.date(2025, 1, 10), created_by=staff)
+            pay(fee.pk, staff, amount=200, payment_method='cash')
+            LibraryBorrowing.objects.create(
+                library_item=item, student=student, borrow_date=datetime.date(2025, 1, 15), created_by=staff,
+            )
+            LeaveApplication.objects.create(
+                user=user, start_date=datetime.date(2025, 3, 1), end_date=datetime.date(2025, 3, 2), reason='Family event',
+            )
+    generate_report_cards('Term 1', 2025, user=admin)
+
+    for parent in parents:
+        ParentFeedback.objects.create(parent=parent, content='Thank you to the class teacher')
+        Message.objects.create(sender=teachers[0], receiver=parent.user, content='Please check the homework')
+        Message.objects.create(sender=parent.user, receiver=teachers[0], content='Homework received, thanks')
+    for roles in ('parent,student', 'teacher', 'admin,teacher,staff'):
+        announcement = Announcement.objects.create(title='Sports day', content='Sports day is on Friday', created_by=admin)
+        announcement.set_targets(roles.split(','))
+    for index in range(5):
+        ContactMessage.objects.create(name=f'Visitor {index}', email=f'visitor{index}@example.com', message='Admission enquiry')
+        AuditLog.objects.create(user=admin, action='UPDATE', model_name='Student', object_id=str(students[index].pk))
+
+    return {
+        'admin': admin, 'staff': staff, 'teacher': teachers[0], 'parent': parents[0].user,
+        'student': students[0].user, 'exam': exam,
+    }
+
+
+class QueryLog:
+    """
+    Execute wrapper recording each query with the innermost call site in
+    the project, so per-row queries point at the serializer or view that
+    issued them.
+    """
+    root = str(Path(settings.BASE_DIR).resolve())
+    # Files that wrap every query rather than issue it.
+    skipped = {os.path.abspath(__file__), os.path.abspath(requestlog.__file__), os.path.join(root, 'manage.py')}
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append((self.call_site(), sql))
+        return execute(sql, params, many, context)
+
+    def call_site(self):
+        fallback = None
+        for frame in reversed(traceback.extract_stack()[:-2]):
+            filename = os.path.abspath(frame.filename)
+            if filename in self.skipped:
+                continue
+            if filename.startswith(self.root):
+                return f'{os.path.relpath(filename, self.root)}:{frame.lineno} in {frame.name}'
+            if fallback is None and f'{os.sep}django{os.sep}db{os.sep}' not in filename:
+                fallback = f'{filename}:{frame.lineno} in {frame.name}'
+        return fallback or 'unknown'
+
+    def report(self):
+        sites = defaultdict(lambda: defaultdict(int))
+        for site, sql in self.queries:
+            sites[site][sql] += 1
+        lines = []
+        for site, statements in sorted(sites.items(), key=lambda item: -sum(item[1].values())):
+            lines.append(f'  {sum(statements.values())}x {site}')
+            for sql, count in sorted(statements.items(), key=lambda item: -item[1]):
+                lines.append(f'      {count}x {sql[:300]}')
+        return '\n'.join(lines)
+
+
+def routes(school):
+    """
+    Yields (url name, path, params) for every GET route in core/urls.py: the
+    router's list, detail and extra actions, and the plain paths.
+    """
+    yield 'api-root', reverse('api-root'), {}
+    yield 'current_user', reverse('current_user'), {}
+    yield 'cache_stats', reverse('cache_stats'), {}
+    for prefix, viewset, basename in router.registry:
+        yield f'{basename}-list', reverse(f'{basename}-list'), {}
+        model = viewset.serializer_class.Meta.model
+        instance = model.objects.order_by('pk').first()
+        if instance is not None:
+            yield f'{basename}-detail', reverse(f'{basename}-detail', args=[instance.pk]), {}
+        for extra in viewset.get_extra_actions():
+            if 'get' not in extra.mapping:
+                continue
+            name = f'{basename}-{extra.url_name}'
+            args = [instance.pk] if extra.detail and instance is not None else []
+            if extra.detail and not args:
+                continue
+            params = PARAMS[name](school) if name in PARAMS else {}
+            yield name, reverse(name, args=args), params
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    REQUEST_LOG_SAMPLE_RATE=0.0,
+)
+class EndpointBudgetTests(TestCase):
+    """
+    Calls every GET route as each role against a seeded school and checks
+    the query count and response size against BUDGETS. Requests carry a real
+    access token, so authentication is counted as it is in production.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = seed_school()
+
+    def test_every_route_has_a_budget(self):
+        names = {name for name, path, params in routes(self.school)}
+        self.assertEqual(sorted(names - set(BUDGETS)), [], 'Declare a budget in core/tests.py for these routes')
+
+    def test_budgets(self):
+        for role in ROLES:
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.school[role])}')
+            checks = list(routes(self.school))
+            checks.append(('dashboard', reverse('dashboard', args=[role]), {}))
+            for name, path, params in checks:
+                with self.subTest(role=role, route=name):
+                    self.check_budget(client, name, path, params)
+
+    def test_revalidation(self):
+        """
+        Every route that sends an ETag answers it with an empty 304 after
+        authenticating and computing the validator, and nothing else.
+        """
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.school["admin"])}')
+        for name, path, params in routes(self.school):
+            response = client.get(path, params)
+            if not response.has_header('ETag'):
+                continue
+            with self.subTest(route=name):
+                log = QueryLog()
+                with connection.execute_wrapper(log):
+                    response = client.get(path, params, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+                if len(log.queries) > 2:
+                    self.fail(f'{path} ran {len(log.queries)} queries for a 304:\n{log.report()}')
+
+    def check_budget(self, client, name, path, params):
+        max_queries, max_bytes = BUDGETS.get(name, (0, 0))
+        log = QueryLog()
+        with connection.execute_wrapper(log):
+            response = client.get(path, params)
+        self.assertLess(response.status_code, 500, f'{path} failed: {response.content[:500]!r}')
+        size = len(response.content)
+        if len(log.queries) > max_queries:
+            self.fail(f'{path} ran {len(log.queries)} queries (budget {max_queries}):\n{log.report()}')
+        if size > max_bytes:
+            self.fail(f'{path} returned {size} bytes (budget {max_bytes})')
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_school(classes=1, students_per_class=6)
+        borrowings = list(LibraryBorrowing.objects.order_by('pk'))
+        for borrowing, day in zip(borrowings, (3, 1, 3)):
+            borrowing.return_date = datetime.date(2025, 2, day)
+            borrowing.save()
+
+    def page(self, ordering, cursor=None):
+        view = type('View', (), {'ordering': ordering})()
+        params = {'page_size': 2}
+        if cursor is not None:
+            params['cursor'] = cursor
+        request = Request(APIRequestFactory().get('/api/library-borrowings/', params))
+        paginator = KeysetPagination()
+        results = paginator.paginate_queryset(LibraryBorrowing.objects.all(), request, view)
+        return results, paginator.get_next_link()
+
+    def walk(self, ordering):
+        seen, cursor = [], None
+        while True:
+            results, link = self.page(ordering, cursor)
+            seen.extend(borrowing.pk for borrowing in results)
+            if link is None:
+                return seen
+            cursor = parse_qs(urlparse(link).query)['cursor'][0]
+
+    def test_every_row_is_paged_once_in_order(self):
+        for ordering in (('-return_date',), ('return_date',), ('-created_at', '-id')):
+            with self.subTest(ordering=ordering):
+                expected = list(LibraryBorrowing.objects.order_by(*ordering, 'id' if ordering[0][0] != '-' else '-id')
+                                .values_list('pk', flat=True))
+                self.assertEqual(self.walk(ordering), expected)
+
+    def test_tampered_cursor_is_not_found(self):
+        for values in ([{'a': 1}, 1], ['not a date', 1], ['2025-01-01T00:00:00', 'x'], [True, 1]):
+            cursor = base64.urlsafe_b64encode(json.dumps({'v': values, 'r': 0}).encode()).decode()
+            with self.subTest(values=values), self.assertRaises(NotFound):
+                self.page(('-created_at', '-id'), cursor)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class FullTextSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ann, cls.ben, cls.cal = (
+            User.objects.create_user(name, f'{name}@school.test', 'teacher', 'pw') for name in ('ann', 'ben', 'cal')
+        )
+        cls.admin = User.objects.create_user('admin', 'admin@school.test', 'admin', 'pw')
+        cls.long = Message.objects.create(
+            sender=cls.ben, receiver=cls.ann, content='The exam timetable is on the board next to the library and the hall',
+        )
+        cls.short = Message.objects.create(sender=cls.ann, receiver=cls.ben, content='Exam results: exams marked')
+        cls.private = Message.objects.create(sender=cls.ben, receiver=cls.cal, content='Exam papers are in the staff room')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.ann)
+
+    def search(self, **params):
+        return self.client.get(reverse('message-fulltext'), params)
+
+    def ids(self, **params):
+        return [row['object']['id'] for row in self.search(**params).json()['results']]
+
+    def test_hits_are_ranked_with_snippets(self):
+        results = self.search(q='exam').json()['results']
+        self.assertEqual([row['object']['id'] for row in results], [self.short.pk, self.long.pk])
+        self.assertIn('[Exam]', results[0]['snippet'])
+        self.assertLess(results[0]['rank'], results[1]['rank'])
+        self.assertEqual(self.ids(q='timet'), [self.long.pk])
+        self.assertEqual(self.ids(q='exam "board'), [self.long.pk])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.long.content = 'Sports day moved to Friday'
+        self.long.save()
+        self.assertEqual(self.ids(q='exam'), [self.short.pk])
+        self.assertEqual(self.ids(q='sports'), [self.long.pk])
+        self.short.delete()
+        self.assertEqual(self.ids(q='exam'), [])
+
+    def test_hits_are_limited_to_the_callers_rows(self):
+        self.assertNotIn(self.private.pk, self.ids(q='exam'))
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(set(self.ids(q='exam')), {self.long.pk, self.short.pk, self.private.pk})
+
+    def test_query_and_limit_are_validated(self):
+        for params in ({}, {'q': '  '}, {'q': 'exam', 'limit': 'ten'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.search(**params).status_code, 400)
+        self.assertEqual(self.ids(q='exam', limit=1), [self.short.pk])
+
+
+class ExpandableFieldsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = seed_school(classes=1, students_per_class=5)
+        cls.grade = Grade.objects.select_related('student__user').first()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.school['admin'])
+
+    def get(self, **params):
+        return self.client.get(reverse('grade-detail', args=[self.grade.pk]), params)
+
+    def test_relations_are_ids_unless_expanded(self):
+        data = self.get().json()
+        self.assertEqual(
+            (data['student'], data['subject'], data['exam']),
+            (self.grade.student_id, self.grade.subject_id, self.grade.exam_id),
+        )
+        data = self.get(expand='student.user,subject').json()
+        self.assertEqual(data['student']['user']['username'], self.grade.student.user.username)
+        self.assertEqual(data['student']['class_instance'], self.grade.student.class_instance_id)
+        self.assertEqual(data['subject']['id'], self.grade.subject_id)
+        self.assertEqual(data['exam'], self.grade.exam_id)
+
+    def test_fields_select_at_every_level(self):
+        self.assertEqual(self.get(fields='id,marks').json(), {'id': self.grade.pk, 'marks': self.grade.marks})
+        self.assertEqual(
+            self.get(fields='id,student.user.username,student.admission_number').json(),
+            {'id': self.grade.pk, 'student': {
+                'user': {'username': self.grade.student.user.username},
+                'admission_number': self.grade.student.admission_number,
+            }},
+        )
+
+    def test_unknown_names_are_ignored(self):
+        self.assertEqual(self.get(fields='id,nope,student.nope').json(), {'id': self.grade.pk, 'student': {}})
+        self.assertEqual(self.get(expand='nope').json(), self.get().json())
+
+    def test_expanded_responses_are_neither_tagged_nor_cached(self):
+        self.assertTrue(self.get().has_header('ETag'))
+        for params, class_params in (({'expand': 'subject'}, {'expand': 'students'}), ({'fields': 'id,subject.name'}, {'fields': 'teachers.username'})):
+            with self.subTest(params=params):
+                self.assertFalse(self.get(**params).has_header('ETag'))
+                for _ in range(2):
+                    response = self.client.get(reverse('classinstance-list'), class_params)
+                    self.assertFalse(response.has_header('ETag'))
+                    self.assertFalse(response.has_header('X-Cache'))
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class RollCallTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = seed_school(classes=2, students_per_class=5)
+        cls.class_instance = ClassInstance.objects.get(name='Form 1')
+        cls.students = list(cls.class_instance.students.order_by('pk').values_list('pk', flat=True))
+
+    def roll_call(self, date, records):
+        client = APIClient()
+        client.force_authenticate(self.school['teacher'])
+        url = reverse('classinstance-roll-call', args=[self.class_instance.pk, date])
+        return client.post(url, {'records': records}, format='json')
+
+    def test_roll_call_upserts_one_row_per_student(self):
+        before = Attendance.objects.count()
+        records = [{'student': pk, 'present': index % 2 == 0} for index, pk in enumerate(self.students)]
+        records[0]['remarks'] = 'Late'
+        response = self.roll_call('2025-01-01', records)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['recorded'], response.json()['present']), (5, 3))
+        self.assertEqual(Attendance.objects.count(), before)
+        rows = Attendance.objects.filter(class_instance=self.class_instance, date=datetime.date(2025, 1, 1))
+        self.assertEqual(dict(rows.values_list('student_id', 'present')), {r['student']: r['present'] for r in records})
+        self.assertEqual(rows.get(student_id=self.students[0]).remarks, 'Late')
+
+        response = self.roll_call('2025-01-20', records[:2])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Attendance.objects.count(), before + 2)
+
+    def test_invalid_roll_calls_are_rejected(self):
+        other = Student.objects.exclude(class_instance=self.class_instance).first()
+        self.assertEqual(self.roll_call('2025-01-01', [{'student': other.pk, 'present': True}]).status_code, 400)
+        duplicate = [{'student': self.students[0], 'present': True}] * 2
+        self.assertEqual(self.roll_call('2025-01-01', duplicate).status_code, 400)
+        self.assertEqual(self.roll_call('2025-13-01', [{'student': self.students[0], 'present': True}]).status_code, 400)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class BulkImportTests(TestCase):
+    grade_header = 'admission_number,subject_code,exam_name,exam_term,exam_year,marks,remarks'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = seed_school(classes=1, students_per_class=5)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.school['admin'])
+
+    def upload(self, path, lines, name='rows.csv'):
+        content = '\n'.join(lines).encode('utf-8')
+        response = self.client.post(path, {'file': SimpleUploadedFile(name, content)}, format='multipart')
+        self.assertEqual(response.status_code, 200, response.content[:500])
+        return response.json()
+
+    def marks(self, number, code, exam):
+        return Grade.objects.get(student__admission_number=number, subject__code=code, exam__name=exam).marks
+
+    def test_grades_are_created_and_updated(self):
+        report = self.upload('/api/grades/import/', [
+            self.grade_header,
+            'ADM0000,MAT,Midterm,Term 1,2025,91,revised',
+            'ADM0000,MAT,Final,Term 1,2025,77,',
+        ])
+        self.assertEqual((report['created'], report['updated'], report['error_count']), (1, 1, 0))
+        self.assertEqual(self.marks('ADM0000', 'MAT', 'Midterm'), 91)
+        self.assertEqual(self.marks('ADM0000', 'MAT', 'Final'), 77)
+
+    def test_bad_rows_are_reported_and_skipped(self):
+        report = self.upload('/api/grades/import/', [
+            self.grade_header,
+            'ADM0001,MAT,Final,Term 1,2025,nan',
+            'ADM0001,ENG,Final,Term 1,2025,-inf',
+            'ADM0001,SCI,Final',
+            'ADM0001,HIS,Final,Term 1,2025,64',
+        ])
+        self.assertEqual([error['row'] for error in report['errors']], [2, 3, 4])
+        self.assertEqual(report['created'], 1)
+        self.assertEqual(self.marks('ADM0001', 'HIS', 'Final'), 64)
+
+    def test_invalid_duplicate_row_does_not_change_the_valid_one(self):
+        report = self.upload('/api/grades/import/', [
+            self.grade_header,
+            'ADM0002,MAT,Final,Term 1,2025,55',
+            'ADM0002,MAT,Final,Term 1,2025,-5',
+            'ADM0002,ENG,Midterm,Term 1,2025,66',
+            'ADM0002,ENG,Midterm,Term 1,2025,-5',
+        ])
+        self.assertEqual([error['row'] for error in report['errors']], [3, 5])
+        self.assertEqual(self.marks('ADM0002', 'MAT', 'Final'), 55)
+        self.assertEqual(self.marks('ADM0002', 'ENG', 'Midterm'), 66)
+
+    def test_dry_run_writes_nothing(self):
+        report = self.upload('/api/grades/import/?dry_run=true', [self.grade_header, 'ADM0003,MAT,Final,Term 1,2025,70'])
+        self.assertEqual(report['created'], 1)
+        self.assertFalse(Grade.objects.filter(exam__name='Final').exists())
+
+    def test_fees_update_the_student_account(self):
+        account = StudentFeeAccount.objects.get(student__admission_number='ADM0003')
+        report = self.upload('/api/fees/import/', [
+            'admission_number,amount,date,balance',
+            'ADM0003,150.00,2025-02-01',
+            'ADM0003,nan,2025-02-01',
+            'ADM0003,80.00',
+        ])
+        self.assertEqual(([error['row'] for error in report['errors']], report['created']), ([3, 4], 1))
+        account.refresh_from_db()
+        self.assertEqual(account.outstanding, Decimal('450.00'))
+
+    def test_fee_amounts_and_balances_are_checked(self):
+        report = self.upload('/api/fees/import/', [
+            'admission_number,amount,date,balance',
+            'ADM0003,150.00,2025-02-01,200.00',
+            'ADM0003,-150.00,2025-02-01',
+            'ADM0003,150.00,2025-02-01,-1',
+            'ADM0003,150.00,2025-02-01,150.00',
+            'ADM0003,150.00,2025-02-01,0',
+        ])
+        errors = {error['row']: error['errors'] for error in report['errors']}
+        self.assertEqual(sorted(errors), [2, 3, 4])
+        self.assertEqual((list(errors[2]), list(errors[3]), list(errors[4])), (['balance'], ['amount'], ['balance']))
+        self.assertEqual(report['created'], 2)
+
+    def test_library_items_from_xlsx(self):
+        from openpyxl import Workbook
+        workbook = Workbook()
+        for row in (('title', 'item_type', 'isbn'), ('World Atlas', 'Book', '978-0'),
+                    ('Poems', 'Book', '978-1'), ('', 'Book', '978-1')):
+            workbook.active.append(row)
+        content = io.BytesIO()
+        workbook.save(content)
+        response = self.client.post('/api/library-items/import/', {
+            'file': SimpleUploadedFile('items.xlsx', content.getvalue()),
+        }, format='multipart')
+        report = response.json()
+        self.assertEqual((report['created'], report['updated'], report['error_count']), (1, 1, 1))
+        self.assertEqual(LibraryItem.objects.get(isbn='978-0').title, 'World Atlas')
+        self.assertEqual(LibraryItem.objects.get(isbn='978-1').title, 'Poems')
+
+
+class ReportCardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = seed_school(classes=1, students_per_class=5)
+
+    def test_regenerating_updates_cards_in_place(self):
+        before = dict(ReportCard.objects.values_list('student_id', 'pk'))
+        last = ReportCard.objects.order_by('-position', 'pk').first()
+        last.remarks = 'Keep going'
+        last.save()
+        Grade.objects.filter(student_id=last.student_id, subject__code='MAT').update(marks=100)
+        Grade.objects.filter(student_id=last.student_id).exclude(subject__code='MAT').update(marks=90)
+
+        result = generate_report_cards('Term 1', 2025, user=self.school['admin'])
+        self.assertEqual((result['report_cards'], result['grades']), (5, 20))
+        self.assertEqual(dict(ReportCard.objects.values_list('student_id', 'pk')), before)
+        self.assertEqual(ReportCard.grades.through.objects.count(), Grade.objects.count())
+
+        card = ReportCard.objects.get(pk=last.pk)
+        self.assertEqual((card.average, card.overall_grade, card.position, card.class_size), (92.5, 'A', 1, 5))
+        self.assertEqual((card.subject_averages['MAT'], card.subject_averages['ENG']), (100.0, 90.0))
+        self.assertEqual(card.remarks, 'Keep going')
+        self.assertEqual(card.grades.count(), 4)
+
+        cards = list(ReportCard.objects.order_by('position'))
+        self.assertEqual([card.position for card in cards], [1, 2, 3, 4, 5])
+        self.assertEqual([card.average for card in cards], sorted((card.average for card in cards), reverse=True))
+        for card in cards:
+            marks = Grade.objects.filter(student_id=card.student_id).values_list('marks', flat=True)
+            self.assertAlmostEqual(card.average, sum(marks) / len(marks), places=2)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class GradeRankingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = seed_school(classes=2, students_per_class=5)
+
+    def rankings(self, user, **params):
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get(reverse('grade-rankings'), {'exam': self.school['exam'].pk, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_rankings_are_limited_to_visible_grades(self):
+        exam = self.school['exam']
+        self.assertEqual(len(self.rankings(self.school['admin'])), Grade.objects.filter(exam=exam).count())
+        parent = self.school['parent']
+        rows = self.rankings(parent, parent_id=parent.pk)
+        children = Grade.objects.filter(exam=exam, student__parents=parent)
+        self.assertEqual({row['grade'] for row in rows}, set(children.values_list('pk', flat=True)))
+        for row in rows:
+            self.assertEqual(row['cohort_size'], 5)
+            self.assertTrue(1 <= row['rank'] <= 5)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class AttendanceRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = seed_school(classes=2, students_per_class=5)
+
+    def assertRollupsCurrent(self):
+        expected, stored = rollups.expected_rollups(), rollups.stored_rollups()
+        self.assertEqual(rollups.drift(expected[0], stored[0]), [])
+        self.assertEqual(rollups.drift(expected[1], stored[1]), [])
+
+    def test_rollups_follow_every_kind_of_write(self):
+        self.assertRollupsCurrent()
+        attendance = Attendance.objects.order_by('pk').first()
+        attendance.present = not attendance.present
+        attendance.save()
+        self.assertRollupsCurrent()
+        # Moving a row to a day in another term moves both rollups.
+        attendance.date = datetime.date(2025, 6, 2)
+        attendance.save()
+        self.assertRollupsCurrent()
+        attendance.delete()
+        self.assertRollupsCurrent()
+        class_instance = ClassInstance.objects.get(name='Form 2')
+        records = [{'student': pk, 'present': False} for pk in class_instance.students.values_list('pk', flat=True)]
+        client = APIClient()
+        client.force_authenticate(self.school['admin'])
+        response = client.post(reverse('classinstance-roll-call', args=[class_instance.pk, '2025-01-02']), {'records': records}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertRollupsCurrent()
+        Student.objects.filter(class_instance=class_instance).first().delete()
+        self.assertRollupsCurrent()
+
+    def test_rebuild_repairs_drift(self):
+        ClassAttendanceDaily.objects.update(present=0)
+        rollups.rebuild()
+        self.assertRollupsCurrent()
+        row = ClassAttendanceDaily.objects.get(class_instance__name='Form 1', date=datetime.date(2025, 1, 1))
+        self.assertEqual(row.present + row.absent, 5)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class FeeLedgerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = seed_school(classes=1, students_per_class=5)
+        cls.fee = Fee.objects.filter(student__parents=cls.school['parent']).order_by('pk').first()
+
+    def pay(self, fee, key=None, user=None, **data):
+        client = APIClient()
+        client.force_authenticate(user or self.school['parent'])
+        headers = {'HTTP_IDEMPOTENCY_KEY': key} if key else {}
+        return client.post(reverse('fee-pay', args=[fee.pk]), data, format='json', **headers)
+
+    def outstanding(self):
+        return StudentFeeAccount.objects.get(student=self.fee.student_id).outstanding
+
+    def test_repeated_key_pays_once(self):
+        before = self.outstanding()
+        first = self.pay(self.fee, key='pay-1', amount='50.00')
+        second = self.pay(self.fee, key='pay-1', amount='50.00')
+        self.assertEqual((first.status_code, second.status_code), (201, 200))
+        self.assertEqual(first.json()['payment']['id'], second.json()['payment']['id'])
+        self.assertEqual(FeePayment.objects.filter(idempotency_key='pay-1').count(), 1)
+        self.fee.refresh_from_db()
+        self.assertEqual(self.fee.balance, Decimal('250.00'))
+        self.assertEqual(self.outstanding(), before - 50)
+
+    def test_key_cannot_be_reused_for_another_fee(self):
+        other = Fee.objects.create(student=self.fee.student, amount=100, balance=100, date=datetime.date(2025, 2, 1))
+        self.assertEqual(self.pay(self.fee, key='pay-2', amount='10.00').status_code, 201)
+        self.assertEqual(self.pay(other, key='pay-2', amount='10.00').status_code, 400)
+        other.refresh_from_db()
+        self.assertEqual(other.balance, 100)
+
+    def test_balance_is_never_overdrawn(self):
+        self.assertEqual(self.pay(self.fee, amount='300.01').status_code, 400)
+        self.assertEqual(self.pay(self.fee).status_code, 201)
+        self.assertEqual(self.pay(self.fee).json()['message'], 'Fee already paid')
+        self.fee.refresh_from_db()
+        self.assertEqual(self.fee.balance, 0)
+        self.assertEqual(
+            list(self.fee.payments.order_by('pk').values_list('amount', 'balance_after')),
+            [(Decimal('200.00'), Decimal('300.00')), (Decimal('300.00'), Decimal('0.00'))],
+        )
+
+    def test_parents_only_pay_their_own_childrens_fees(self):
+        stranger = Fee.objects.exclude(student__parents=self.school['parent']).first()
+        self.assertEqual(self.pay(stranger).status_code, 404)
+
+
+class StreamingListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', 'admin@school.test', 'admin', 'pw')
+        cls.subjects = Subject.objects.bulk_create([Subject(name=f'Subject {index}', code=f'S{index}') for index in range(5)])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        patcher = mock.patch.object(SubjectViewSet, 'stream_chunk_size', 2)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def stream(self, params=None, **headers):
+        response = self.client.get(reverse('subject-list'), params or {}, **headers)
+        self.assertTrue(response.streaming, response)
+        return response, list(response.streaming_content)
+
+    def test_json_is_one_array_across_chunks(self):
+        response, parts = self.stream({'stream': 'json'})
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(len(parts), 5)
+        rows = json.loads(b''.join(parts))
+        self.assertEqual(sorted(row['code'] for row in rows), [f'S{index}' for index in range(5)])
+
+    def test_ndjson_is_one_object_per_line(self):
+        for params, headers in (({'stream': 'ndjson'}, {}), ({}, {'HTTP_ACCEPT': 'application/x-ndjson'})):
+            with self.subTest(params=params, headers=headers):
+                response, parts = self.stream(params, **headers)
+                self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+                lines = b''.join(parts).splitlines()
+                self.assertEqual(len(lines), 5)
+                self.assertEqual({json.loads(line)['id'] for line in lines}, {subject.pk for subject in self.subjects})
+
+    def test_empty_list_is_an_empty_array(self):
+        Subject.objects.all().delete()
+        self.assertEqual(json.loads(b''.join(self.stream({'stream': 'json'})[1])), [])
+
+    def test_unknown_mode_is_rejected(self):
+        response = self.client.get(reverse('subject-list'), {'stream': 'csv'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('stream', response.json())
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'], AUDIT_ASYNC=False)
+class AuditPipelineTests(TransactionTestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', 'admin@school.test', 'admin', 'pw')
+
+    def entry(self, user_id, object_id):
+        return AuditLog(user_id=user_id, action='UPDATE', model_name='Student', object_id=object_id)
+
+    def test_a_bad_entry_does_not_lose_its_batch(self):
+        buffer = audit.AuditBuffer(batch_size=10)
+        for entry in (self.entry(self.admin.pk, '1'), self.entry(self.admin.pk + 1000, '2'), self.entry(self.admin.pk, '3')):
+            buffer.queue.put_nowait(('default', connection.settings_dict['NAME'], entry))
+        with self.assertLogs('core.audit', 'ERROR') as logs:
+            self.assertEqual(buffer.flush(), 2)
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(sorted(AuditLog.objects.values_list('object_id', flat=True)), ['1', '3'])
+
+    def test_entries_are_not_written_to_another_database(self):
+        buffer = audit.AuditBuffer(batch_size=10)
+        buffer.queue.put_nowait(('default', 'dropped-test-database', self.entry(self.admin.pk, '1')))
+        with self.assertLogs('core.audit', 'WARNING'):
+            self.assertEqual(buffer.flush(), 0)
+        self.assertFalse(AuditLog.objects.exists())
+
+    def test_changes_are_recorded_once_the_request_commits(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        response = client.post(reverse('subject-list'), {'name': 'Art', 'code': 'ART'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        client.patch(reverse('subject-detail', args=[response.json()['id']]), {'name': 'Fine Art'}, format='json')
+        entries = AuditLog.objects.filter(model_name='Subject').order_by('pk')
+        self.assertEqual([entry.action for entry in entries], ['CREATE', 'UPDATE'])
+        self.assertEqual(json.loads(entries[1].details)['changes']['name'], ['Art', 'Fine Art'])
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class AuditArchiveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', 'admin@school.test', 'admin', 'pw')
+        start = timezone.make_aware(datetime.datetime(2024, 1, 15, 12))
+        AuditLog.objects.bulk_create([
+            AuditLog(user=cls.admin, action='UPDATE' if day % 2 else 'CREATE', model_name='Student',
+                     object_id=str(day), created_at=start + datetime.timedelta(days=day))
+            for day in range(90)
+        ])
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(AUDIT_ARCHIVE_DIR=Path(directory.name)))
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def list(self, **params):
+        response = self.client.get(reverse('auditlog-list'), {'include_archived': 'true', **params})
+        self.assertEqual(response.status_code, 200, response.content[:500])
+        return response.json()
+
+    def test_archiving_moves_rows_into_monthly_partitions(self):
+        cutoff = timezone.make_aware(datetime.datetime(2024, 3, 1))
+        expected = archive.count_before(cutoff)
+        self.assertEqual(archive.archive_before(cutoff, batch_size=7), expected)
+        self.assertEqual(sorted(expected), ['2024-01', '2024-02'])
+        self.assertFalse(AuditLog.objects.filter(created_at__lt=cutoff).exists())
+        rows, scanned = archive.search({}, 100)
+        self.assertEqual((len(rows), scanned), (sum(expected.values()), ['2024-02', '2024-01']))
+
+    def test_archived_rows_page_with_live_ones(self):
+        archive.archive_before(timezone.make_aware(datetime.datetime(2024, 3, 1)))
+        seen, params = [], {'page_size': 25}
+        while True:
+            page = self.list(**params)
+            seen.extend(entry['id'] for entry in page['results'])
+            if not page['next']:
+                break
+            params['cursor'] = parse_qs(urlparse(page['next']).query)['cursor'][0]
+        self.assertEqual(len(seen), 90)
+        self.assertEqual(seen, sorted(seen, reverse=True))
+        recent = self.list(created_at__gte='2024-03-01T00:00:00Z', action='CREATE')
+        self.assertEqual(recent['archived_partitions'], [])
+        self.assertTrue(all(entry['action'] == 'CREATE' for entry in recent['results']))
+
+    def test_malformed_cursor_is_not_found(self):
+        for values in (['yesterday', 1], [None, 1], [[1], 1], ['2024-01-01T00:00:00', 'x']):
+            cursor = base64.urlsafe_b64encode(json.dumps({'v': values, 'r': 0}).encode()).decode()
+            with self.subTest(values=values):
+                response = self.client.get(reverse('auditlog-list'), {'include_archived': 'true', 'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'], REQUEST_LOG_SAMPLE_RATE=1.0)
+class RequestLogTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', 'admin@school.test', 'admin', 'pw')
+        Subject.objects.bulk_create([Subject(name=f'Subject {index}', code=f'S{index}') for index in range(3)])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_requests_are_logged_with_their_queries(self):
+        with self.assertLogs('core.requests', 'INFO') as logs:
+            response = self.client.get(reverse('subject-list'))
+        record = logs.records[0].request_log
+        self.assertEqual((record['status'], record['view'], record['role']), (200, 'subject-list', 'admin'))
+        self.assertGreater(record['queries'], 0)
+        self.assertIn('db;dur=', response['Server-Timing'])
+
+    def test_detail_routes_keep_their_pattern(self):
+        subject = Subject.objects.first()
+        with self.assertLogs('core.requests', 'INFO') as logs:
+            self.client.get(reverse('subject-detail', args=[subject.pk]))
+        self.assertEqual(logs.records[0].request_log['route'], '/api/subjects/(?P<pk>[^/.]+)/')
+
+    def test_streamed_responses_are_logged_after_the_body(self):
+        with self.assertLogs('core.requests', 'INFO') as logs:
+            response = self.client.get(reverse('user-list'), {'stream': 'ndjson'})
+            logging.getLogger('core.requests').info('before the body')
+            lines = b''.join(response.streaming_content).splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(logs.records[0].getMessage(), 'before the body')
+        self.assertGreater(logs.records[1].request_log['queries'], 0)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'], REQUEST_LOG_SAMPLE_RATE=0.0)
+class CachedAuthenticationTests(TransactionTestCase):
+    def setUp(self):
+        authentication.get_user_cache().clear()
+        self.addCleanup(authentication.get_user_cache().clear)
+        self.user = User.objects.create_user('teacher', 'teacher@school.test', 'teacher', 'pw')
+
+    def get(self, token):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        log = QueryLog()
+        with connection.execute_wrapper(log):
+            response = client.get(reverse('current_user'))
+        return response, len(log.queries)
+
+    def test_cached_user_answers_without_queries(self):
+        token = AccessToken.for_user(self.user)
+        self.assertEqual(self.get(token)[0].status_code, 200)
+        response, queries = self.get(token)
+        self.assertEqual((response.status_code, queries), (200, 0))
+        self.assertEqual(response.json()['role'], 'teacher')
+
+    def test_deactivation_is_seen_at_once(self):
+        token = AccessToken.for_user(self.user)
+        self.get(token)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get(token)[0].status_code, 401)
+
+    def test_change_in_another_worker_drops_cached_users(self):
+        token = AccessToken.for_user(self.user)
+        self.get(token)
+        # Another worker's save: the row changes and the shared stamp moves,
+        # but this process receives no signal.
+        User.objects.filter(pk=self.user.pk).update(role='parent')
+        versions.bump(authentication.VERSION)
+        response, queries = self.get(token)
+        self.assertEqual((response.json()['role'], queries), ('parent', 1))
+
+    def test_logins_keep_cached_users(self):
+        token = AccessToken.for_user(self.user)
+        self.get(token)
+        self.user.save(update_fields=['last_login'])
+        self.assertEqual(self.get(token)[1], 0)
+
+    @override_settings(AUTH_TRUST_TOKEN_CLAIMS=True)
+    def test_claims_are_trusted_only_until_a_user_changes(self):
+        versions.bump(authentication.VERSION)
+        time.sleep(1)
+        token = ClaimsTokenObtainPairSerializer.get_token(self.user).access_token
+        response, queries = self.get(token)
+        self.assertEqual((response.status_code, queries), (200, 0))
+        self.user.role = 'parent'
+        self.user.save()
+        response, queries = self.get(token)
+        self.assertEqual((response.json()['role'], queries), ('parent', 1))
+
+    @override_settings(AUTH_TRUST_TOKEN_CLAIMS=True)
+    def test_inactive_claim_is_rejected(self):
+        versions.bump(authentication.VERSION)
+        time.sleep(1)
+        token = ClaimsTokenObtainPairSerializer.get_token(self.user).access_token
+        token['is_active'] = False
+        self.assertEqual(self.get(token)[0].status_code, 401)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'], REQUEST_LOG_SAMPLE_RATE=0.0)
+class SchoolSettingsTests(TransactionTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('admin', 'admin@school.test', 'admin', 'pw'))
+        schoolsettings.load()
+
+    def test_updates_change_the_etag(self):
+        url = reverse('school-settings-list')
+        first = self.client.get(url)
+        self.assertEqual(first.json()['school_name'], 'Elite Academy')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        settings_id = SchoolSettings.objects.get().pk
+        response = self.client.patch(reverse('school-settings-detail', args=[settings_id]), {'school_name': 'Hill School'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        second = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second.json()['school_name'], 'Hill School')
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = seed_school(classes=1, students_per_class=6)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.school['admin'])
+        self.url = reverse('grade-list')
+
+    def revalidate(self):
+        first = self.client.get(self.url, {'page_size': 3})
+        return lambda: self.client.get(self.url, {'page_size': 3}, HTTP_IF_NONE_MATCH=first['ETag'])
+
+    def test_plain_get_is_tagged_without_a_validator_query(self):
+        self.client.get(self.url, {'page_size': 3})
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'page_size': 3})
+        self.assertTrue(response.has_header('ETag'))
+        self.assertTrue(response.has_header('Last-Modified'))
+
+    def test_writes_without_signals_change_the_page_tag(self):
+        revalidate = self.revalidate()
+        self.assertEqual(revalidate().status_code, 304)
+        first = Grade.objects.order_by('-created_at', '-id').first()
+        Grade.objects.filter(pk=first.pk).update(marks=first.marks + 1, updated_at=timezone.now())
+        self.assertEqual(revalidate().status_code, 200)
+
+        revalidate = self.revalidate()
+        exam = Exam.objects.create(name='Mock', term='Term 1', year=2025)
+        Grade.objects.bulk_create([Grade(student=first.student, subject=first.subject, exam=exam, marks=50, created_by=first.created_by)])
+        self.assertEqual(revalidate().status_code, 200)
+
+    def test_detail_tag_follows_the_object(self):
+        grade = Grade.objects.first()
+        url = reverse('grade-detail', args=[grade.pk])
+        first = self.client.get(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        Grade.objects.filter(pk=grade.pk).update(updated_at=timezone.now())
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ResponseCacheTests(TransactionTestCase):
+    def setUp(self):
+        responsecache._caches.clear()
+        self.school = seed_school(classes=2, students_per_class=3)
+        self.client = APIClient()
+        self.client.force_authenticate(self.school['admin'])
+
+    def get(self, name, *args, **headers):
+        return self.client.get(reverse(name, args=args), **headers)
+
+    def test_second_read_is_a_hit(self):
+        self.assertEqual(self.get('subject-list')['X-Cache'], 'miss')
+        response = self.get('subject-list')
+        self.assertEqual(response['X-Cache'], 'hit')
+        self.assertEqual(len(response.json()['results']), 4)
+        stats = {cache['name']: cache for cache in self.get('cache_stats').json()['caches']}
+        self.assertEqual((stats['subject']['hits'], stats['subject']['misses'], stats['subject']['size']), (1, 1, 1))
+
+    def test_writes_invalidate_their_model(self):
+        subject = Subject.objects.first()
+        self.get('subject-detail', subject.pk)
+        self.client.patch(reverse('subject-detail', args=[subject.pk]), {'name': 'Algebra'}, format='json')
+        response = self.get('subject-detail', subject.pk)
+        self.assertEqual((response['X-Cache'], response.json()['name']), ('miss', 'Algebra'))
+
+    def test_dependencies_invalidate_the_views_that_render_them(self):
+        first, second = ClassInstance.objects.order_by('pk')
+        self.get('classinstance-detail', second.pk)
+        self.assertEqual(self.get('classinstance-detail', second.pk)['X-Cache'], 'hit')
+        student = Student.objects.filter(class_instance=first).first()
+        student.class_instance = second
+        student.save()
+        response = self.get('classinstance-detail', second.pk)
+        self.assertEqual(response['X-Cache'], 'miss')
+        self.assertIn(student.user_id, response.json()['students'])
+
+    def test_callers_do_not_share_entries(self):
+        self.assertEqual(len(self.get('timetable-list').json()['results']), 8)
+        self.client.force_authenticate(self.school['student'])
+        response = self.get('timetable-list')
+        self.assertEqual((response['X-Cache'], response.json()['results']), ('miss', []))
+
+    def test_hit_answers_if_none_match(self):
+        etag = self.get('subject-list')['ETag']
+        response = self.get('subject-list', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response['X-Cache'], response['ETag']), (304, 'hit', etag))
+        self.assertEqual(response.content, b'')
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class AnnouncementTargetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', 'admin@school.test', 'admin', 'pw')
+        cls.teacher, cls.other = (
+            User.objects.create_user(name, f'{name}@school.test', 'teacher', 'pw') for name in ('teacher', 'other')
+        )
+        cls.form1, cls.form2 = (ClassInstance.objects.create(name=name) for name in ('Form 1', 'Form 2'))
+        cls.form1.teachers.add(cls.teacher)
+        cls.form2.teachers.add(cls.other)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def announce(self, **data):
+        response = self.client.post(reverse('announcement-list'), {'title': 'Notice', 'content': 'Read me', **data}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()
+
+    def visible_to(self, user):
+        self.client.force_authenticate(user)
+        return {row['id'] for row in self.client.get(reverse('announcement-list')).json()['results']}
+
+    def test_roles_match_whole_names(self):
+        to_teachers = self.announce(target_roles='Teacher, staff')
+        to_parents = self.announce(target_roles='parent')
+        self.assertEqual(to_teachers['target_roles'], 'teacher,staff')
+        self.assertEqual(self.visible_to(self.teacher), {to_teachers['id']})
+        self.assertNotIn(to_parents['id'], self.visible_to(self.other))
+
+    def test_class_targets_reach_only_that_class(self):
+        form1 = self.announce(target_roles='teacher', target_classes=[self.form1.pk])
+        everyone = self.announce(target_roles='teacher')
+        self.assertEqual(self.visible_to(self.teacher), {form1['id'], everyone['id']})
+        self.assertEqual(self.visible_to(self.other), {everyone['id']})
+
+    def test_unknown_roles_and_classes_are_rejected(self):
+        for data in ({'target_roles': 'teachers'}, {'target_roles': ''}, {'target_roles': 'teacher', 'target_classes': [0]}):
+            with self.subTest(data=data):
+                response = self.client.post(reverse('announcement-list'), {'title': 'Notice', 'content': 'Read me', **data}, format='json')
+                self.assertEqual(response.status_code, 400)
+
+    def test_updating_classes_keeps_the_roles(self):
+        announcement = self.announce(target_roles='teacher,parent')
+        url = reverse('announcement-detail', args=[announcement['id']])
+        response = self.client.patch(url, {'target_classes': [self.form2.pk]}, format='json')
+        self.assertEqual((response.json()['target_roles'], response.json()['target_classes']), ('teacher,parent', [self.form2.pk]))
+
+    def test_updating_an_announcement_without_roles_adds_no_blank_role(self):
+        announcement = Announcement.objects.create(title='Draft', content='Not sent yet')
+        url = reverse('announcement-detail', args=[announcement.pk])
+        response = self.client.patch(url, {'target_classes': [self.form1.pk]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(announcement.targets.exists())
+
+
+class AnnouncementTargetMigrationTests(TransactionTestCase):
+    before, after = [('core', '0013_auditlog_indexes')], [('core', '0014_announcement_targets')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_roles_are_split_into_targets_and_joined_back(self):
+        apps = self.migrate(self.before)
+        Announcement = apps.get_model('core', 'Announcement')
+        rows = {
+            'both': 'parent,student', 'spaced': ' Teacher , staff', 'typo': 'students', 'empty': '',
+        }
+        ids = {title: Announcement.objects.create(title=title, content='', target_roles=roles).pk for title, roles in rows.items()}
+
+        apps = self.migrate(self.after)
+        targets = {}
+        for announcement_id, role in apps.get_model('core', 'AnnouncementTarget').objects.values_list('announcement_id', 'role'):
+            targets.setdefault(announcement_id, set()).add(role)
+        self.assertEqual(targets, {ids['both']: {'parent', 'student'}, ids['spaced']: {'teacher', 'staff'}})
+
+        apps = self.migrate(self.before)
+        joined = dict(apps.get_model('core', 'Announcement').objects.values_list('title', 'target_roles'))
+        self.assertEqual(joined, {'both': 'parent,student', 'spaced': 'teacher,staff', 'typo': '', 'empty': ''})
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class InboxTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ann, cls.ben, cls.cal = (
+            User.objects.create_user(name, f'{name}@school.test', 'teacher', 'pw') for name in ('ann', 'ben', 'cal')
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.ann)
+
+    def send(self, sender, receiver, content='Hello'):
+        return Message.objects.create(sender=sender, receiver=receiver, content=content)
+
+    def assertUnread(self, *expected):
+        for user, count in zip((self.ann, self.ben, self.cal), expected):
+            self.assertEqual(inbox.unread_count(user), count, user.username)
+            self.assertEqual(inbox.unread_count(user), Message.objects.filter(receiver=user, read=False).count())
+
+    def test_unread_counter_follows_every_change(self):
+        first = self.send(self.ben, self.ann)
+        second = self.send(self.ben, self.ann)
+        self.send(self.cal, self.ann)
+        self.assertUnread(3, 0, 0)
+        first.read = True
+        first.save()
+        self.assertUnread(2, 0, 0)
+        second.receiver = self.cal
+        second.save()
+        self.assertUnread(1, 0, 1)
+        second.delete()
+        self.assertUnread(1, 0, 0)
+        first.read = False
+        first.save()
+        self.assertUnread(2, 0, 0)
+        self.assertEqual(inbox.mark_read(self.ann, self.ben.pk), 1)
+        self.assertEqual(inbox.mark_read(self.ann, self.ben.pk), 0)
+        self.assertUnread(1, 0, 0)
+
+    def test_conversations_thread_and_unread(self):
+        self.send(self.ben, self.ann, 'one')
+        self.send(self.ann, self.ben, 'two')
+        latest_with_ben = self.send(self.ben, self.ann, 'three')
+        latest_with_cal = self.send(self.ann, self.cal, 'four')
+
+        results = self.client.get(reverse('message-conversations')).json()['results']
+        self.assertEqual(
+            [(row['id'], row['counterpart'], row['unread']) for row in results],
+            [(latest_with_cal.pk, self.cal.pk, 0), (latest_with_ben.pk, self.ben.pk, 2)],
+        )
+        thread = self.client.get(reverse('message-thread'), {'with': self.ben.pk}).json()['results']
+        self.assertEqual([row['content'] for row in thread], ['three', 'two', 'one'])
+        self.assertEqual(self.client.get(reverse('message-unread')).json(), {'unread': 2})
+
+        response = self.client.post(reverse('message-mark-read'), {'with': self.ben.pk}, format='json')
+        self.assertEqual(response.json(), {'marked': 2, 'unread': 0})
+
+    def test_user_id_is_required(self):
+        self.assertEqual(self.client.get(reverse('message-thread'), {'with': 'ben'}).status_code, 400)
+        for value in ('', 'ben', '-1', None):
+            with self.subTest(value=value):
+                response = self.client.post(reverse('message-mark-read'), {'with': value}, format='json')
+                self.assertEqual(response.status_code, 400)
@@ -2,6 +2,8 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     get_current_user,
+    dashboard,
+    cache_stats,
     UserViewSet,
     SubjectViewSet,
     ClassInstanceViewSet,
@@ -11,6 +13,7 @@ from .views import (
     GradeViewSet,
     AttendanceViewSet,
     FeeViewSet,
+    FeePaymentViewSet,
     AnnouncementViewSet,
     MessageViewSet,
     TimetableViewSet,
@@ -22,6 +25,7 @@ from .views import (
     ParentFeedbackViewSet,
     AuditLogViewSet,
     SchoolSettingsViewSet,
+    ContactMessageViewSet,
 )
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
@@ -35,6 +39,7 @@ router.register(r'exams', ExamViewSet)
 router.register(r'grades', GradeViewSet)
 router.register(r'attendance', AttendanceViewSet)
 router.register(r'fees', FeeViewSet)
+router.register(r'fee-payments', FeePaymentViewSet)
 router.register(r'announcements', AnnouncementViewSet)
 router.register(r'messages', MessageViewSet)
 router.register(r'timetables', TimetableViewSet)
@@ -46,10 +51,13 @@ router.register(r'report-cards', ReportCardViewSet)
 router.register(r'parent-feedback', ParentFeedbackViewSet)
 router.register(r'audit-logs', AuditLogViewSet)
 router.register(r'school-settings', SchoolSettingsViewSet, basename='school-settings')
+router.register(r'contact', ContactMessageViewSet)
 
 # Define specific paths first, then include router URLs
 urlpatterns = [
     path('users/me/', get_current_user, name='current_user'),
+    path('dashboard/<str:role>/', dashboard, name='dashboard'),
+    path('cache-stats/', cache_stats, name='cache_stats'),
     path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('auth/', include('rest_framework.urls')),
@@ -0,0 +1,77 @@
+import os
+import secrets
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+
+def _path(name):
+    return Path(settings.VERSION_DIR) / name
+
+
+def current(name):
+    """
+    Returns the version stamp for `name`, creating one on first use. Stamps
+    are small files under VERSION_DIR, so every worker sharing the directory
+    sees a change as soon as it is made, without touching the database.
+    """
+    try:
+        return _path(name).read_text()
+    except FileNotFoundError:
+        return bump(name)
+
+
+def bump(name):
+    """
+    Replaces the stamp for `name` with a new unique value and returns it.
+    """
+    path = _path(name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    stamp = f'{time.time_ns():x}-{secrets.token_hex(4)}'
+    temporary = path.with_name(f'.{name}.{os.getpid()}.{threading.get_ident()}')
+    temporary.write_text(stamp)
+    os.replace(temporary, path)
+    return stamp
+
+
+def bumped_at(stamp):
+    """
+    When `stamp` was made, in seconds since the epoch.
+    """
+    return int(stamp.split('-', 1)[0], 16) / 1e9
+
+
+def bump_on_change(name):
+    """
+    Returns a signal receiver that bumps `name` when the change is made and
+    again once its transaction commits, so readers that loaded the old rows
+    in between do not keep them under the new stamp.
+    """
+    def receiver(sender, **kwargs):
+        bump(name)
+        transaction.on_commit(lambda: bump(name))
+    return receiver
+
+
+def model_name(model):
+    """
+    Name of the stamp replaced whenever a `model` row is saved, deleted or
+    has its many-to-many links changed.
+    """
+    return f'model-{model._meta.label_lower}'
+
+
+def track_model(model):
+    """
+    Connects the signals that keep the stamp of `model` current. Writes that
+    send no signals (bulk_create, update) are not seen here.
+    """
+    receiver = bump_on_change(model_name(model))
+    post_save.connect(receiver, sender=model, weak=False)
+    post_delete.connect(receiver, sender=model, weak=False)
+    for field in model._meta.local_many_to_many:
+        m2m_changed.connect(receiver, sender=field.remote_field.through, weak=False)
@@ -1,64 +1,163 @@
+import datetime
+import logging
+import os
+
 from django.contrib.auth import get_user_model
-from django.utils import timezone
-from django.conf import settings
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
+from django.db.models import Exists, OuterRef, Q, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
 from rest_framework import viewsets, status
 from rest_framework.decorators import api_view, permission_classes, action
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from .permissions import IsAdmin, IsAdminOrTeacher, IsAdminOrStaff, IsParent, IsStudent, IsAdminOrStaffOrParent, IsAdminOrTeacherOrParent, IsAdminOrStudentForTimetable, IsAdminOrTeacherOrStudentForHomework, IsAdminOrParent
+from .permissions import IsAdmin, IsAdminOrTeacher, IsAdminOrStaff, IsParent, IsStudent, IsAdminOrStaffOrParent, IsAdminOrTeacherOrParent, IsAdminOrStudentForTimetable, IsAdminOrTeacherOrStudentForHomework, IsAdminOrParent, IsAdminOrCreateOnly
 from .serializers import (
     UserSerializer, SubjectSerializer, ClassInstanceSerializer, StudentSerializer,
     ParentSerializer, ExamSerializer, GradeSerializer, AttendanceSerializer,
     FeeSerializer, AnnouncementSerializer, MessageSerializer, TimetableSerializer,
     HomeworkSerializer, LibraryItemSerializer, LibraryBorrowingSerializer,
     LeaveApplicationSerializer, ReportCardSerializer, ParentFeedbackSerializer,
-    AuditLogSerializer, SchoolSettingsSerializer,
+    AuditLogSerializer, SchoolSettingsSerializer, ContactMessageSerializer, RollCallSerializer,
+    ReportCardGenerationSerializer, FeePaymentSerializer, PaymentRequestSerializer, ConversationSerializer,
 )
+from . import archive, audit, inbox, ledger, responsecache, rollups, schoolsettings
+from .analytics import exam_rankings
+from .audit import AuditMixin
+from .filters import FieldFilterBackend
+from .dashboard import SECTIONS as DASHBOARD_SECTIONS, build_dashboard
+from .importers import FeeImporter, GradeImporter, LibraryItemImporter
+from .mixins import ResponseCacheMixin, ConditionalGetMixin, StreamingListMixin, QueryPlanMixin, FacetMixin, FullTextSearchMixin, BulkImportMixin
+from .reportcards import generate_report_cards
 from .models import (
-    Subject, ClassInstance, Student, Parent, Exam, Grade, Attendance, Fee, Announcement,
+    Subject, ClassInstance, Student, Parent, Exam, Grade, Attendance, Fee, Announcement, AnnouncementTarget,
     Message, Timetable, Homework, LibraryItem, LibraryBorrowing, LeaveApplication,
-    ReportCard, ParentFeedback, AuditLog, SchoolSettings,
+    ReportCard, ParentFeedback, AuditLog, SchoolSettings, ContactMessage, ClassAttendanceDaily,
+    StudentAttendanceTerm, FeePayment, StudentFeeAccount,
 )
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
+
+# Periods attendance rates can be grouped by.
+RATE_PERIODS = {'day': TruncDay, 'week': TruncWeek, 'month': TruncMonth}
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_current_user(request):
-    print(f"Request headers for /api/users/me/: {request.headers}")
     user = request.user
-    print(f"Received GET request for /users/me/ - User: {user.username}, Authenticated: {user.is_authenticated}")
+    logger.debug('Current user %s (id %s, role %s)', user.username, user.pk, user.role)
     serializer = UserSerializer(user)
-    print(f"Successfully serialized user data: {serializer.data}")
     return Response(serializer.data)
 
-class UserViewSet(viewsets.ModelViewSet):
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def dashboard(request, role):
+    user = request.user
+    if role not in DASHBOARD_SECTIONS:
+        return Response({'message': 'Unknown dashboard'}, status=status.HTTP_404_NOT_FOUND)
+    if role != user.role and not (role == 'admin' and user.is_superuser):
+        return Response({'message': 'You do not have access to this dashboard'}, status=status.HTTP_403_FORBIDDEN)
+    return Response(build_dashboard(request, role))
+
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def cache_stats(request):
+    # Caches are per process, so these are the numbers of the worker that answered.
+    return Response({'pid': os.getpid(), 'caches': responsecache.stats()})
+
+class UserViewSet(StreamingListMixin, AuditMixin, QueryPlanMixin, FacetMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAdmin]
+    ordering = ('username',)
+    filterset_fields = {'role': ['exact', 'in'], 'is_active': ['exact']}
+    search_fields = ['username', 'email']
+    ordering_fields = ['username', 'email', 'role', 'id']
+    facet_fields = ['role', 'is_active']
 
     def get_queryset(self):
-        print(f"UserViewSet: User authenticated - {self.request.user.username}, Is Admin: {self.request.user.role == 'admin'}, Is Superuser: {self.request.user.is_superuser}")
+        logger.debug(
+            'Listing users for %s (role %s, superuser %s)',
+            self.request.user.username, self.request.user.role, self.request.user.is_superuser,
+        )
         if self.request.user.is_superuser:
             return User.objects.all()
         elif self.request.user.role == 'admin':
             return User.objects.exclude(is_superuser=True)
         return User.objects.none()
 
-class SubjectViewSet(viewsets.ModelViewSet):
+class SubjectViewSet(ResponseCacheMixin, ConditionalGetMixin, StreamingListMixin, AuditMixin, QueryPlanMixin, viewsets.ModelViewSet):
     queryset = Subject.objects.all()
     serializer_class = SubjectSerializer
     permission_classes = [IsAdmin]
+    allow_unpaginated = True
+    search_fields = ['name', 'code', 'description']
+    ordering_fields = ['name', 'code', 'created_at']
 
-class ClassInstanceViewSet(viewsets.ModelViewSet):
+class ClassInstanceViewSet(ResponseCacheMixin, ConditionalGetMixin, StreamingListMixin, AuditMixin, QueryPlanMixin, viewsets.ModelViewSet):
     queryset = ClassInstance.objects.all()
     serializer_class = ClassInstanceSerializer
     permission_classes = [IsAdmin]
-
-class StudentViewSet(viewsets.ModelViewSet):
+    filterset_fields = {'teachers': ['exact'], 'subjects': ['exact']}
+    search_fields = ['name']
+    ordering_fields = ['name', 'created_at']
+    version_dependencies = (Student,)
+
+    @action(detail=True, methods=['post'], permission_classes=[IsAdminOrTeacher], url_path=r'attendance/(?P<date>[^/.]+)')
+    def roll_call(self, request, pk=None, date=None):
+        class_instance = get_object_or_404(ClassInstance, pk=pk)
+        user = request.user
+        if user.role == 'teacher' and not class_instance.teachers.filter(pk=user.pk).exists():
+            return Response({'message': 'You do not teach this class'}, status=status.HTTP_403_FORBIDDEN)
+        try:
+            day = datetime.date.fromisoformat(date)
+        except ValueError:
+            return Response({'message': 'Date must be in YYYY-MM-DD format'}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = RollCallSerializer(data=request.data, context={'class_instance': class_instance})
+        serializer.is_valid(raise_exception=True)
+        records = [
+            Attendance(
+                student_id=record['student'], class_instance=class_instance, date=day,
+                present=record['present'], remarks=record['remarks'], created_by=user,
+            )
+            for record in serializer.validated_data['records']
+        ]
+        with transaction.atomic():
+            # bulk_create sends no signals, so the rollups are moved here.
+            previous = list(
+                Attendance.objects.filter(student_id__in=[record.student_id for record in records], date=day)
+                .values_list(*rollups.FIELDS)
+            )
+            Attendance.objects.bulk_create(
+                records,
+                update_conflicts=True,
+                unique_fields=['student', 'date'],
+                update_fields=['class_instance', 'present', 'remarks', 'created_by', 'updated_at'],
+            )
+            rollups.apply(added=[rollups.state(record) for record in records], removed=previous)
+        present = sum(record.present for record in records)
+        audit.record(user, 'ROLL_CALL', 'Attendance', class_instance.pk, {'date': day, 'recorded': len(records), 'present': present})
+        return Response({
+            'class_instance': class_instance.pk,
+            'date': day,
+            'recorded': len(records),
+            'present': present,
+            'absent': len(records) - present,
+        }, status=status.HTTP_200_OK)
+
+class StudentViewSet(ConditionalGetMixin, StreamingListMixin, AuditMixin, QueryPlanMixin, FacetMixin, viewsets.ModelViewSet):
     queryset = Student.objects.all()
     serializer_class = StudentSerializer
     permission_classes = [IsAdminOrStaff]
+    filterset_fields = {'class_instance': ['exact', 'in'], 'parents': ['exact']}
+    search_fields = ['admission_number', 'user__username', 'user__email']
+    ordering_fields = ['admission_number', 'created_at']
+    facet_fields = ['class_instance']
 
     def get_queryset(self):
         user = self.request.user
@@ -72,20 +171,44 @@ class StudentViewSet(viewsets.ModelViewSet):
             return Student.objects.filter(user=user)
         return Student.objects.none()
 
-class ParentViewSet(viewsets.ModelViewSet):
+class ParentViewSet(ConditionalGetMixin, StreamingListMixin, AuditMixin, QueryPlanMixin, viewsets.ModelViewSet):
     queryset = Parent.objects.all()
     serializer_class = ParentSerializer
     permission_classes = [IsAdmin]
+    search_fields = ['user__username', 'user__email']
+    version_dependencies = (Student,)
 
-class ExamViewSet(viewsets.ModelViewSet):
+class ExamViewSet(ResponseCacheMixin, ConditionalGetMixin, StreamingListMixin, AuditMixin, QueryPlanMixin, FacetMixin, viewsets.ModelViewSet):
     queryset = Exam.objects.all()
     serializer_class = ExamSerializer
     permission_classes = [IsAdmin]
+    allow_unpaginated = True
+    filterset_fields = {'term': ['exact'], 'year': ['exact', 'gte', 'lte']}
+    search_fields = ['name', 'term']
+    ordering_fields = ['year', 'name', 'created_at']
+    facet_fields = ['term', 'year']
 
-class GradeViewSet(viewsets.ModelViewSet):
+class GradeViewSet(ConditionalGetMixin, StreamingListMixin, AuditMixin, QueryPlanMixin, FacetMixin, FullTextSearchMixin, BulkImportMixin, viewsets.ModelViewSet):
     queryset = Grade.objects.all()
     serializer_class = GradeSerializer
     permission_classes = [IsAdminOrTeacherOrParent]
+    page_size = 100
+    max_page_size = 500
+    filterset_fields = {
+        'student': ['exact'],
+        'subject': ['exact', 'in'],
+        'exam': ['exact', 'in'],
+        'class_instance': ('student__class_instance', ['exact', 'in']),
+        'term': ('exam__term', ['exact']),
+        'year': ('exam__year', ['exact']),
+        'marks': ['gte', 'lte'],
+        'created_at': ['gte', 'lte'],
+    }
+    search_fields = ['remarks', 'student__admission_number', 'student__user__username', 'subject__name']
+    ordering_fields = ['marks', 'created_at']
+    facet_fields = ['subject', 'exam']
+    importer_class = GradeImporter
+    import_permission_classes = [IsAdminOrTeacher]
 
     def get_queryset(self):
         user = self.request.user
@@ -101,10 +224,33 @@ class GradeViewSet(viewsets.ModelViewSet):
             return Grade.objects.filter(student__user=user)
         return Grade.objects.none()
 
-class AttendanceViewSet(viewsets.ModelViewSet):
+    @action(detail=False)
+    def rankings(self, request):
+        exam_id = request.query_params.get('exam', '')
+        if not exam_id.isdigit():
+            return Response({'exam': ['An exam id is required.']}, status=status.HTTP_400_BAD_REQUEST)
+        exam = get_object_or_404(Exam, pk=exam_id)
+        # Rankings cover the whole exam; only rows the caller may see are returned.
+        visible = self.filter_queryset(self.get_queryset()).filter(exam=exam).prefetch_related(None)
+        visible = set(visible.values_list('pk', flat=True))
+        rows = [row for row in exam_rankings(exam.pk) if row['grade'] in visible]
+        return Response({'exam': exam.pk, 'results': rows})
+
+class AttendanceViewSet(ConditionalGetMixin, StreamingListMixin, AuditMixin, QueryPlanMixin, FacetMixin, viewsets.ModelViewSet):
     queryset = Attendance.objects.all()
     serializer_class = AttendanceSerializer
     permission_classes = [IsAdminOrTeacher]
+    page_size = 100
+    max_page_size = 500
+    filterset_fields = {
+        'student': ['exact'],
+        'class_instance': ['exact', 'in'],
+        'present': ['exact'],
+        'date': ['exact', 'gte', 'lte'],
+    }
+    search_fields = ['remarks', 'student__admission_number', 'student__user__username']
+    ordering_fields = ['date', 'created_at']
+    facet_fields = ['present', 'class_instance']
 
     def get_queryset(self):
         user = self.request.user
@@ -119,10 +265,56 @@ class AttendanceViewSet(viewsets.ModelViewSet):
             return Attendance.objects.filter(student__user=user)
         return Attendance.objects.none()
 
-class FeeViewSet(viewsets.ModelViewSet):
+    @action(detail=False, url_path='rates/classes')
+    def class_rates(self, request):
+        period = request.query_params.get('period', 'day')
+        if period not in RATE_PERIODS:
+            return Response({'period': [f'Choose one of: {", ".join(RATE_PERIODS)}.']}, status=status.HTTP_400_BAD_REQUEST)
+        declared = {'class_instance': ['exact', 'in'], 'date': ['exact', 'gte', 'lte']}
+        rows = ClassAttendanceDaily.objects.filter(**FieldFilterBackend().get_filters(request, ClassAttendanceDaily, declared))
+        rows = rows.exclude(present=0, absent=0)
+        if not (request.user.is_superuser or request.user.role == 'admin'):
+            rows = rows.filter(class_instance__teachers=request.user)
+        rows = (
+            rows.annotate(period=RATE_PERIODS[period]('date')).values('class_instance', 'period')
+            .annotate(present=Sum('present'), absent=Sum('absent')).order_by('class_instance', 'period')
+        )
+        return Response([
+            dict(row, period=row['period'].strftime('%Y-%m-%d'), rate=rollups.rate(row['present'], row['absent']))
+            for row in rows
+        ])
+
+    @action(detail=False, url_path='rates/students')
+    def student_rates(self, request):
+        declared = {
+            'student': ['exact', 'in'],
+            'class_instance': ('student__class_instance', ['exact', 'in']),
+            'term': ['exact'],
+            'year': ['exact'],
+        }
+        rows = StudentAttendanceTerm.objects.filter(**FieldFilterBackend().get_filters(request, StudentAttendanceTerm, declared))
+        rows = rows.exclude(present=0, absent=0)
+        if not (request.user.is_superuser or request.user.role == 'admin'):
+            rows = rows.filter(student__class_instance__teachers=request.user)
+        rows = rows.values('student', 'term', 'year', 'present', 'absent').order_by('student', 'year', 'term')
+        return Response([dict(row, rate=rollups.rate(row['present'], row['absent'])) for row in rows])
+
+class FeeViewSet(ConditionalGetMixin, StreamingListMixin, AuditMixin, QueryPlanMixin, FacetMixin, BulkImportMixin, viewsets.ModelViewSet):
     queryset = Fee.objects.all()
     serializer_class = FeeSerializer
     permission_classes = [IsAdminOrStaffOrParent]
+    filterset_fields = {
+        'student': ['exact'],
+        'class_instance': ('student__class_instance', ['exact']),
+        'balance': ['exact', 'gt', 'lt', 'gte', 'lte'],
+        'date': ['gte', 'lte'],
+        'payment_method': ['exact'],
+    }
+    search_fields = ['student__admission_number', 'student__user__username', 'payment_method']
+    ordering_fields = ['date', 'amount', 'balance', 'created_at']
+    facet_fields = ['payment_method']
+    importer_class = FeeImporter
+    import_permission_classes = [IsAdminOrStaff]
 
     def get_queryset(self):
         user = self.request.user
@@ -137,41 +329,98 @@ class FeeViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['post'], permission_classes=[IsParent])
     def pay(self, request, pk=None):
+        if not Fee.objects.filter(pk=pk, student__parents=request.user).exists():
+            return Response({'message': 'Fee not found'}, status=status.HTTP_404_NOT_FOUND)
+        serializer = PaymentRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
         try:
-            fee = Fee.objects.get(id=pk)
-            if fee.balance <= 0:
-                return Response({'message': 'Fee already paid'}, status=status.HTTP_400_BAD_REQUEST)
-            fee.balance = 0
-            fee.payment_method = request.data.get('payment_method', 'Cash')
-            fee.save()
-            AuditLog.objects.create(
-                user=request.user,
-                action='PAY_FEE',
-                model_name='Fee',
-                object_id=str(fee.id),
-                details=f"Fee paid for student {fee.student}"
+            payment, created = ledger.pay(
+                pk, request.user, amount=data.get('amount'), payment_method=data['payment_method'],
+                idempotency_key=request.headers.get('Idempotency-Key') or data.get('idempotency_key'),
             )
-            return Response({'message': 'Payment successful'}, status=status.HTTP_200_OK)
-        except Fee.DoesNotExist:
-            return Response({'message': 'Fee not found'}, status=status.HTTP_404_NOT_FOUND)
-        except Exception as e:
-            return Response({'message': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        except ledger.PaymentError as e:
+            return Response({'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'message': 'Payment successful' if created else 'Payment already processed',
+            'payment': FeePaymentSerializer(payment).data,
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+    @action(detail=False)
+    def outstanding(self, request):
+        """
+        Outstanding fee totals per student, or per class with ?group=class,
+        read from the maintained student fee accounts.
+        """
+        user = request.user
+        declared = {
+            'student': ['exact', 'in'],
+            'class_instance': ('student__class_instance', ['exact', 'in']),
+            'outstanding': ['gt', 'gte', 'lte'],
+        }
+        accounts = StudentFeeAccount.objects.filter(**FieldFilterBackend().get_filters(request, StudentFeeAccount, declared))
+        if user.role == 'parent':
+            accounts = accounts.filter(student__parents=user)
+        elif not (user.is_superuser or user.role in ('admin', 'staff')):
+            accounts = accounts.none()
+        if request.query_params.get('group') == 'class':
+            if user.role == 'parent':
+                return Response({'message': 'Class totals are only available to admin and staff'}, status=status.HTTP_403_FORBIDDEN)
+            return Response(list(ledger.outstanding_by_class(accounts)))
+        return Response(list(accounts.values('student', 'billed', 'outstanding').order_by('student')))
+
+class FeePaymentViewSet(StreamingListMixin, QueryPlanMixin, FacetMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = FeePayment.objects.all()
+    serializer_class = FeePaymentSerializer
+    permission_classes = [IsAdminOrStaffOrParent]
+    filterset_fields = {
+        'fee': ['exact', 'in'],
+        'student': ('fee__student', ['exact']),
+        'created_at': ['gte', 'lte'],
+    }
+    search_fields = ['payment_method', 'fee__student__admission_number']
+    ordering_fields = ['amount', 'created_at']
+    facet_fields = ['payment_method']
+
+    def get_queryset(self):
+        user = self.request.user
+        if user.is_superuser or user.role in ('admin', 'staff'):
+            return FeePayment.objects.all()
+        elif user.role == 'parent':
+            return FeePayment.objects.filter(fee__student__parents=user)
+        return FeePayment.objects.none()
 
-class AnnouncementViewSet(viewsets.ModelViewSet):
+class AnnouncementViewSet(ConditionalGetMixin, StreamingListMixin, AuditMixin, QueryPlanMixin, FullTextSearchMixin, viewsets.ModelViewSet):
     queryset = Announcement.objects.all()
     serializer_class = AnnouncementSerializer
     permission_classes = [IsAdminOrTeacher]
+    filterset_fields = {'created_at': ['gte', 'lte']}
+    search_fields = ['title', 'content']
+    ordering_fields = ['title', 'created_at']
+    # Class-scoped announcements reach the teachers of those classes.
+    version_dependencies = (ClassInstance,)
 
     def get_queryset(self):
         user = self.request.user
         if user.is_superuser or user.role == 'admin':
             return Announcement.objects.all()
-        return Announcement.objects.filter(target_roles__contains=user.role)
-
-class MessageViewSet(viewsets.ModelViewSet):
+        audience = Q(role=user.role, class_instance__isnull=True)
+        if user.role == 'teacher':
+            classes = ClassInstance.objects.filter(teachers=user).values('pk')
+            audience |= Q(role=user.role, class_instance__in=classes)
+        # A correlated EXISTS lets SQLite walk announcement_created_idx newest
+        # first and stop at the page size, probing announcement_target_idx.
+        targeted = AnnouncementTarget.objects.filter(audience, announcement=OuterRef('pk'))
+        return Announcement.objects.filter(Exists(targeted))
+
+class MessageViewSet(ConditionalGetMixin, StreamingListMixin, AuditMixin, QueryPlanMixin, FacetMixin, FullTextSearchMixin, viewsets.ModelViewSet):
     queryset = Message.objects.all()
     serializer_class = MessageSerializer
     permission_classes = [IsAuthenticated]
+    filterset_fields = {'sender': ['exact'], 'receiver': ['exact'], 'read': ['exact']}
+    search_fields = ['content', 'sender__username', 'receiver__username']
+    ordering_fields = ['created_at']
+    facet_fields = ['read']
 
     def get_queryset(self):
         user = self.request.user
@@ -179,10 +428,62 @@ class MessageViewSet(viewsets.ModelViewSet):
             return Message.objects.all()
         return Message.objects.filter(Q(sender=user) | Q(receiver=user))
 
-class TimetableViewSet(viewsets.ModelViewSet):
+    @action(detail=False)
+    def inbox(self, request):
+        """
+        Messages received by the caller, newest first; `?read=false` keeps
+        to unread ones.
+        """
+        return self.paginated(self.filter_queryset(Message.objects.filter(receiver=request.user)))
+
+    @action(detail=False)
+    def conversations(self, request):
+        """
+        The caller's conversations, most recently active first, each as its
+        latest message with the counterpart and their unread messages.
+        """
+        return self.paginated(inbox.conversations(request.user), ConversationSerializer)
+
+    @action(detail=False)
+    def thread(self, request):
+        """
+        The messages between the caller and the user `?with=`, newest first.
+        """
+        other = request.query_params.get('with', '')
+        if not other.isdigit():
+            return Response({'with': ['A user id is required.']}, status=status.HTTP_400_BAD_REQUEST)
+        return self.paginated(self.filter_queryset(inbox.between(request.user, int(other))))
+
+    @action(detail=False, methods=['post'], url_path='mark-read')
+    def mark_read(self, request):
+        """
+        Marks everything the user `with` sent the caller as read.
+        """
+        other = str(request.data.get('with', ''))
+        if not other.isdigit():
+            return Response({'with': ['A user id is required.']}, status=status.HTTP_400_BAD_REQUEST)
+        marked = inbox.mark_read(request.user, int(other))
+        return Response({'marked': marked, 'unread': inbox.unread_count(request.user)})
+
+    @action(detail=False)
+    def unread(self, request):
+        return Response({'unread': inbox.unread_count(request.user)})
+
+    def paginated(self, queryset, serializer_class=None):
+        page = self.paginate_queryset(queryset)
+        serializer_class = serializer_class or self.get_serializer_class()
+        return self.get_paginated_response(serializer_class(page, many=True, context=self.get_serializer_context()).data)
+
+class TimetableViewSet(ResponseCacheMixin, ConditionalGetMixin, StreamingListMixin, AuditMixin, QueryPlanMixin, FacetMixin, viewsets.ModelViewSet):
     queryset = Timetable.objects.all()
     serializer_class = TimetableSerializer
     permission_classes = [IsAdminOrStudentForTimetable]
+    filterset_fields = {'class_instance': ['exact', 'in'], 'subject': ['exact'], 'day': ['exact', 'in']}
+    search_fields = ['room', 'day', 'subject__name', 'class_instance__name']
+    ordering_fields = ['day', 'start_time', 'created_at']
+    facet_fields = ['day']
+    # Teachers and students see the timetables of their classes.
+    version_dependencies = (ClassInstance, Student)
 
     def get_queryset(self):
         user = self.request.user
@@ -195,10 +496,19 @@ class TimetableViewSet(viewsets.ModelViewSet):
             return Timetable.objects.filter(class_instance__students__user_id=student_id).distinct()
         return Timetable.objects.none()
 
-class HomeworkViewSet(viewsets.ModelViewSet):
+class HomeworkViewSet(ConditionalGetMixin, StreamingListMixin, AuditMixin, QueryPlanMixin, FacetMixin, viewsets.ModelViewSet):
     queryset = Homework.objects.all()
     serializer_class = HomeworkSerializer
     permission_classes = [IsAdminOrTeacherOrStudentForHomework]
+    filterset_fields = {
+        'class_instance': ['exact', 'in'],
+        'subject': ['exact'],
+        'completed': ['exact'],
+        'due_date': ['exact', 'gte', 'lte'],
+    }
+    search_fields = ['description', 'subject__name']
+    ordering_fields = ['due_date', 'created_at']
+    facet_fields = ['completed', 'subject']
 
     def get_queryset(self):
         user = self.request.user
@@ -212,15 +522,30 @@ class HomeworkViewSet(viewsets.ModelViewSet):
             return Homework.objects.filter(class_instance__students__user_id=student_id).distinct()
         return Homework.objects.none()
 
-class LibraryItemViewSet(viewsets.ModelViewSet):
+class LibraryItemViewSet(ConditionalGetMixin, StreamingListMixin, AuditMixin, QueryPlanMixin, FacetMixin, BulkImportMixin, viewsets.ModelViewSet):
     queryset = LibraryItem.objects.all()
     serializer_class = LibraryItemSerializer
     permission_classes = [IsAdmin]
+    filterset_fields = {'item_type': ['exact', 'in'], 'status': ['exact']}
+    search_fields = ['title', 'isbn']
+    ordering_fields = ['title', 'created_at']
+    facet_fields = ['status', 'item_type']
+    importer_class = LibraryItemImporter
 
-class LibraryBorrowingViewSet(viewsets.ModelViewSet):
+class LibraryBorrowingViewSet(ConditionalGetMixin, StreamingListMixin, AuditMixin, QueryPlanMixin, FacetMixin, viewsets.ModelViewSet):
     queryset = LibraryBorrowing.objects.all()
     serializer_class = LibraryBorrowingSerializer
     permission_classes = [IsAdminOrStaff]
+    filterset_fields = {
+        'student': ['exact'],
+        'library_item': ['exact'],
+        'returned': ['exact'],
+        'borrow_date': ['gte', 'lte'],
+        'return_date': ['gte', 'lte', 'isnull'],
+    }
+    search_fields = ['library_item__title', 'student__admission_number', 'student__user__username']
+    ordering_fields = ['borrow_date', 'created_at']
+    facet_fields = ['returned']
 
     def get_queryset(self):
         user = self.request.user
@@ -230,10 +555,19 @@ class LibraryBorrowingViewSet(viewsets.ModelViewSet):
             return LibraryBorrowing.objects.filter(student__user=user)
         return LibraryBorrowing.objects.none()
 
-class LeaveApplicationViewSet(viewsets.ModelViewSet):
+class LeaveApplicationViewSet(ConditionalGetMixin, StreamingListMixin, AuditMixin, QueryPlanMixin, FacetMixin, viewsets.ModelViewSet):
     queryset = LeaveApplication.objects.all()
     serializer_class = LeaveApplicationSerializer
     permission_classes = [IsAuthenticated]
+    filterset_fields = {
+        'user': ['exact'],
+        'status': ['exact', 'in'],
+        'start_date': ['gte', 'lte'],
+        'end_date': ['gte', 'lte'],
+    }
+    search_fields = ['reason', 'user__username']
+    ordering_fields = ['start_date', 'created_at']
+    facet_fields = ['status']
 
     def get_queryset(self):
         user = self.request.user
@@ -243,14 +577,22 @@ class LeaveApplicationViewSet(viewsets.ModelViewSet):
 
     def perform_update(self, serializer):
         if self.request.user.role == 'admin':
-            serializer.save(approved_by=self.request.user)
-        else:
-            serializer.save()
+            serializer.validated_data['approved_by'] = self.request.user
+        super().perform_update(serializer)
 
-class ReportCardViewSet(viewsets.ModelViewSet):
+class ReportCardViewSet(ConditionalGetMixin, StreamingListMixin, AuditMixin, QueryPlanMixin, FacetMixin, viewsets.ModelViewSet):
     queryset = ReportCard.objects.all()
     serializer_class = ReportCardSerializer
     permission_classes = [IsAdmin]
+    filterset_fields = {
+        'student': ['exact'],
+        'class_instance': ('student__class_instance', ['exact']),
+        'term': ['exact'],
+        'year': ['exact'],
+    }
+    search_fields = ['overall_grade', 'remarks', 'student__admission_number', 'student__user__username']
+    ordering_fields = ['year', 'created_at']
+    facet_fields = ['overall_grade', 'term']
 
     def get_queryset(self):
         user = self.request.user
@@ -262,10 +604,21 @@ class ReportCardViewSet(viewsets.ModelViewSet):
             return ReportCard.objects.filter(student__user=user)
         return ReportCard.objects.none()
 
-class ParentFeedbackViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post'])
+    def generate(self, request):
+        serializer = ReportCardGenerationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        summary = generate_report_cards(user=request.user, **serializer.validated_data)
+        audit.record(request.user, 'GENERATE_REPORT_CARDS', 'ReportCard', details=summary)
+        return Response(summary, status=status.HTTP_200_OK)
+
+class ParentFeedbackViewSet(ConditionalGetMixin, StreamingListMixin, AuditMixin, QueryPlanMixin, FullTextSearchMixin, viewsets.ModelViewSet):
     queryset = ParentFeedback.objects.all()
     serializer_class = ParentFeedbackSerializer
     permission_classes = [IsAdminOrParent]  # Updated permission
+    filterset_fields = {'parent': ['exact'], 'created_at': ['gte', 'lte']}
+    search_fields = ['content', 'parent__user__username']
+    ordering_fields = ['created_at']
 
     def get_queryset(self):
         user = self.request.user
@@ -275,77 +628,124 @@ class ParentFeedbackViewSet(viewsets.ModelViewSet):
             return ParentFeedback.objects.filter(parent__user=user)
         return ParentFeedback.objects.none()
 
-class AuditLogViewSet(viewsets.ModelViewSet):
+class AuditLogViewSet(StreamingListMixin, QueryPlanMixin, FacetMixin, viewsets.ModelViewSet):
     queryset = AuditLog.objects.all()
     serializer_class = AuditLogSerializer
     permission_classes = [IsAdmin]
+    page_size = 100
+    max_page_size = 500
+    filterset_fields = {
+        'user': ['exact', 'in'],
+        'action': ['exact', 'in'],
+        'model_name': ['exact'],
+        'object_id': ['exact'],
+        'created_at': ['gte', 'gt', 'lte', 'lt'],
+    }
+    search_fields = ['action', 'model_name', 'details']
+    ordering_fields = ['created_at']
+    facet_fields = ['action', 'model_name']
 
-class SchoolSettingsViewSet(viewsets.ModelViewSet):
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('include_archived', '').lower() not in ('true', '1', 'yes'):
+            return super().list(request, *args, **kwargs)
+        return self.list_with_archive(request)
+
+    def list_with_archive(self, request):
+        """
+        Newest-first page merging live rows with archived ones. Only the
+        declared filters apply to archived rows, and only the archive
+        partitions the created_at bounds overlap are read.
+        """
+        paginator = self.paginator
+        paginator.request = request
+        limit = paginator.get_page_size(request, self)
+        cursor = paginator.decode_cursor(request)
+        before = None
+        if cursor is not None:
+            created_at, pk = paginator.clean_values(AuditLog, cursor['v'], ('-created_at', '-id'))
+            if created_at is None or pk is None:
+                raise NotFound(paginator.invalid_cursor_message)
+            before = (created_at, pk)
+
+        queryset = self.filter_queryset(self.get_queryset()).order_by('-created_at', '-id')
+        if before is not None:
+            queryset = queryset.filter(Q(created_at__lt=before[0]) | Q(created_at=before[0], id__lt=before[1]))
+        entries = list(queryset.select_related('user')[:limit + 1])
+        filters = FieldFilterBackend().get_filters(request, AuditLog, self.filterset_fields)
+        if len(entries) > limit:
+            # Archived rows older than a full page of live ones cannot make the page.
+            oldest = entries[-1].created_at
+            filters['created_at__gte'] = max(filters.get('created_at__gte', oldest), oldest)
+        archived, scanned = archive.search(filters, limit + 1, before)
+
+        live = {entry.id for entry in entries}
+        users = User.objects.in_bulk({row['user_id'] for row in archived})
+        for row in archived:
+            if row['id'] in live:
+                # Archived but not yet deleted when the archiver stopped.
+                continue
+            entry = AuditLog(**row)
+            # Archived entries may outlive their user.
+            AuditLog.user.field.set_cached_value(entry, users.get(row['user_id']))
+            entries.append(entry)
+        entries.sort(key=lambda entry: (entry.created_at, entry.id), reverse=True)
+        page, has_more = entries[:limit], len(entries) > limit
+
+        last = page[-1] if page else None
+        return Response({
+            'next': paginator.encode_values([last.created_at.isoformat(), last.id]) if has_more else None,
+            'results': self.get_serializer(page, many=True).data,
+            'archived_partitions': scanned,
+        })
+
+class ContactMessageViewSet(StreamingListMixin, AuditMixin, QueryPlanMixin, FullTextSearchMixin, viewsets.ModelViewSet):
+    queryset = ContactMessage.objects.all()
+    serializer_class = ContactMessageSerializer
+    permission_classes = [IsAdminOrCreateOnly]
+    filterset_fields = {'email': ['exact'], 'created_at': ['gte', 'lte']}
+    search_fields = ['name', 'email', 'message']
+    ordering_fields = ['created_at']
+
+class SchoolSettingsViewSet(AuditMixin, QueryPlanMixin, viewsets.ModelViewSet):
     serializer_class = SchoolSettingsSerializer
     permission_classes = [IsAdmin]
+    pagination_class = None
 
     def get_queryset(self):
-        settings = SchoolSettings.objects.first()
-        if not settings:
-            settings = SchoolSettings.objects.create(
-                school_name='Elite Academy',
-                academic_year=str(timezone.now().year),
-                motto='',
-                current_term='Term 1',
-                logo=''
-            )
-            print("SchoolSettings: Created default settings due to absence")
         return SchoolSettings.objects.all()
 
     def list(self, request, *args, **kwargs):
         try:
-            settings = SchoolSettings.objects.first()
-            if not settings:
-                settings = SchoolSettings.objects.create(
-                    school_name='Elite Academy',
-                    academic_year=str(timezone.now().year),
-                    motto='',
-                    current_term='Term 1',
-                    logo=''
-                )
-                print("SchoolSettings: Created default settings due to absence")
-            serializer = self.get_serializer(settings)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            return self.settings_response(request)
         except Exception as e:
             return Response({"message": "O wise one, an unforeseen error has clouded the retrieval of settings. Seek guidance from the logs."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     def retrieve(self, request, *args, **kwargs):
         try:
-            settings = SchoolSettings.objects.first()
-            if not settings:
-                settings = SchoolSettings.objects.create(
-                    school_name='Elite Academy',
-                    academic_year=str(timezone.now().year),
-                    motto='',
-                    current_term='Term 1',
-                    logo=''
-                )
-                print("SchoolSettings: Created default settings due to absence")
-            serializer = self.get_serializer(settings)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            return self.settings_response(request)
         except Exception as e:
             return Response({"message": "O seeker of knowledge, the settings you seek are lost in the ether. Consult the logs for enlightenment."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def settings_response(self, request):
+        """
+        Serves the cached settings tagged with their version, answering 304
+        to a matching If-None-Match before anything is read.
+        """
+        etag = quote_etag(schoolsettings.version())
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(self.get_serializer(schoolsettings.get()).data, status=status.HTTP_200_OK)
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
     def update(self, request, *args, **kwargs):
         try:
-            settings = SchoolSettings.objects.first()
-            if not settings:
-                settings = SchoolSettings.objects.create(
-                    school_name='Elite Academy',
-                    academic_year=str(timezone.now().year),
-                    motto='',
-                    current_term='Term 1',
-                    logo=''
-                )
-                print("SchoolSettings: Created default settings due to absence")
-            serializer = self.get_serializer(settings, data=request.data, partial=True)
+            school_settings = schoolsettings.load()
+            serializer = self.get_serializer(school_settings, data=request.data, partial=True)
             if serializer.is_valid():
-                serializer.save()
+                self.perform_update(serializer)
                 return Response({"message": "The settings have been updated with the wisdom of the ages. May your institution thrive."}, status=status.HTTP_200_OK)
             return Response({"message": "O guardian of the realm, the data you provided lacks the harmony of truth. Verify and try again."}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
@@ -9,8 +9,10 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import tempfile
 from pathlib import Path
 from datetime import timedelta
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -45,6 +47,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.requestlog.RequestLogMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -82,6 +85,10 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Take the write lock when a transaction starts, so concurrent
+        # read-then-write transactions (fee payments) wait for each other
+        # instead of failing with "database is locked".
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE', 'timeout': 20},
     }
 }
 
@@ -132,17 +139,30 @@ CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
 ]
 
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+
 #CORS_ALLOW_ALL_ORIGINS = True
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.TokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.KeysetPagination',
+    'DEFAULT_FILTER_BACKENDS': [
+        'core.filters.FieldFilterBackend',
+        'rest_framework.filters.SearchFilter',
+        'rest_framework.filters.OrderingFilter',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'core.streaming.NDJSONRenderer',
+    ],
 }
 
 AUTH_USER_MODEL = 'core.User'
@@ -155,8 +175,72 @@ SIMPLE_JWT = {
     'AUTH_HEADER_NAME': 'HTTP_AUTHORIZATION',
     'USER_ID_FIELD': 'id',
     'USER_ID_CLAIM': 'user_id',
+    'TOKEN_OBTAIN_SERIALIZER': 'core.serializers.ClaimsTokenObtainPairSerializer',
+}
+
+# Users resolved from access tokens are cached per process for
+# AUTH_USER_CACHE_TTL seconds. Saving or deleting a user bumps a stamp under
+# VERSION_DIR that drops the cached users in every worker. With
+# AUTH_TRUST_TOKEN_CLAIMS the claims in a token are used as-is on a cache
+# miss, unless a user has changed since the token was issued.
+AUTH_USER_CACHE_SIZE = 10000
+AUTH_USER_CACHE_TTL = 300
+AUTH_TRUST_TOKEN_CLAIMS = False
+
+# Version stamps telling workers their cached copies are stale. Every
+# worker must see the same directory, so point it at shared storage when
+# workers run on more than one host.
+VERSION_DIR = Path(tempfile.gettempdir()) / 'school-system' / 'versions'
+
+# Entries kept by each viewset's response cache (see ResponseCacheMixin).
+RESPONSE_CACHE_SIZE = 512
+
+# Threads used to build independent sections of /api/dashboard/<role>/
+DASHBOARD_WORKERS = 4
+
+# Audit entries are queued and written in batches by a background thread.
+AUDIT_ASYNC = True
+AUDIT_BATCH_SIZE = 200
+AUDIT_FLUSH_INTERVAL = 2.0
+AUDIT_QUEUE_SIZE = 10000
+
+# Runs audit writes inline during tests; see core.testing.
+TEST_RUNNER = 'core.testing.TestRunner'
+
+# archive_audit_logs keeps this many months of entries in the database and
+# moves older ones to gzipped monthly partitions under AUDIT_ARCHIVE_DIR.
+AUDIT_RETENTION_MONTHS = 12
+AUDIT_ARCHIVE_DIR = BASE_DIR / 'archive' / 'audit'
+
+# One structured log record per request on the `core.requests` logger.
+# Ordinary requests are sampled; errors and slow requests are always logged.
+# Records are written by a background thread, off the request path.
+REQUEST_LOG_SAMPLE_RATE = 0.05
+REQUEST_LOG_SLOW_MS = 1000
+REQUEST_LOG_SERVER_TIMING = True
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {'()': 'core.requestlog.JSONFormatter'},
+    },
+    'handlers': {
+        'console': {'class': 'core.requestlog.QueuedStreamHandler', 'formatter': 'json'},
+    },
+    'loggers': {
+        'core': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
 }
 
+# School terms as (name, first month, last month), used to roll attendance
+# up per student and term.
+SCHOOL_TERMS = [
+    ('Term 1', 1, 4),
+    ('Term 2', 5, 8),
+    ('Term 3', 9, 12),
+]
+
 AUTHENTICATION_BACKENDS = [
     'django.contrib.auth.backends.ModelBackend',
 ]
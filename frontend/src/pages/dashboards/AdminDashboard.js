@@ -41,24 +41,24 @@ function AdminDashboard() {
   const chartInstance = useRef(null);
 
   const tabDataMap = useMemo(() => ({
-    users: { data: users, setter: setUsers },
-    classes: { data: classes, setter: setClasses },
-    subjects: { data: subjects, setter: setSubjects },
-    exams: { data: exams, setter: setExams },
-    grades: { data: grades, setter: setGrades },
-    attendance: { data: attendance, setter: setAttendance },
-    fees: { data: fees, setter: setFees },
-    announcements: { data: announcements, setter: setAnnouncements },
-    messages: { data: messages, setter: setMessages },
-    timetables: { data: timetables, setter: setTimetables },
-    homework: { data: homework, setter: setHomework },
-    libraryItems: { data: libraryItems, setter: setLibraryItems },
-    borrowings: { data: borrowings, setter: setBorrowings },
-    leaveApps: { data: leaveApps, setter: setLeaveApps },
-    reportCards: { data: reportCards, setter: setReportCards },
-    parentFeedback: { data: parentFeedback, setter: setParentFeedback },
-    auditLogs: { data: auditLogs, setter: setAuditLogs },
-    settings: { data: settings, setter: setSettings },
+    users: { data: users, setter: setUsers, endpoint: 'users' },
+    classes: { data: classes, setter: setClasses, endpoint: 'classes' },
+    subjects: { data: subjects, setter: setSubjects, endpoint: 'subjects' },
+    exams: { data: exams, setter: setExams, endpoint: 'exams' },
+    grades: { data: grades, setter: setGrades, endpoint: 'grades' },
+    attendance: { data: attendance, setter: setAttendance, endpoint: 'attendance' },
+    fees: { data: fees, setter: setFees, endpoint: 'fees' },
+    announcements: { data: announcements, setter: setAnnouncements, endpoint: 'announcements' },
+    messages: { data: messages, setter: setMessages, endpoint: 'messages' },
+    timetables: { data: timetables, setter: setTimetables, endpoint: 'timetables' },
+    homework: { data: homework, setter: setHomework, endpoint: 'homework' },
+    libraryItems: { data: libraryItems, setter: setLibraryItems, endpoint: 'library-items' },
+    borrowings: { data: borrowings, setter: setBorrowings, endpoint: 'library-borrowings' },
+    leaveApps: { data: leaveApps, setter: setLeaveApps, endpoint: 'leave-applications' },
+    reportCards: { data: reportCards, setter: setReportCards, endpoint: 'report-cards' },
+    parentFeedback: { data: parentFeedback, setter: setParentFeedback, endpoint: 'parent-feedback' },
+    auditLogs: { data: auditLogs, setter: setAuditLogs, endpoint: 'audit-logs' },
+    settings: { data: settings, setter: setSettings, endpoint: 'school-settings' },
   }), [users, classes, subjects, exams, grades, attendance, fees, announcements, messages, timetables, homework, libraryItems, borrowings, leaveApps, reportCards, parentFeedback, auditLogs, settings]);
 
   const showToast = (message, type = 'error') => {
@@ -81,15 +81,16 @@ function AdminDashboard() {
     };
   };
 
-  const fetchData = useCallback(async (endpoint, setter, errorMsg) => {
+  const fetchData = useCallback(async (endpoint, setter, errorMsg, params = {}) => {
     try {
       setLoading(true);
       const token = localStorage.getItem('token');
       if (!token) throw new Error('No authentication token found');
       const response = await axios.get(`http://localhost:8000/api/${endpoint}/`, {
         headers: { Authorization: `Bearer ${token}` },
+        params,
       });
-      setter(response.data);
+      setter(response.data.results ?? response.data);
     } catch (err) {
       const errorMessage = err.response?.data?.message || err.message || errorMsg;
       setError(errorMessage);
@@ -100,25 +101,47 @@ function AdminDashboard() {
   }, []);
 
   useEffect(() => {
-    fetchData('users', setUsers, 'Failed to fetch users.');
-    fetchData('classes', setClasses, 'Failed to fetch classes.');
-    fetchData('subjects', setSubjects, 'Failed to fetch subjects.');
-    fetchData('exams', setExams, 'Failed to fetch exams.');
-    fetchData('grades', setGrades, 'Failed to fetch grades.');
-    fetchData('attendance', setAttendance, 'Failed to fetch attendance.');
-    fetchData('fees', setFees, 'Failed to fetch fees.');
-    fetchData('announcements', setAnnouncements, 'Failed to fetch announcements.');
-    fetchData('messages', setMessages, 'Failed to fetch messages.');
-    fetchData('timetables', setTimetables, 'Failed to fetch timetables.');
-    fetchData('homework', setHomework, 'Failed to fetch homework.');
-    fetchData('library-items', setLibraryItems, 'Failed to fetch library items.');
-    fetchData('library-borrowings', setBorrowings, 'Failed to fetch borrowings.');
-    fetchData('leave-applications', setLeaveApps, 'Failed to fetch leave applications.');
-    fetchData('report-cards', setReportCards, 'Failed to fetch report cards.');
-    fetchData('parent-feedback', setParentFeedback, 'Failed to fetch parent feedback.');
-    fetchData('audit-logs', setAuditLogs, 'Failed to fetch audit logs.');
-    fetchData('school-settings', setSettings, 'Failed to fetch settings.');
-  }, [fetchData]);
+    const sectionSetters = {
+      users: setUsers,
+      classes: setClasses,
+      subjects: setSubjects,
+      exams: setExams,
+      grades: setGrades,
+      attendance: setAttendance,
+      fees: setFees,
+      announcements: setAnnouncements,
+      messages: setMessages,
+      timetables: setTimetables,
+      homework: setHomework,
+      'library-items': setLibraryItems,
+      'library-borrowings': setBorrowings,
+      'leave-applications': setLeaveApps,
+      'report-cards': setReportCards,
+      'parent-feedback': setParentFeedback,
+      'audit-logs': setAuditLogs,
+      'school-settings': setSettings,
+    };
+    const fetchDashboard = async () => {
+      try {
+        setLoading(true);
+        const token = localStorage.getItem('token');
+        if (!token) throw new Error('No authentication token found');
+        const { data } = await axios.get('http://localhost:8000/api/dashboard/admin/', {
+          headers: { Authorization: `Bearer ${token}` },
+        });
+        Object.entries(sectionSetters).forEach(([section, setter]) => {
+          if (data[section]) setter(data[section].results ?? data[section]);
+        });
+      } catch (err) {
+        const errorMessage = err.response?.data?.message || err.message || 'Failed to load dashboard.';
+        setError(errorMessage);
+        showToast(errorMessage);
+      } finally {
+        setLoading(false);
+      }
+    };
+    fetchDashboard();
+  }, []);
 
   useEffect(() => {
     const handler = debounce((query) => setDebouncedSearch(query), 500);
@@ -127,8 +150,8 @@ function AdminDashboard() {
 
   useEffect(() => {
     if (debouncedSearch && activeTab !== 'analytics') {
-      const { setter } = tabDataMap[activeTab];
-      fetchData(`${activeTab}?search=${debouncedSearch}`, setter, `Failed to search ${activeTab}.`);
+      const { setter, endpoint } = tabDataMap[activeTab];
+      fetchData(endpoint, setter, `Failed to search ${activeTab}.`, { search: debouncedSearch });
     }
   }, [debouncedSearch, activeTab, fetchData, tabDataMap]);
 
@@ -1,4 +1,4 @@
-import React, { useEffect, useState, useContext, useCallback } from 'react';
+import React, { useEffect, useState, useContext, useCallback, useRef } from 'react';
 import axios from 'axios';
 import { AuthContext } from '../../context/AuthContext';
 import { ToastContainer, toast } from 'react-toastify';
@@ -11,6 +11,8 @@ function ParentDashboard() {
   const [grades, setGrades] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
+  // Idempotency-Key per fee, kept until its payment request settles.
+  const paymentKeys = useRef({});
 
   const fetchData = useCallback(async (endpoint, setter, errorMsg) => {
     try {
@@ -20,7 +22,7 @@ function ParentDashboard() {
       const response = await axios.get(`http://localhost:8000/api/${endpoint}/?parent_id=${user.id}`, {
         headers: { Authorization: `Bearer ${token}` },
       });
-      setter(response.data);
+      setter(response.data.results ?? response.data);
     } catch (err) {
       const errorMessage = err.response?.data?.message || err.message || errorMsg;
       setError(errorMessage);
@@ -30,23 +32,52 @@ function ParentDashboard() {
     }
   }, [user?.id]);
 
+  const fetchDashboard = useCallback(async () => {
+    try {
+      setLoading(true);
+      const token = localStorage.getItem('token');
+      if (!token || !user?.id) throw new Error('Authentication required');
+      const { data } = await axios.get('http://localhost:8000/api/dashboard/parent/', {
+        headers: { Authorization: `Bearer ${token}` },
+      });
+      setFees(data.fees?.results ?? []);
+      setGrades(data.grades?.results ?? []);
+    } catch (err) {
+      const errorMessage = err.response?.data?.message || err.message || 'Failed to load dashboard.';
+      setError(errorMessage);
+      toast.error(errorMessage);
+    } finally {
+      setLoading(false);
+    }
+  }, [user?.id]);
+
   useEffect(() => {
     if (user?.id) {
-      fetchData('fees', setFees, 'Failed to fetch fees.');
-      fetchData('grades', setGrades, 'Failed to fetch grades.');
+      fetchDashboard();
     }
-  }, [fetchData, user?.id]);
+  }, [fetchDashboard, user?.id]);
 
   const handlePayFee = async (feeId) => {
+    // A double click or a retry after a lost response reuses the pending
+    // key, so the server records the payment only once.
+    if (!paymentKeys.current[feeId]) {
+      paymentKeys.current[feeId] = window.crypto.randomUUID();
+    }
     try {
       setLoading(true);
       const token = localStorage.getItem('token');
       await axios.post(`http://localhost:8000/api/fees/${feeId}/pay/`, {}, {
-        headers: { Authorization: `Bearer ${token}` },
+        headers: { Authorization: `Bearer ${token}`, 'Idempotency-Key': paymentKeys.current[feeId] },
       });
+      delete paymentKeys.current[feeId];
       fetchData('fees', setFees, 'Failed to refresh fees.');
       toast.success('Fee payment processed successfully.');
     } catch (err) {
+      // A rejected payment settles the attempt; without a response its
+      // outcome is unknown and the key is kept for the retry.
+      if (err.response && err.response.status < 500) {
+        delete paymentKeys.current[feeId];
+      }
       toast.error(err.response?.data?.message || 'Failed to process payment.');
     } finally {
       setLoading(false);
@@ -22,7 +22,7 @@ function StaffDashboard() {
       const response = await axios.get(`http://localhost:8000/api/${endpoint}/?staff_id=${user.id}`, {
         headers: { Authorization: `Bearer ${token}` },
       });
-      setter(response.data);
+      setter(response.data.results ?? response.data);
     } catch (err) {
       const errorMessage = err.response?.data?.message || err.message || errorMsg;
       setError(errorMessage);
@@ -32,12 +32,30 @@ function StaffDashboard() {
     }
   }, [user?.id]);
 
+  const fetchDashboard = useCallback(async () => {
+    try {
+      setLoading(true);
+      const token = localStorage.getItem('token');
+      if (!token || !user?.id) throw new Error('Authentication required');
+      const { data } = await axios.get('http://localhost:8000/api/dashboard/staff/', {
+        headers: { Authorization: `Bearer ${token}` },
+      });
+      setStudents(data.students?.results ?? []);
+      setFees(data.fees?.results ?? []);
+    } catch (err) {
+      const errorMessage = err.response?.data?.message || err.message || 'Failed to load dashboard.';
+      setError(errorMessage);
+      toast.error(errorMessage);
+    } finally {
+      setLoading(false);
+    }
+  }, [user?.id]);
+
   useEffect(() => {
     if (user?.id) {
-      fetchData('students', setStudents, 'Failed to fetch students.');
-      fetchData('fees', setFees, 'Failed to fetch fees.');
+      fetchDashboard();
     }
-  }, [fetchData, user?.id]);
+  }, [fetchDashboard, user?.id]);
 
   const handleCreateOrUpdate = async (data, endpoint, successMsg) => {
     try {
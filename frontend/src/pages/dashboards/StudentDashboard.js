@@ -20,7 +20,7 @@ function StudentDashboard() {
       const response = await axios.get(`http://localhost:8000/api/${endpoint}/?student_id=${user.id}`, {
         headers: { Authorization: `Bearer ${token}` },
       });
-      setter(response.data);
+      setter(response.data.results ?? response.data);
     } catch (err) {
       const errorMessage = err.response?.data?.message || err.message || errorMsg;
       setError(errorMessage);
@@ -30,12 +30,30 @@ function StudentDashboard() {
     }
   }, [user?.id]);
 
+  const fetchDashboard = useCallback(async () => {
+    try {
+      setLoading(true);
+      const token = localStorage.getItem('token');
+      if (!token || !user?.id) throw new Error('Authentication required');
+      const { data } = await axios.get('http://localhost:8000/api/dashboard/student/', {
+        headers: { Authorization: `Bearer ${token}` },
+      });
+      setTimetable(data.timetables?.results ?? []);
+      setHomework(data.homework?.results ?? []);
+    } catch (err) {
+      const errorMessage = err.response?.data?.message || err.message || 'Failed to load dashboard.';
+      setError(errorMessage);
+      toast.error(errorMessage);
+    } finally {
+      setLoading(false);
+    }
+  }, [user?.id]);
+
   useEffect(() => {
     if (user?.id) {
-      fetchData('timetables', setTimetable, 'Failed to fetch timetable.');
-      fetchData('homework', setHomework, 'Failed to fetch homework.');
+      fetchDashboard();
     }
-  }, [fetchData, user?.id]);
+  }, [fetchDashboard, user?.id]);
 
   const handleCompleteHomework = async (hwId) => {
     try {
@@ -22,7 +22,7 @@ function TeacherDashboard() {
       const response = await axios.get(`http://localhost:8000/api/${endpoint}/?teacher_id=${user.id}`, {
         headers: { Authorization: `Bearer ${token}` },
       });
-      setter(response.data);
+      setter(response.data.results ?? response.data);
     } catch (err) {
       const errorMessage = err.response?.data?.message || err.message || errorMsg;
       setError(errorMessage);
@@ -32,11 +32,29 @@ function TeacherDashboard() {
     }
   }, [user?.id]);
 
+  const fetchDashboard = useCallback(async () => {
+    try {
+      setLoading(true);
+      const token = localStorage.getItem('token');
+      if (!token || !user?.id) throw new Error('Authentication required');
+      const { data } = await axios.get('http://localhost:8000/api/dashboard/teacher/', {
+        headers: { Authorization: `Bearer ${token}` },
+      });
+      setGrades(data.grades?.results ?? []);
+    } catch (err) {
+      const errorMessage = err.response?.data?.message || err.message || 'Failed to load dashboard.';
+      setError(errorMessage);
+      toast.error(errorMessage);
+    } finally {
+      setLoading(false);
+    }
+  }, [user?.id]);
+
   useEffect(() => {
     if (user?.id) {
-      fetchData('grades', setGrades, 'Failed to fetch grades.');
+      fetchDashboard();
     }
-  }, [fetchData, user?.id]);
+  }, [fetchDashboard, user?.id]);
 
   const handleInputChange = (e) => {
     setModalData({